@@ -1,3 +1,49 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.utils import timezone
+from blog import analytics
+from blog.models import Post, PostViewStat
+
+
+class DashboardTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='secret')
+        self.author.profile.role = 'author'
+        self.author.profile.save()
+        self.post = Post.objects.create(title='Mine', content='<p>Text</p>', author=self.author, status='published')
+        other = Post.objects.create(
+            title='Theirs', content='<p>Text</p>', author=User.objects.create_user('other'), status='published',
+        )
+        today = timezone.localdate()
+        for post, start, referrer, views in [
+            (self.post, today, 'search', 3),
+            (self.post, today, 'direct', 2),
+            (self.post, today - timedelta(days=1), 'search', 4),
+            (self.post, today - timedelta(days=200), 'search', 50),
+            (other, today, 'search', 100),
+        ]:
+            PostViewStat.objects.create(post=post, period='day', start=start, referrer=referrer, views=views)
+
+    def test_dashboard_shows_the_authors_views(self):
+        self.client.force_login(self.author)
+        response = self.client.get('/accounts/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['period_views'], 9)
+        self.assertEqual(response.context['referrers'], [('Search', 7), ('Direct', 2)])
+        daily = response.context['daily_views']
+        self.assertEqual(len(daily), 90)
+        self.assertEqual(daily[-1], (timezone.localdate(), 5, 100))
+
+    def test_readers_are_sent_away(self):
+        self.client.force_login(User.objects.create_user('reader'))
+        self.assertRedirects(self.client.get('/accounts/dashboard/'), '/', fetch_redirect_response=False)
 
-# Create your tests here.
+    def test_rollup_keeps_the_totals(self):
+        daily, _ = analytics.rollup()
+        self.assertEqual(daily, 1)
+        self.assertFalse(PostViewStat.objects.filter(period='day', views=50).exists())
+        self.assertEqual(
+            sum(PostViewStat.objects.filter(post=self.post).values_list('views', flat=True)), 59,
+        )
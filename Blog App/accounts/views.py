@@ -4,6 +4,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from .forms import RegistrationForm, LoginForm, ProfileForm, UserUpdateForm
 from blog.models import Post
+from blog import analytics
 
 
 def register(request):
@@ -83,11 +84,18 @@ def dashboard(request):
         return redirect('blog:home')
     
     user_posts = Post.objects.filter(author=request.user)
+    
+    # Views per day over the last 90 days, scaled for the bar chart
+    daily_views = analytics.daily_views(user_posts, days=90)
+    peak = max((views for _, views in daily_views), default=0) or 1
     context = {
         'total_posts': user_posts.count(),
         'published_posts': user_posts.filter(status='published').count(),
         'draft_posts': user_posts.filter(status='draft').count(),
         'recent_posts': user_posts[:5],
+        'daily_views': [(day, views, views * 100 // peak) for day, views in daily_views],
+        'period_views': sum(views for _, views in daily_views),
+        'referrers': analytics.referrer_breakdown(user_posts, days=90),
     }
     return render(request, 'accounts/dashboard.html', context)
 
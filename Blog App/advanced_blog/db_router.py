@@ -0,0 +1,159 @@
+"""
+Primary/replica database routing.
+
+Writes always go to ``default`` (the primary). Reads go to a randomly chosen
+healthy replica unless one of these sends them to the primary instead:
+
+* the request is not a safe method (POST, PUT, PATCH, DELETE), so the view
+  reads what it is about to write;
+* the client wrote something within the last REPLICA_PIN_SECONDS, tracked
+  by a short-lived cookie, so it always reads its own writes;
+* the read happens inside a transaction on the primary;
+* no replica is healthy.
+
+A replica is skipped for REPLICA_RETRY_SECONDS when connecting to it fails or
+when its replay lag exceeds REPLICA_MAX_LAG_SECONDS (checked at most every
+REPLICA_CHECK_SECONDS per process). Reads then fall back to the other
+replicas and finally to the primary. Lag is only measured on PostgreSQL;
+replicas on other backends (e.g. the SQLite copies made by
+sync_sqlite_replicas) are taken to be current, however old they are.
+
+A replica can also fail between two health checks. When a safe request
+that read from a replica fails with an OperationalError, the middleware
+skips the replicas it used and runs the view again on the primary, so the
+client gets the page rather than a 500. Reads outside a request (management
+commands, background jobs) get no such retry.
+"""
+import asyncio
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from asgiref.sync import async_to_sync
+from django.db.utils import DatabaseError, OperationalError
+
+PIN_COOKIE = 'pin_primary'
+
+_pinned_to_primary = ContextVar('pinned_to_primary', default=False)
+# Replicas the current request read from
+_replicas_used = ContextVar('replicas_used', default=None)
+_skip_until = {}
+_checked_at = {}
+
+
+def replica_aliases():
+    return getattr(settings, 'REPLICA_DATABASES', [])
+
+
+def _replica_lag(connection):
+    """
+    Replay lag in seconds; always 0 on other backends than PostgreSQL
+    """
+    if connection.vendor != 'postgresql':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+            'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+        )
+        return float(cursor.fetchone()[0] or 0)
+
+
+def _is_healthy(alias):
+    now = time.monotonic()
+    if _skip_until.get(alias, 0) > now:
+        return False
+    if now - _checked_at.get(alias, 0) < settings.REPLICA_CHECK_SECONDS:
+        return True
+
+    _checked_at[alias] = now
+    try:
+        connection = connections[alias]
+        connection.ensure_connection()
+        healthy = _replica_lag(connection) <= settings.REPLICA_MAX_LAG_SECONDS
+    except DatabaseError:
+        healthy = False
+    if not healthy:
+        _skip_until[alias] = now + settings.REPLICA_RETRY_SECONDS
+    return healthy
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _pinned_to_primary.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = [alias for alias in replica_aliases() if _is_healthy(alias)]
+        if not replicas:
+            return DEFAULT_DB_ALIAS
+        alias = random.choice(replicas)
+        used = _replicas_used.get()
+        if used is not None:
+            used.add(alias)
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every database holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaPinningMiddleware:
+    """
+    Route a request's reads to the primary when it writes, or when the same
+    client wrote within the last REPLICA_PIN_SECONDS
+    """
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        writing = request.method not in self.SAFE_METHODS
+        token = _pinned_to_primary.set(writing or PIN_COOKIE in request.COOKIES)
+        used = _replicas_used.set(set())
+        try:
+            response = self.get_response(request)
+        finally:
+            _replicas_used.reset(used)
+            _pinned_to_primary.reset(token)
+
+        if writing:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+                secure=request.is_secure(),
+            )
+        return response
+
+    def process_exception(self, request, exception):
+        """
+        Run a safe request again on the primary when a replica it read from
+        failed, skipping those replicas for REPLICA_RETRY_SECONDS
+        """
+        used = _replicas_used.get()
+        if not isinstance(exception, OperationalError) or not used or _pinned_to_primary.get():
+            return None
+        skip_until = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+        for alias in used:
+            _skip_until[alias] = skip_until
+        match = request.resolver_match
+        token = _pinned_to_primary.set(True)
+        try:
+            if asyncio.iscoroutinefunction(match.func):
+                response = async_to_sync(match.func)(request, *match.args, **match.kwargs)
+            else:
+                response = match.func(request, *match.args, **match.kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response = response.render()
+        finally:
+            _pinned_to_primary.reset(token)
+        return response
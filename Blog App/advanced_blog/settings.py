@@ -12,7 +12,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
-import dj_database_url
+
+from common import profiles
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -33,6 +34,12 @@ if os.environ.get('RAILWAY_STATIC_URL'):
 if os.environ.get('VERCEL_URL'):
     ALLOWED_HOSTS.extend(['.vercel.app', '.now.sh'])
 
+# Reverse proxies in front of the app (Railway and Vercel each put one
+# there). With any, client addresses are read from X-Forwarded-For
+PROXY_COUNT = int(os.environ.get(
+    'PROXY_COUNT', 1 if os.environ.get('RAILWAY_STATIC_URL') or os.environ.get('VERCEL_URL') else 0,
+))
+
 
 # Application definition
 
@@ -53,6 +60,7 @@ INSTALLED_APPS = [
     # Local apps
     'blog',
     'accounts',
+    'common',  # instrumentation (common/)
 ]
 
 MIDDLEWARE = [
@@ -70,7 +78,7 @@ ROOT_URLCONF = 'advanced_blog.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'common.metrics.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -90,6 +98,9 @@ WSGI_APPLICATION = 'advanced_blog.wsgi.application'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
 # Use PostgreSQL in production (Railway), SQLite in development
+if os.environ.get('DATABASE_URL') or os.environ.get('DATABASE_REPLICA_URLS'):
+    import dj_database_url
+
 if os.environ.get('DATABASE_URL'):
     DATABASES = {
         'default': dj_database_url.config(
@@ -105,6 +116,82 @@ else:
             'NAME': BASE_DIR / 'db.sqlite3',
         }
     }
+    if os.environ.get('SQLITE_PRODUCTION', 'False') == 'True':
+        # WAL, busy timeout and BEGIN IMMEDIATE, see common/profiles.py
+        DATABASES['default']['OPTIONS'] = dict(profiles.SQLITE_PRODUCTION_OPTIONS)
+
+# Read replicas
+# Safe reads are spread over these databases (see advanced_blog/db_router.py).
+# DATABASE_REPLICA_URLS takes comma-separated database URLs; locally,
+# SQLITE_REPLICA_PATHS takes comma-separated SQLite files that can be
+# refreshed from the primary with `python manage.py sync_sqlite_replicas`.
+REPLICA_DATABASES = []
+if os.environ.get('DATABASE_REPLICA_URLS'):
+    for index, url in enumerate(os.environ.get('DATABASE_REPLICA_URLS').split(','), start=1):
+        DATABASES[f'replica{index}'] = dj_database_url.parse(
+            url.strip(),
+            conn_max_age=600,
+            conn_health_checks=True,
+        )
+        REPLICA_DATABASES.append(f'replica{index}')
+elif os.environ.get('SQLITE_REPLICA_PATHS'):
+    for index, path in enumerate(os.environ.get('SQLITE_REPLICA_PATHS').split(','), start=1):
+        DATABASES[f'replica{index}'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': path.strip(),
+            'OPTIONS': DATABASES['default'].get('OPTIONS', {}),
+        }
+        REPLICA_DATABASES.append(f'replica{index}')
+
+for alias in REPLICA_DATABASES:
+    # Tests run against the primary only
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+
+if REPLICA_DATABASES:
+    DATABASE_ROUTERS = ['advanced_blog.db_router.PrimaryReplicaRouter']
+    # Must run before sessions and auth so their reads are routed too
+    MIDDLEWARE.insert(2, 'advanced_blog.db_router.ReplicaPinningMiddleware')
+
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 10))  # read-your-writes window after a POST
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))  # PostgreSQL replicas only
+REPLICA_CHECK_SECONDS = 5  # how often each worker re-checks replica health
+REPLICA_RETRY_SECONDS = 30  # how long an unhealthy replica is skipped
+
+
+# Cache
+# Per-process memory cache in development; set REDIS_URL to share cached
+# pages, feeds and invalidation versions between workers in production.
+# Content changes invalidate cached pages by bumping a version in the cache,
+# which reaches every worker only through a shared cache, so without one the
+# page, feed and tag cloud caches are off outside DEBUG (runserver is a
+# single process).
+SHARED_CACHE = bool(os.environ.get('REDIS_URL'))
+# The view dedup markers (ANALYTICS_VIEW_DEDUP_SECONDS) get a cache of their
+# own, one per client and post, so they never cull the cached pages or the
+# invalidation versions out of the default cache.
+if SHARED_CACHE:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL'),
+        },
+        'analytics': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL'),
+            'KEY_PREFIX': 'analytics',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'analytics': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'analytics',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        },
+    }
 
 
 # Password validation
@@ -161,6 +248,9 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 # CKEditor settings
 CKEDITOR_UPLOAD_PATH = 'uploads/'
+# Identical uploads share one file; unreferenced ones are removed by
+# python manage.py gc_uploads (see blog.uploads)
+CKEDITOR_STORAGE_BACKEND = 'blog.storage.ContentAddressedStorage'
 CKEDITOR_CONFIGS = {
     'default': {
         'toolbar': 'full',
@@ -169,10 +259,110 @@ CKEDITOR_CONFIGS = {
     },
 }
 
+# Admin bulk actions process selections in batches of this many rows,
+# one short transaction per batch
+BLOG_BULK_ACTION_BATCH_SIZE = int(os.environ.get('BLOG_BULK_ACTION_BATCH_SIZE', 500))
+
+# Serve home/category/tag listings from blog.async_views (for ASGI deployments),
+# running their queries concurrently on a pool of this many threads
+BLOG_ASYNC_VIEWS = os.environ.get('BLOG_ASYNC_VIEWS', 'False') == 'True'
+BLOG_ASYNC_QUERY_WORKERS = int(os.environ.get('BLOG_ASYNC_QUERY_WORKERS', 8))
+
+# Trending posts: views and comments lose half their weight every
+# TRENDING_HALF_LIFE_HOURS; hourly activity is kept for TRENDING_WINDOW_HOURS
+TRENDING_HALF_LIFE_HOURS = 24
+TRENDING_WINDOW_HOURS = 7 * 24
+TRENDING_VIEW_WEIGHT = 1.0
+TRENDING_COMMENT_WEIGHT = 5.0
+TRENDING_CACHE_TIMEOUT = 60
+
+# Post view analytics: views are buffered per worker and written every
+# ANALYTICS_FLUSH_INTERVAL seconds or ANALYTICS_FLUSH_SIZE keys; daily rows
+# older than ANALYTICS_DAILY_DAYS become weekly, weekly rows older than
+# ANALYTICS_WEEKLY_DAYS become monthly (python manage.py rollup_post_views)
+ANALYTICS_FLUSH_INTERVAL = 30
+ANALYTICS_FLUSH_SIZE = 500
+ANALYTICS_TRACK_REFERRERS = True
+ANALYTICS_DAILY_DAYS = 120
+ANALYTICS_WEEKLY_DAYS = 365
+# A client's views of one post count once per this many seconds, so reloads
+# and replayed view beacons do not inflate views, trending and analytics
+ANALYTICS_VIEW_DEDUP_SECONDS = 30 * 60
+ANALYTICS_CACHE_ALIAS = 'analytics'
+
+# Static pre-rendering: when PRERENDER_ROOT is set, the home page, category
+# and tag listings and published posts are written there as HTML whenever
+# content changes, and anonymous GET requests are served from those files
+# (python manage.py prerender renders everything from scratch)
+PRERENDER_ROOT = os.environ.get('PRERENDER_ROOT', '')
+if PRERENDER_ROOT:
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('whitenoise.middleware.WhiteNoiseMiddleware') + 1,
+        'blog.prerender.PrerenderedPageMiddleware',
+    )
+
+# Home, listing and post pages are cached once for everyone, with the
+# per-user regions filled in on each request (blog.holes); also invalidated
+# whenever content changes
+BLOG_PAGE_CACHE_TIMEOUT = 60 * 10 if SHARED_CACHE or DEBUG else 0
+BLOG_TAG_CLOUD_CACHE_TIMEOUT = 60 * 60 if SHARED_CACHE or DEBUG else 0
+
+# Edge caching: Cache-Control s-maxage per kind of page (EDGE_CACHE_TTLS
+# overrides blog.edge.DEFAULT_TTLS) and Surrogate-Key purges when content
+# changes. Set EDGE_PURGE_URL to purge a real CDN or proxy; otherwise purges
+# are only recorded in memory.
+MIDDLEWARE.insert(1, 'blog.edge.EdgeCacheMiddleware')
+EDGE_PURGE_URL = os.environ.get('EDGE_PURGE_URL', '')
+EDGE_PURGE_METHOD = os.environ.get('EDGE_PURGE_METHOD', 'PURGE')
+EDGE_PURGE_HEADERS = {'Fastly-Key': os.environ['FASTLY_API_KEY']} if os.environ.get('FASTLY_API_KEY') else {}
+EDGE_PURGE_BACKEND = 'blog.edge.HttpPurger' if EDGE_PURGE_URL else 'blog.edge.LocalPurger'
+
+# Sampling profiler: profiles this fraction of requests, plus requests
+# carrying a signed PROFILER_HEADER (python manage.py profile_token), and
+# keeps the PROFILER_KEEP slowest per URL name (shown at /admin/profiles/)
+MIDDLEWARE.insert(0, 'blog.profiling.ProfilingMiddleware')
+PROFILER_SAMPLE_RATE = float(os.environ.get('PROFILER_SAMPLE_RATE', 0))
+PROFILER_INTERVAL = 0.005  # seconds between stack samples
+PROFILER_KEEP = 10
+PROFILER_HEADER = 'X-Profile'
+
+# Slow query log: times every statement per fingerprint and EXPLAINs the
+# ones slower than QUERYLOG_SLOW_MS in the background. Off unless
+# QUERYLOG_DIR is set (python manage.py query_report)
+QUERYLOG_DIR = os.environ.get('QUERYLOG_DIR', '')
+QUERYLOG_SLOW_MS = float(os.environ.get('QUERYLOG_SLOW_MS', 100))
+QUERYLOG_APPS = ['blog', 'accounts']
+QUERYLOG_FLUSH_INTERVAL = 10
+QUERYLOG_EXPLAIN_ANALYZE = False  # PostgreSQL only; runs the slow SELECT again
+
+# Prometheus metrics at /metrics. Each worker writes its numbers to
+# METRICS_DIR so a scrape adds up all processes; without it a scrape only
+# sees the worker that answers it
+MIDDLEWARE.insert(0, 'common.metrics.MetricsMiddleware')
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = 15
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')  # the only access behind a proxy (PROXY_COUNT)
+
+# Feeds and sitemap
+BLOG_FEED_ITEMS = 20
+BLOG_FEED_CACHE_TIMEOUT = 60 * 60 if SHARED_CACHE or DEBUG else 0  # also invalidated whenever content changes
+BLOG_SITEMAP_CHUNK_SIZE = 50000  # sitemap protocol maximum per file
+
 # Crispy Forms
 CRISPY_ALLOWED_TEMPLATE_PACKS = "tailwind"
 CRISPY_TEMPLATE_PACK = "tailwind"
 
+# Lazy imports (blog/lazy.py): workers import Pillow, crispy-forms and the
+# CKEditor upload views on first use. Set LAZY_IMPORTS=False when the app is
+# preloaded before forking (gunicorn --preload) so they are imported once
+LAZY_IMPORTS = os.environ.get('LAZY_IMPORTS', 'True') == 'True'
+STARTUP_COMPARE_ENV = 'LAZY_IMPORTS'  # python manage.py profile_startup --compare
+
+# Batch jobs (blog/jobs.py: fix_slugs, add_sample_images) record the last
+# committed chunk here so an interrupted run resumes where it stopped
+BLOG_JOB_CHECKPOINT_DIR = BASE_DIR / 'job_checkpoints'
+
 # Login settings
 LOGIN_REDIRECT_URL = 'blog:home'
 LOGOUT_REDIRECT_URL = 'blog:home'
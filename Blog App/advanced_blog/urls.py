@@ -15,15 +15,30 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.contrib.admin.views.decorators import staff_member_required
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
+from django.views.decorators.cache import never_cache
+from django.views.decorators.csrf import csrf_exempt
+from blog import profiling_views
+from common import metrics
+from blog.lazy import lazy_view
 
 urlpatterns = [
+    path('metrics', metrics.metrics_view, name='metrics'),
+    path('admin/profiles/', profiling_views.profile_list, name='profile_list'),
+    path('admin/profiles/<str:url_name>/<int:index>/', profiling_views.profile_detail, name='profile_detail'),
     path('admin/', admin.site.urls),
     path('', include('blog.urls')),
     path('accounts/', include('accounts.urls')),
-    path('ckeditor/', include('ckeditor_uploader.urls')),
+    # ckeditor_uploader.urls, with views that import Pillow on first use. The
+    # wrapper is only resolved on the first request, so the upload view's
+    # csrf_exempt (the editor posts without a token) is repeated here
+    re_path(r'^ckeditor/upload/', staff_member_required(csrf_exempt(lazy_view('ckeditor_uploader.views.upload'))),
+            name='ckeditor_upload'),
+    re_path(r'^ckeditor/browse/', never_cache(staff_member_required(lazy_view('ckeditor_uploader.views.browse'))),
+            name='ckeditor_browse'),
 ]
 
 # Serve media files in development
@@ -1,5 +1,27 @@
-from django.contrib import admin
+from django.conf import settings
+from django.contrib import admin, messages
+from django.utils import timezone
 from .models import Post, Category, Tag, Comment
+from .batching import update_in_batches
+from .signals import posts_bulk_status_changed, comments_bulk_moderated
+
+
+class BatchedActionsMixin:
+    """
+    Run bulk admin actions in bounded batches, each in its own short
+    transaction, so "select all" on a large changelist never turns into one
+    giant UPDATE holding locks on the whole table.
+    """
+    @property
+    def bulk_batch_size(self):
+        return getattr(settings, 'BLOG_BULK_ACTION_BATCH_SIZE', 500)
+
+    def update_in_batches(self, queryset, values, only_if=None, on_batch=None):
+        values = {**values, 'updated_at': timezone.now()}
+        return update_in_batches(
+            queryset, values, only_if=only_if,
+            batch_size=self.bulk_batch_size, on_batch=on_batch,
+        )
 
 
 @admin.register(Category)
@@ -11,13 +33,13 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
-    list_display = ['name', 'slug', 'created_at']
+    list_display = ['name', 'slug', 'published_post_count', 'created_at']
     prepopulated_fields = {'slug': ('name',)}
     search_fields = ['name']
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(BatchedActionsMixin, admin.ModelAdmin):
     list_display = ['title', 'author', 'category', 'status', 'created_at', 'views']
     list_filter = ['status', 'category', 'created_at', 'tags']
     search_fields = ['title', 'content']
@@ -25,6 +47,7 @@ class PostAdmin(admin.ModelAdmin):
     date_hierarchy = 'created_at'
     ordering = ['-created_at']
     filter_horizontal = ['tags']
+    actions = ['publish_posts', 'unpublish_posts']
     
     fieldsets = (
         ('Post Information', {
@@ -46,20 +69,61 @@ class PostAdmin(admin.ModelAdmin):
         if not obj.pk:
             obj.author = request.user
         super().save_model(request, obj, form, change)
+    
+    def _set_status(self, request, queryset, status):
+        other_statuses = [value for value, _ in Post.STATUS_CHOICES if value != status]
+        post_ids = self.update_in_batches(
+            queryset.filter(status__in=other_statuses),
+            {'status': status},
+            only_if={'status__in': other_statuses},
+        )
+        posts_bulk_status_changed.send(sender=Post, post_ids=post_ids, status=status)
+        return post_ids
+    
+    def publish_posts(self, request, queryset):
+        post_ids = self._set_status(request, queryset, 'published')
+        self.message_user(request, f'{len(post_ids)} post(s) published.', messages.SUCCESS)
+    publish_posts.short_description = 'Publish selected posts'
+    
+    def unpublish_posts(self, request, queryset):
+        post_ids = self._set_status(request, queryset, 'draft')
+        self.message_user(request, f'{len(post_ids)} post(s) moved back to draft.', messages.SUCCESS)
+    unpublish_posts.short_description = 'Move selected posts to draft'
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(BatchedActionsMixin, admin.ModelAdmin):
     list_display = ['user', 'post', 'created_at', 'approved']
     list_filter = ['approved', 'created_at']
     search_fields = ['user__username', 'content', 'post__title']
     actions = ['approve_comments', 'disapprove_comments']
     
+    def _set_approved(self, request, queryset, approved):
+        post_ids = set()
+        
+        def collect_posts(comment_ids):
+            post_ids.update(
+                Comment.objects.filter(pk__in=comment_ids).values_list('post_id', flat=True)
+            )
+        
+        comment_ids = self.update_in_batches(
+            queryset.exclude(approved=approved),
+            {'approved': approved},
+            only_if={'approved': not approved},
+            on_batch=collect_posts,
+        )
+        comments_bulk_moderated.send(
+            sender=Comment, comment_ids=comment_ids, post_ids=sorted(post_ids), approved=approved,
+        )
+        return comment_ids
+    
     def approve_comments(self, request, queryset):
-        queryset.update(approved=True)
+        comment_ids = self._set_approved(request, queryset, True)
+        self.message_user(request, f'{len(comment_ids)} comment(s) approved.', messages.SUCCESS)
     approve_comments.short_description = 'Approve selected comments'
     
     def disapprove_comments(self, request, queryset):
-        queryset.update(approved=False)
+        comment_ids = self._set_approved(request, queryset, False)
+        self.message_user(request, f'{len(comment_ids)} comment(s) disapproved.', messages.SUCCESS)
     disapprove_comments.short_description = 'Disapprove selected comments'
 
@@ -0,0 +1,209 @@
+"""
+Per-post view analytics.
+
+Views are counted in memory per (post, day, referrer class) and written to
+PostViewStat in batches: one transaction every ANALYTICS_FLUSH_INTERVAL
+seconds or ANALYTICS_FLUSH_SIZE distinct keys, whichever comes first, instead
+of one write per view. Counts still in memory when a worker dies are lost,
+which is acceptable for analytics.
+
+Daily rows older than ANALYTICS_DAILY_DAYS are rolled up into weekly rows and
+weekly rows older than ANALYTICS_WEEKLY_DAYS into monthly rows by the
+rollup_post_views command, so the table grows with the number of posts, not
+with traffic.
+"""
+import atexit
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+from .batching import iter_pk_batches
+from .models import Post, PostViewStat
+
+FLUSH_INTERVAL = getattr(settings, 'ANALYTICS_FLUSH_INTERVAL', 30)
+FLUSH_SIZE = getattr(settings, 'ANALYTICS_FLUSH_SIZE', 500)
+TRACK_REFERRERS = getattr(settings, 'ANALYTICS_TRACK_REFERRERS', True)
+DAILY_DAYS = getattr(settings, 'ANALYTICS_DAILY_DAYS', 120)
+WEEKLY_DAYS = getattr(settings, 'ANALYTICS_WEEKLY_DAYS', 365)
+VIEW_DEDUP_SECONDS = getattr(settings, 'ANALYTICS_VIEW_DEDUP_SECONDS', 30 * 60)
+CACHE_ALIAS = getattr(settings, 'ANALYTICS_CACHE_ALIAS', 'default')
+PROXY_COUNT = getattr(settings, 'PROXY_COUNT', 0)
+
+SEARCH_ENGINES = ('google.', 'bing.', 'duckduckgo.', 'yahoo.', 'baidu.', 'yandex.', 'ecosia.')
+SOCIAL_SITES = (
+    'facebook.', 'twitter.', 't.co', 'x.com', 'linkedin.', 'reddit.',
+    'instagram.', 'news.ycombinator.', 'mastodon.',
+)
+
+_pending = Counter()
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def referrer_class(request):
+    if not TRACK_REFERRERS:
+        return ''
+    host = urlparse(request.META.get('HTTP_REFERER', '')).hostname or ''
+    if not host:
+        return 'direct'
+    if host == request.get_host().split(':')[0]:
+        return 'internal'
+    if any(engine in host for engine in SEARCH_ENGINES):
+        return 'search'
+    if any(site in host for site in SOCIAL_SITES):
+        return 'social'
+    return 'other'
+
+
+def client_ip(request):
+    """
+    The client's address: REMOTE_ADDR, or with PROXY_COUNT proxies in front
+    the X-Forwarded-For entry added by the outermost of them (entries further
+    left come from the client and can be forged)
+    """
+    if PROXY_COUNT:
+        forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')]
+        forwarded = [part for part in forwarded if part]
+        if len(forwarded) >= PROXY_COUNT:
+            return forwarded[-PROXY_COUNT]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def first_view(post, request):
+    """
+    False if this client already viewed ``post`` in the last
+    VIEW_DEDUP_SECONDS; the marker lives in the ANALYTICS_CACHE_ALIAS
+    cache, shared by the workers when REDIS_URL is set
+    """
+    if not VIEW_DEDUP_SECONDS:
+        return True
+    return caches[CACHE_ALIAS].add(f'blog:viewed:{post.pk}:{client_ip(request)}', True, VIEW_DEDUP_SECONDS)
+
+
+def record_view(post, request):
+    key = (post.pk, timezone.localdate(), referrer_class(request))
+    with _lock:
+        _pending[key] += 1
+        due = len(_pending) >= FLUSH_SIZE or time.monotonic() - _last_flush >= FLUSH_INTERVAL
+    if due:
+        flush()
+
+
+def pending_views():
+    """
+    Views counted in this process but not written yet
+    """
+    with _lock:
+        return sum(_pending.values())
+
+
+def seconds_since_flush():
+    return time.monotonic() - _last_flush
+
+
+def _add_views(post_id, period, start, referrer, views):
+    stats = PostViewStat.objects.filter(post_id=post_id, period=period, start=start, referrer=referrer)
+    if stats.update(views=F('views') + views):
+        return
+    _, created = PostViewStat.objects.get_or_create(
+        post_id=post_id, period=period, start=start, referrer=referrer,
+        defaults={'views': views},
+    )
+    if not created:
+        stats.update(views=F('views') + views)
+
+
+def flush():
+    global _pending, _last_flush
+    with _lock:
+        pending, _pending = _pending, Counter()
+        _last_flush = time.monotonic()
+    if not pending:
+        return 0
+
+    existing = set(Post.objects.filter(pk__in={post_id for post_id, _, _ in pending}).values_list('pk', flat=True))
+    with transaction.atomic():
+        for (post_id, day, referrer), views in pending.items():
+            if post_id in existing:
+                _add_views(post_id, 'day', day, referrer, views)
+    return sum(pending.values())
+
+
+atexit.register(flush)
+
+
+def _rollup(from_period, to_period, trunc, older_than):
+    """
+    Merge ``from_period`` rows that start before ``older_than`` into
+    ``to_period`` rows, one batch of posts per transaction
+    """
+    merged = 0
+    posts = Post.objects.filter(view_stats__period=from_period, view_stats__start__lt=older_than).distinct()
+    for post_ids in iter_pk_batches(posts):
+        with transaction.atomic():
+            rows = PostViewStat.objects.filter(
+                post_id__in=post_ids, period=from_period, start__lt=older_than,
+            )
+            totals = (
+                rows.annotate(bucket=trunc('start'))
+                .values('post_id', 'bucket', 'referrer')
+                .annotate(total=Sum('views'))
+                .order_by()
+            )
+            for row in totals:
+                _add_views(row['post_id'], to_period, row['bucket'], row['referrer'], row['total'])
+            merged += rows.delete()[0]
+    return merged
+
+
+def rollup(today=None):
+    """
+    Downsample old daily rows into weeks and old weekly rows into months.
+    Returns the number of (daily, weekly) rows merged.
+    """
+    today = today or timezone.localdate()
+    # Cut on period boundaries so a week or month is never split between levels
+    daily_cutoff = today - timedelta(days=DAILY_DAYS)
+    daily_cutoff -= timedelta(days=daily_cutoff.weekday())
+    weekly_cutoff = (today - timedelta(days=WEEKLY_DAYS)).replace(day=1)
+    return (
+        _rollup('day', 'week', TruncWeek, daily_cutoff),
+        _rollup('week', 'month', TruncMonth, weekly_cutoff),
+    )
+
+
+def daily_views(posts, days=90):
+    """
+    Total views per day for a set of posts over the last ``days`` days,
+    with missing days filled in as zero
+    """
+    today = timezone.localdate()
+    first_day = today - timedelta(days=days - 1)
+    totals = dict(
+        PostViewStat.objects.filter(post__in=posts, period='day', start__gte=first_day)
+        .values('start')
+        .annotate(total=Sum('views'))
+        .order_by()
+        .values_list('start', 'total')
+    )
+    return [(first_day + timedelta(days=i), totals.get(first_day + timedelta(days=i), 0)) for i in range(days)]
+
+
+def referrer_breakdown(posts, days=90):
+    first_day = timezone.localdate() - timedelta(days=days - 1)
+    labels = dict(PostViewStat.REFERRER_CHOICES)
+    rows = (
+        PostViewStat.objects.filter(post__in=posts, period='day', start__gte=first_day)
+        .values('referrer')
+        .annotate(total=Sum('views'))
+        .order_by('-total')
+    )
+    return [(labels.get(row['referrer'], row['referrer']), row['total']) for row in rows]
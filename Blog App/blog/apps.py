@@ -7,4 +7,17 @@ class BlogConfig(AppConfig):
     
     def ready(self):
         import blog.signals
+        from blog import analytics
+        from common import metrics
+        metrics.gauge(
+            'analytics_pending_views', 'Post views counted but not written yet, per process.',
+            analytics.pending_views,
+        )
+        metrics.gauge(
+            'analytics_seconds_since_flush', 'Seconds since the analytics views were last written, per process.',
+            lambda: round(analytics.seconds_since_flush(), 3),
+        )
+        from blog import lazy
+        if not lazy.LAZY_IMPORTS:
+            lazy.preload()
 
@@ -0,0 +1,187 @@
+"""
+Async versions of the listing views for ASGI deployments.
+
+Each listing page needs several independent queries (the page of posts, its
+COUNT, featured posts, popular categories). The sync views run them one after
+another; these views start them together so page latency is roughly the
+slowest query instead of the sum of all of them.
+
+Django's async ORM methods (acount(), async for, ...) still hop onto one
+shared thread per request, which serialises the queries again, so the work
+is handed to a small thread pool instead. Every worker thread keeps its own
+database connection; the first query of each request on a thread checks it
+the way request_started does for sync views, closing it when it is broken
+or older than CONN_MAX_AGE.
+
+Like the sync views, the pages are cached by hole_punched_cache_page, so a
+cache hit runs none of the queries.
+"""
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator, Page
+from django.db import close_old_connections
+from django.http import Http404
+from django.shortcuts import render
+from .forms import SearchForm
+from .models import Post, Category, Tag
+from . import trending
+from .caching import hole_punched_cache_page
+from .edge import add_keys, edge_cache, post_keys
+from .views import (
+    PAGE_CACHE_TIMEOUT, POSTS_PER_PAGE, published_posts, search_posts, get_featured_posts, get_popular_categories,
+)
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'BLOG_ASYNC_QUERY_WORKERS', 8),
+    thread_name_prefix='blog-query',
+)
+
+
+# The request a query belongs to, and the last one each pool thread served
+_request = contextvars.ContextVar('blog_async_request', default=None)
+_thread = threading.local()
+
+
+def _run_query(func, *args):
+    request = _request.get()
+    if request is None or getattr(_thread, 'request', None) is not request:
+        close_old_connections()
+        _thread.request = request
+    return func(*args)
+
+
+def query_pool_request(view_func):
+    """
+    Mark a request, so each pool thread checks its connection once for it
+    """
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        _request.set(object())
+        return await view_func(request, *args, **kwargs)
+    return wrapper
+
+
+async def run_query(func, *args):
+    """
+    Run a blocking ORM call on the query pool without blocking the event loop
+    """
+    loop = asyncio.get_running_loop()
+    # Copy the context so per-request state (e.g. replica pinning) follows the query
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, partial(context.run, _run_query, func, *args))
+
+
+def _page_slice(queryset, number):
+    offset = (number - 1) * POSTS_PER_PAGE
+    return list(queryset[offset:offset + POSTS_PER_PAGE])
+
+
+def _requested_page(request):
+    try:
+        return max(int(request.GET.get('page', 1)), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+async def _known(value):
+    return value
+
+
+async def paginate(request, queryset, *others, count=None):
+    """
+    Fetch a page of ``queryset``, its count and any ``others`` concurrently.
+
+    Mirrors Paginator.get_page(): the requested page is fetched optimistically
+    alongside the COUNT and only refetched when it turns out to be past the
+    last page. Pass ``count`` when it is already known to skip the COUNT.
+    Returns the Page followed by the results of ``others``.
+    """
+    number = _requested_page(request)
+    count, object_list, *results = await asyncio.gather(
+        run_query(queryset.count) if count is None else _known(count),
+        run_query(_page_slice, queryset, number),
+        *(run_query(func) for func in others),
+    )
+
+    paginator = Paginator(queryset, POSTS_PER_PAGE)
+    paginator.count = count
+    try:
+        paginator.validate_number(number)
+    except (PageNotAnInteger, EmptyPage):
+        number = paginator.num_pages
+        object_list = await run_query(_page_slice, queryset, number)
+    return (Page(object_list, number, paginator), *results)
+
+
+async def _get_or_404(queryset, **lookup):
+    try:
+        return await run_query(partial(queryset.get, **lookup))
+    except queryset.model.DoesNotExist:
+        raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+
+
+@edge_cache('home')
+@hole_punched_cache_page(PAGE_CACHE_TIMEOUT)
+@query_pool_request
+async def home(request):
+    search_form = SearchForm(request.GET)
+    posts = search_posts(published_posts(), search_form)
+
+    page_obj, featured_posts, trending_posts, popular_categories = await paginate(
+        request, posts,
+        lambda: list(get_featured_posts()),
+        trending.trending_posts,
+        lambda: list(get_popular_categories()),
+    )
+    add_keys(request, 'home', *post_keys([*page_obj, *featured_posts, *trending_posts]))
+    add_keys(request, *(f'category:{category.pk}' for category in popular_categories))
+
+    context = {
+        'page_obj': page_obj,
+        'search_form': search_form,
+        'featured_posts': featured_posts,
+        'trending_posts': trending_posts,
+        'popular_categories': popular_categories,
+    }
+    return await sync_to_async(render)(request, 'blog/home.html', context)
+
+
+@edge_cache('listing')
+@hole_punched_cache_page(PAGE_CACHE_TIMEOUT)
+@query_pool_request
+async def category_posts(request, slug):
+    category = await _get_or_404(Category.objects.all(), slug=slug)
+    posts = Post.objects.filter(category=category, status='published')
+    page_obj, trending_posts = await paginate(
+        request, posts, partial(trending.trending_posts, category=category),
+    )
+    add_keys(request, f'category:{category.pk}', *post_keys(page_obj))
+
+    context = {
+        'category': category,
+        'page_obj': page_obj,
+        'trending_posts': trending_posts,
+    }
+    return await sync_to_async(render)(request, 'blog/category_posts.html', context)
+
+
+@edge_cache('listing')
+@hole_punched_cache_page(PAGE_CACHE_TIMEOUT)
+@query_pool_request
+async def tag_posts(request, slug):
+    tag = await _get_or_404(Tag.objects.all(), slug=slug)
+    posts = Post.objects.filter(tags=tag, status='published')
+    page_obj, = await paginate(request, posts, count=tag.published_post_count)
+    add_keys(request, f'tag:{tag.pk}', *post_keys(page_obj))
+
+    context = {
+        'tag': tag,
+        'page_obj': page_obj,
+    }
+    return await sync_to_async(render)(request, 'blog/tag_posts.html', context)
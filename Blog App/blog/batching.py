@@ -0,0 +1,87 @@
+import logging
+
+from django.db import transaction
+from django.db.models import Max
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def iter_pk_batches(queryset, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Yield lists of primary keys from a queryset in ascending order.
+
+    Walks the table with keyset pagination (pk > last seen pk) so every batch
+    is a short indexed range scan, no matter how deep into the table we are.
+    """
+    pks_qs = queryset.order_by('pk').values_list('pk', flat=True)
+    last_pk = None
+    while True:
+        batch_qs = pks_qs if last_pk is None else pks_qs.filter(pk__gt=last_pk)
+        pks = list(batch_qs[:batch_size])
+        if not pks:
+            return
+        yield pks
+        last_pk = pks[-1]
+
+
+def iter_pk_ranges(queryset, batch_size=DEFAULT_BATCH_SIZE, after=None):
+    """
+    Yield (after, last) primary key bounds of consecutive batches of a
+    queryset, each covering at most ``batch_size`` rows with
+    after < pk <= last (after is None for the first batch).
+
+    Only the bound of each batch is read, so the rows themselves can be
+    streamed with .iterator() by the caller.
+    """
+    pks_qs = queryset.order_by('pk').values_list('pk', flat=True)
+    while True:
+        batch_qs = pks_qs if after is None else pks_qs.filter(pk__gt=after)
+        bound = list(batch_qs[batch_size - 1:batch_size])
+        if bound:
+            last = bound[0]
+        else:
+            last = batch_qs.aggregate(last=Max('pk'))['last']
+            if last is None:
+                return
+        yield after, last
+        after = last
+
+
+def update_in_batches(queryset, values, only_if=None, batch_size=DEFAULT_BATCH_SIZE, on_batch=None):
+    """
+    Apply ``queryset.update(**values)`` one batch at a time.
+
+    Each batch runs in its own short transaction. ``only_if`` holds lookups
+    that are re-checked inside that transaction, so rows changed by someone
+    else since the selection was made are skipped. ``on_batch`` is called with
+    the primary keys actually updated in each batch.
+
+    Returns the list of updated primary keys.
+    """
+    manager = queryset.model._default_manager
+    only_if = only_if or {}
+    total = queryset.count()
+    updated = []
+    processed = 0
+
+    for pks in iter_pk_batches(queryset, batch_size):
+        with transaction.atomic():
+            batch = list(
+                manager.select_for_update()
+                .filter(pk__in=pks, **only_if)
+                .values_list('pk', flat=True)
+            )
+            if batch:
+                manager.filter(pk__in=batch).update(**values)
+        updated.extend(batch)
+        processed += len(pks)
+        if on_batch and batch:
+            on_batch(batch)
+        logger.info(
+            '%s: processed %d/%d rows, %d updated',
+            queryset.model._meta.label, processed, total, len(updated),
+        )
+
+    return updated
@@ -0,0 +1,190 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.views.decorators.http import condition
+from common import metrics
+from . import holes
+
+# Everything an anonymous reader can see (published posts, categories, tags)
+# lives under the "content" namespace. Bumping its version invalidates every
+# cached page, feed and sitemap built from it without having to track keys.
+CONTENT = 'content'
+
+
+def _version_key(namespace):
+    return f'blog:version:{namespace}'
+
+
+def _modified_key(namespace):
+    return f'blog:modified:{namespace}'
+
+
+def get_version(namespace=CONTENT):
+    version = cache.get(_version_key(namespace))
+    if version is None:
+        cache.add(_version_key(namespace), 1, None)
+        version = cache.get(_version_key(namespace), 1)
+    return version
+
+
+def bump_version(namespace=CONTENT):
+    """
+    Invalidate all keys built with versioned_key() for a namespace
+    """
+    cache.set(_modified_key(namespace), time.time(), None)
+    try:
+        return cache.incr(_version_key(namespace))
+    except ValueError:
+        cache.set(_version_key(namespace), 2, None)
+        return 2
+
+
+def last_modified(namespace=CONTENT):
+    """
+    Time of the last bump_version() call for a namespace, as a Unix timestamp
+    """
+    modified = cache.get(_modified_key(namespace))
+    if modified is None:
+        modified = time.time()
+        cache.add(_modified_key(namespace), modified, None)
+    return modified
+
+
+def versioned_key(namespace, *parts):
+    return ':'.join(['blog', namespace, str(get_version(namespace)), *map(str, parts)])
+
+
+def _tee_to_cache(chunks, key, content_type, timeout):
+    """
+    Pass a streaming body through and cache it once it has been fully sent
+    """
+    body = []
+    for chunk in chunks:
+        body.append(chunk)
+        yield chunk
+    cache.set(key, {'body': b''.join(body), 'content_type': content_type}, timeout)
+
+
+def versioned_cache_page(timeout, namespace=CONTENT):
+    """
+    Cache GET responses per URL until the namespace version changes, and
+    answer conditional requests (If-None-Match / If-Modified-Since) with 304.
+
+    Streaming responses are still streamed on a miss; their body is cached
+    after the last chunk has gone out. A timeout of 0 turns the cache off.
+    """
+    def decorator(view_func):
+        if not timeout:
+            return view_func
+
+        @condition(
+            etag_func=lambda request, *args, **kwargs: f'{namespace}-{get_version(namespace)}',
+            last_modified_func=lambda request, *args, **kwargs: datetime.fromtimestamp(
+                last_modified(namespace), tz=timezone.utc,
+            ),
+        )
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            key = versioned_key(namespace, 'page', request.get_host(), request.get_full_path())
+            cached = cache.get(key)
+            metrics.cache_lookup('page', cached is not None)
+            if cached is not None:
+                return HttpResponse(cached['body'], content_type=cached['content_type'])
+
+            response = view_func(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            if response.streaming:
+                response.streaming_content = _tee_to_cache(
+                    response.streaming_content, key, response['Content-Type'], timeout,
+                )
+            else:
+                cache.set(key, {'body': response.content, 'content_type': response['Content-Type']}, timeout)
+            return response
+        return wrapper
+    return decorator
+
+
+def hole_punched_cache_page(timeout, namespace=CONTENT, on_hit=None):
+    """
+    Cache a page's shared body per URL until the namespace version changes,
+    for anonymous and signed-in readers alike, and fill in its per-user
+    {% hole %} regions on every request (see blog.holes). Works on sync and
+    async views; for async ones the cache, ``on_hit`` and the fragments run
+    in a thread.
+
+    ``on_hit(request, *args, **kwargs)`` runs on cache hits, for side effects
+    the skipped view would have had (e.g. counting a view). A timeout of 0
+    turns the cache off and the view renders its regions in place.
+    """
+    def decorator(view_func):
+        if not timeout:
+            return view_func
+
+        def lookup(request):
+            key = versioned_key(namespace, 'shell', request.get_host(), request.get_full_path())
+            cached = cache.get(key)
+            metrics.cache_lookup('shell', cached is not None)
+            return key, cached
+
+        def hit(request, cached, *args, **kwargs):
+            if on_hit is not None:
+                on_hit(request, *args, **kwargs)
+            response = HttpResponse(content_type=cached['content_type'])
+            # Edge cache keys the skipped view would have added (blog.edge)
+            request.surrogate_keys = getattr(request, 'surrogate_keys', set()) | set(cached['surrogate_keys'])
+            response.content = holes.fill(cached['body'], request)
+            return response
+
+        def store(request, key, response):
+            body = response.content.decode(response.charset)
+            if response.status_code == 200:
+                cache.set(key, {
+                    'body': body,
+                    'content_type': response['Content-Type'],
+                    'surrogate_keys': sorted(getattr(request, 'surrogate_keys', ())),
+                }, timeout)
+            response.content = holes.fill(body, request)
+            return response
+
+        if asyncio.iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def wrapper(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return await view_func(request, *args, **kwargs)
+
+                key, cached = await sync_to_async(lookup)(request)
+                if cached is not None:
+                    return await sync_to_async(hit)(request, cached, *args, **kwargs)
+                request.punch_holes = True
+                try:
+                    response = await view_func(request, *args, **kwargs)
+                finally:
+                    request.punch_holes = False
+                if response.streaming:
+                    return response
+                return await sync_to_async(store)(request, key, response)
+        else:
+            @wraps(view_func)
+            def wrapper(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return view_func(request, *args, **kwargs)
+
+                key, cached = lookup(request)
+                if cached is not None:
+                    return hit(request, cached, *args, **kwargs)
+                request.punch_holes = True
+                try:
+                    response = view_func(request, *args, **kwargs)
+                finally:
+                    request.punch_holes = False
+                if response.streaming:
+                    return response
+                return store(request, key, response)
+        return wrapper
+    return decorator
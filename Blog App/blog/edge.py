@@ -0,0 +1,185 @@
+"""
+Cache policy for a CDN or reverse proxy in front of the blog.
+
+Views declare how long the edge may keep their responses with
+@edge_cache(policy) and name what they show with add_keys() ("post:12",
+"category:3", "tag:7", "author:5", "home", "feeds", "sitemaps").
+EdgeCacheMiddleware turns that into Cache-Control and a Surrogate-Key
+header on anonymous responses; anything personal is marked private.
+
+When content changes, the signal handlers call purge() with the keys of
+the objects involved. Keys are collected per transaction and sent once it
+commits, through the backend named by EDGE_PURGE_BACKEND:
+
+- LocalPurger keeps the purged keys in memory (development and tests)
+- HttpPurger sends them to EDGE_PURGE_URL, e.g. a Varnish xkey endpoint
+  or the Fastly purge API
+"""
+import asyncio
+import logging
+import threading
+import urllib.request
+from collections import deque
+from functools import wraps
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTLS = {
+    'home': 60,
+    'listing': 300,
+    'post': 300,
+    'feed': 900,
+    'sitemap': 3600,
+}
+TTLS = {**DEFAULT_TTLS, **getattr(settings, 'EDGE_CACHE_TTLS', {})}
+BROWSER_MAX_AGE = getattr(settings, 'EDGE_BROWSER_MAX_AGE', 0)
+KEY_HEADER = getattr(settings, 'EDGE_SURROGATE_KEY_HEADER', 'Surrogate-Key')
+# Cookies that mean the response may be personal
+PERSONAL_COOKIES = (settings.SESSION_COOKIE_NAME, 'messages')
+
+
+def edge_cache(policy, keys=()):
+    """
+    Let the edge cache anonymous responses of a view for the TTL of
+    ``policy`` (EDGE_CACHE_TTLS), tagged with ``keys`` plus whatever the
+    view adds with add_keys()
+    """
+    def decorator(view_func):
+        if asyncio.iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def wrapper(request, *args, **kwargs):
+                request.edge_ttl = TTLS[policy]
+                add_keys(request, *keys)
+                return await view_func(request, *args, **kwargs)
+        else:
+            @wraps(view_func)
+            def wrapper(request, *args, **kwargs):
+                request.edge_ttl = TTLS[policy]
+                add_keys(request, *keys)
+                return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def add_keys(request, *keys):
+    if not hasattr(request, 'surrogate_keys'):
+        request.surrogate_keys = set()
+    request.surrogate_keys.update(keys)
+
+
+def post_keys(posts):
+    """
+    Keys of everything a post card or page shows about each post
+    """
+    keys = set()
+    for post in posts:
+        keys.add(f'post:{post.pk}')
+        keys.add(f'author:{post.author_id}')
+        if post.category_id:
+            keys.add(f'category:{post.category_id}')
+    return keys
+
+
+class EdgeCacheMiddleware:
+    """
+    Put it right after SecurityMiddleware so it sees the cookies set by
+    every other middleware.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        ttl = getattr(request, 'edge_ttl', None)
+        if ttl is None or response.has_header('Cache-Control'):
+            return response
+        if (
+            request.method not in ('GET', 'HEAD')
+            or response.status_code != 200
+            or response.cookies
+            or any(name in request.COOKIES for name in PERSONAL_COOKIES)
+        ):
+            patch_cache_control(response, private=True)
+            return response
+        patch_cache_control(response, public=True, max_age=BROWSER_MAX_AGE, s_maxage=ttl)
+        keys = getattr(request, 'surrogate_keys', ())
+        if keys:
+            response[KEY_HEADER] = ' '.join(sorted(keys))
+        return response
+
+
+class LocalPurger:
+    """
+    Keeps the most recent purges in memory instead of talking to a real edge
+    """
+    def __init__(self, keep=1000):
+        self.purged = deque(maxlen=keep)
+
+    def purge(self, keys):
+        self.purged.append(set(keys))
+
+    def reset(self):
+        self.purged.clear()
+
+
+class HttpPurger:
+    """
+    Sends the keys in the Surrogate-Key header of one request per batch.
+    EDGE_PURGE_HEADERS carries credentials, e.g. {'Fastly-Key': '...'}.
+    """
+    batch_size = 256  # Fastly's limit per purge request
+
+    def __init__(self):
+        self.url = settings.EDGE_PURGE_URL
+        self.method = getattr(settings, 'EDGE_PURGE_METHOD', 'PURGE')
+        self.headers = getattr(settings, 'EDGE_PURGE_HEADERS', {})
+        self.timeout = getattr(settings, 'EDGE_PURGE_TIMEOUT', 5)
+
+    def purge(self, keys):
+        keys = sorted(keys)
+        for start in range(0, len(keys), self.batch_size):
+            batch = ' '.join(keys[start:start + self.batch_size])
+            request = urllib.request.Request(
+                self.url, method=self.method, headers={**self.headers, 'Surrogate-Key': batch},
+            )
+            with urllib.request.urlopen(request, timeout=self.timeout):
+                pass
+
+
+_purger = None
+_local = threading.local()
+
+
+def get_purger():
+    global _purger
+    if _purger is None:
+        _purger = import_string(getattr(settings, 'EDGE_PURGE_BACKEND', 'blog.edge.LocalPurger'))()
+    return _purger
+
+
+def _send_pending():
+    keys = getattr(_local, 'keys', set())
+    _local.keys = set()
+    if not keys:
+        return
+    try:
+        get_purger().purge(keys)
+    except Exception:
+        # The change is committed; the edge copies expire with their TTL
+        logger.exception('Could not purge %d surrogate key(s)', len(keys))
+
+
+def purge(keys):
+    """
+    Purge ``keys`` from the edge once the current transaction commits.
+    Keys from one transaction go out together, each once.
+    """
+    if not hasattr(_local, 'keys'):
+        _local.keys = set()
+    _local.keys.update(keys)
+    transaction.on_commit(_send_pending)
@@ -0,0 +1,127 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+from .models import Post, Category, Tag
+
+FEED_ITEMS = getattr(settings, 'BLOG_FEED_ITEMS', 20)
+
+
+def feed_posts():
+    """
+    Narrow queryset for feed entries: only the columns the feed renders
+    """
+    return (
+        Post.objects.filter(status='published')
+        .select_related('author', 'category')
+        .prefetch_related('tags')
+        .only(
+            'title', 'slug', 'excerpt', 'content', 'created_at', 'updated_at',
+            'author__username', 'author__first_name', 'author__last_name',
+            'category__name',
+        )
+        .order_by('-created_at')
+    )
+
+
+class LatestPostsFeed(Feed):
+    title = 'TechPulse - Latest Posts'
+    description = 'The newest posts published on TechPulse.'
+
+    def link(self):
+        return reverse('blog:home')
+
+    def items(self):
+        return feed_posts()[:FEED_ITEMS]
+
+    def item_title(self, item):
+        return item.title
+
+    def item_description(self, item):
+        return item.excerpt or Truncator(strip_tags(item.content)).words(50)
+
+    def item_pubdate(self, item):
+        return item.created_at
+
+    def item_updateddate(self, item):
+        return item.updated_at
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_categories(self, item):
+        categories = [tag.name for tag in item.tags.all()]
+        if item.category:
+            categories.insert(0, item.category.name)
+        return categories
+
+
+class CategoryFeed(LatestPostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Category, slug=slug)
+
+    def title(self, obj):
+        return f'TechPulse - {obj.name}'
+
+    def description(self, obj):
+        return obj.description or f'Latest posts in {obj.name}.'
+
+    def link(self, obj):
+        return obj.get_absolute_url()
+
+    def items(self, obj):
+        return feed_posts().filter(category=obj)[:FEED_ITEMS]
+
+
+class TagFeed(LatestPostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Tag, slug=slug)
+
+    def title(self, obj):
+        return f'TechPulse - #{obj.name}'
+
+    def description(self, obj):
+        return f'Latest posts tagged {obj.name}.'
+
+    def link(self, obj):
+        return obj.get_absolute_url()
+
+    def items(self, obj):
+        return feed_posts().filter(tags=obj)[:FEED_ITEMS]
+
+
+class AuthorFeed(LatestPostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, obj):
+        return f'TechPulse - Posts by {obj.get_full_name() or obj.username}'
+
+    def description(self, obj):
+        return f'Latest posts written by {obj.username}.'
+
+    def link(self, obj):
+        return reverse('blog:home')
+
+    def items(self, obj):
+        return feed_posts().filter(author=obj)[:FEED_ITEMS]
+
+
+class LatestPostsAtomFeed(LatestPostsFeed):
+    feed_type = Atom1Feed
+
+
+class CategoryAtomFeed(CategoryFeed):
+    feed_type = Atom1Feed
+
+
+class TagAtomFeed(TagFeed):
+    feed_type = Atom1Feed
+
+
+class AuthorAtomFeed(AuthorFeed):
+    feed_type = Atom1Feed
@@ -1,7 +1,5 @@
 from django import forms
 from .models import Post, Comment, Category, Tag
-from crispy_forms.helper import FormHelper
-from crispy_forms.layout import Layout, Submit, Field, Div
 
 
 class PostForm(forms.ModelForm):
@@ -13,6 +11,10 @@ class PostForm(forms.ModelForm):
         }
     
     def __init__(self, *args, **kwargs):
+        # Imported here so workers boot without crispy-forms (see blog/lazy.py)
+        from crispy_forms.helper import FormHelper
+        from crispy_forms.layout import Submit
+
         super().__init__(*args, **kwargs)
         self.helper = FormHelper()
         self.helper.form_method = 'post'
@@ -0,0 +1,72 @@
+"""
+Hole-punched page caching.
+
+Pages differ per user only in a few small regions: the navbar and footer
+links, flash messages, the post owner's edit/delete buttons, the comment
+form and the comment delete icons. Those regions are rendered through the
+{% hole %} tag. While a page is being rendered for the cache, the tag leaves
+a placeholder instead, so the cached body is the same for every reader; on
+each request the placeholders are replaced by the matching fragment template
+rendered for the current user. A cache hit costs a few tiny template renders
+instead of the view's queries and the full page render, for signed-in
+readers as much as for anonymous ones.
+
+Placeholders carry an HMAC of SECRET_KEY so markup inside post content can't
+pose as a hole.
+"""
+import base64
+import json
+import re
+
+from django.template.loader import render_to_string
+from django.utils.crypto import salted_hmac
+from .forms import CommentForm
+
+FRAGMENTS = {
+    'nav_links': 'blog/holes/nav_links.html',
+    'mobile_nav_links': 'blog/holes/mobile_nav_links.html',
+    'footer_links': 'blog/holes/footer_links.html',
+    'messages': 'blog/holes/messages.html',
+    'post_actions': 'blog/holes/post_actions.html',
+    'comment_form': 'blog/holes/comment_form.html',
+    'comment_actions': 'blog/holes/comment_actions.html',
+}
+
+# Context a fragment needs that the page normally provides, for cache hits
+DEFAULTS = {
+    'comment_form': lambda: {'comment_form': CommentForm()},
+}
+
+_marker = None
+
+
+def marker():
+    global _marker
+    if _marker is None:
+        _marker = salted_hmac('blog.holes', 'placeholder').hexdigest()[:16]
+    return _marker
+
+
+def placeholder(name, params):
+    encoded = base64.urlsafe_b64encode(json.dumps(params, separators=(',', ':')).encode()).decode()
+    return f'<!--hole:{marker()}:{name}:{encoded}-->'
+
+
+def render_fragment(name, params, request):
+    context = DEFAULTS[name]() if name in DEFAULTS else {}
+    context.update(params)
+    return render_to_string(FRAGMENTS[name], context, request)
+
+
+def fill(body, request):
+    """
+    Replace every placeholder in a cached page body with its fragment
+    rendered for ``request``
+    """
+    pattern = re.compile(rf'<!--hole:{marker()}:(\w+):([\w=-]*)-->')
+
+    def replace(match):
+        params = json.loads(base64.urlsafe_b64decode(match.group(2)))
+        return render_fragment(match.group(1), params, request)
+
+    return pattern.sub(replace, body)
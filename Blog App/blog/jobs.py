@@ -0,0 +1,183 @@
+"""
+Resumable batch jobs for the blog's management commands.
+
+BatchJobCommand walks a table in primary key ranges of --chunk-size rows
+(batching.iter_pk_ranges). Each range is read with .iterator() and
+changed in its own transaction, so memory stays bounded by one chunk and
+a failure only loses the chunk in progress. After every commit the last
+primary key done is written to a checkpoint file in
+BLOG_JOB_CHECKPOINT_DIR; running the command again after a crash or an
+interrupt resumes after it (--restart starts over). The checkpoint also
+records the options of the run, and a run with other options refuses to
+resume from it. The file is removed when the job completes.
+
+Slow per-row work that needs no database (downloads, image decoding)
+goes in ``task``, a module level function mapped over task_args() of
+each row before the chunk's transaction starts. With --workers it runs
+in a process pool; rows with the same arguments share one call.
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from .batching import DEFAULT_BATCH_SIZE, iter_pk_ranges
+
+CHECKPOINT_DIR = getattr(settings, 'BLOG_JOB_CHECKPOINT_DIR', settings.BASE_DIR / 'job_checkpoints')
+
+
+class Checkpoint:
+    """
+    Progress of one job: the last primary key committed, the running
+    totals and the options of the run, kept in CHECKPOINT_DIR/<name>.json
+    """
+    def __init__(self, name):
+        self.path = os.path.join(CHECKPOINT_DIR, f'{name}.json')
+        self.options = None
+        self.after = None
+        self.processed = 0
+        self.changed = 0
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return False
+        self.after, self.processed, self.changed = state['after'], state['processed'], state['changed']
+        self.options = state.get('options')
+        return True
+
+    def save(self):
+        os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+        # Replaced in one step, so a crash never leaves half a file
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump({
+                'options': self.options, 'after': self.after, 'processed': self.processed, 'changed': self.changed,
+            }, f)
+        os.replace(self.path + '.tmp', self.path)
+
+    def clear(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class BatchJobCommand(BaseCommand):
+    """
+    Base for commands that change a table chunk by chunk. Subclasses
+    implement get_queryset() and process_chunk(), and may set ``task``
+    and override task_args() and report().
+    """
+    chunk_size = DEFAULT_BATCH_SIZE
+    task = None
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=self.chunk_size, help='Rows per transaction')
+        parser.add_argument(
+            '--workers', type=int, default=0,
+            help='Processes running the per-row task (default: run it in this process)',
+        )
+        parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint of an interrupted run')
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def task_args(self, row):
+        return row
+
+    def process_chunk(self, rows, results):
+        """
+        Apply one chunk, inside its transaction; ``results`` holds the
+        task's result for each row (None without a task). Returns the
+        number of rows changed.
+        """
+        raise NotImplementedError
+
+    def report(self, processed, changed):
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} row(s), {changed} changed'))
+
+    @property
+    def job_name(self):
+        return self.__module__.rsplit('.', 1)[-1]
+
+    def job_options(self, options):
+        """
+        The options of this command (not Django's common ones), as stored
+        in the checkpoint
+        """
+        common = {action.dest for action in BaseCommand().create_parser('', '')._actions}
+        common.update(BaseCommand.base_stealth_options, ['restart'])
+        job_options = {name: value for name, value in options.items() if name not in common}
+        return json.loads(json.dumps(job_options, default=str, sort_keys=True))
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        checkpoint = Checkpoint(self.job_name)
+        job_options = self.job_options(options)
+        if options['restart']:
+            checkpoint.clear()
+        elif checkpoint.load():
+            if checkpoint.options != job_options:
+                raise CommandError(
+                    f'The interrupted run used other options ({checkpoint.options}); run it again with '
+                    f'them to resume after pk {checkpoint.after}, or pass --restart to start over'
+                )
+            self.stdout.write(f'Resuming after pk {checkpoint.after} ({checkpoint.processed} row(s) already done)')
+        checkpoint.options = job_options
+
+        queryset = self.get_queryset()
+        remaining = queryset.filter(pk__gt=checkpoint.after) if checkpoint.after is not None else queryset
+        total = checkpoint.processed + remaining.count()
+
+        pool = None
+        if self.task is not None and options['workers'] > 0:
+            # Forked workers must not share this process's database connections
+            connections.close_all()
+            pool = ProcessPoolExecutor(options['workers'], initializer=django.setup)
+
+        start = time.perf_counter()
+        done = 0
+        try:
+            for after, last in iter_pk_ranges(queryset, options['chunk_size'], checkpoint.after):
+                rows_qs = queryset.filter(pk__lte=last).order_by('pk')
+                if after is not None:
+                    rows_qs = rows_qs.filter(pk__gt=after)
+                rows = list(rows_qs.iterator(chunk_size=options['chunk_size']))
+                results = self.run_task(rows, pool)
+                with transaction.atomic():
+                    changed = self.process_chunk(rows, results)
+                checkpoint.after = last
+                checkpoint.processed += len(rows)
+                checkpoint.changed += changed
+                checkpoint.save()
+
+                done += len(rows)
+                rate = done / max(time.perf_counter() - start, 1e-9)
+                self.stdout.write(
+                    f'{checkpoint.processed}/{total} row(s), {checkpoint.changed} changed, {rate:.0f} rows/s'
+                )
+        except KeyboardInterrupt:
+            self.stderr.write(f'Interrupted; run the command again to resume after pk {checkpoint.after}')
+            raise
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+        checkpoint.clear()
+        self.report(checkpoint.processed, checkpoint.changed)
+
+    def run_task(self, rows, pool):
+        if self.task is None:
+            return [None] * len(rows)
+        args = [self.task_args(row) for row in rows]
+        unique = list(dict.fromkeys(args))
+        task = type(self).task
+        outcomes = pool.map(task, unique) if pool is not None else map(task, unique)
+        results = dict(zip(unique, outcomes))
+        return [results[arg] for arg in args]
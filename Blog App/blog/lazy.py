@@ -0,0 +1,44 @@
+"""
+Deferred imports of the heavy third-party modules.
+
+Pillow (pulled in by the CKEditor upload views), crispy-forms and
+dj-database-url are needed by few requests. With LAZY_IMPORTS (the
+default) a worker boots without them and imports each on first use, so it
+answers its first request sooner. Where workers are forked from a
+preloaded application (gunicorn --preload) set LAZY_IMPORTS=False: ready()
+then imports them once in the master and every worker shares them.
+"""
+from importlib import import_module
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+LAZY_IMPORTS = getattr(settings, 'LAZY_IMPORTS', True)
+
+HEAVY_MODULES = [
+    'PIL.Image',
+    'ckeditor_uploader.views',
+    'crispy_forms.helper',
+    'crispy_forms.layout',
+]
+
+
+def preload():
+    for name in HEAVY_MODULES:
+        import_module(name)
+
+
+def lazy_view(dotted_path):
+    """
+    A view that imports the view at ``dotted_path`` on its first request
+    """
+    view = None
+
+    def wrapper(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = import_string(dotted_path)
+        return view(request, *args, **kwargs)
+    wrapper.__name__ = wrapper.__qualname__ = dotted_path.rsplit('.', 1)[-1]
+    wrapper.__module__ = dotted_path.rsplit('.', 1)[0]
+    return wrapper
@@ -0,0 +1,121 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from common.profiles import SQLITE_PRODUCTION_OPTIONS
+
+DEFAULT_PROFILE = {'init_command': '', 'transaction_mode': None, 'timeout': 5}
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure SQLite read/write throughput under concurrency with the default '
+        'pragmas and with SQLITE_PRODUCTION_OPTIONS, on a scratch database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help='Posts in the scratch table')
+        parser.add_argument('--readers', type=int, default=8, help='Concurrent reader threads')
+        parser.add_argument('--writers', type=int, default=4, help='Concurrent writer threads')
+        parser.add_argument('--seconds', type=float, default=5, help='Duration of each run')
+
+    def connect(self, path, profile):
+        conn = sqlite3.connect(path, timeout=profile['timeout'], isolation_level=None, check_same_thread=False)
+        for command in profile['init_command'].split(';'):
+            if command.strip():
+                conn.execute(command)
+        return conn
+
+    def seed(self, path, rows):
+        conn = sqlite3.connect(path)
+        conn.execute(
+            'CREATE TABLE post (id INTEGER PRIMARY KEY, title TEXT, content TEXT, '
+            'status TEXT, views INTEGER NOT NULL DEFAULT 0, created_at TEXT)'
+        )
+        conn.execute('CREATE INDEX post_created ON post (created_at)')
+        conn.executemany(
+            'INSERT INTO post (title, content, status, created_at) VALUES (?, ?, ?, ?)',
+            (
+                (f'Post {i}', 'lorem ipsum ' * 200, 'published', f'2025-01-01 00:00:{i:08d}')
+                for i in range(rows)
+            ),
+        )
+        conn.commit()
+        conn.close()
+
+    def run_profile(self, name, profile, options):
+        directory = tempfile.mkdtemp(prefix='bench_sqlite_')
+        path = os.path.join(directory, 'bench.sqlite3')
+        self.seed(path, options['rows'])
+
+        stop = threading.Event()
+        counts = {'reads': 0, 'writes': 0, 'locked': 0}
+        lock = threading.Lock()
+
+        def reader():
+            conn = self.connect(path, profile)
+            done = 0
+            while not stop.is_set():
+                # Listing page plus a detail lookup, like home and post_detail
+                conn.execute(
+                    "SELECT id, title FROM post WHERE status = 'published' "
+                    'ORDER BY created_at DESC LIMIT 9 OFFSET ?', (random.randrange(100) * 9,)
+                ).fetchall()
+                conn.execute('SELECT * FROM post WHERE id = ?', (random.randint(1, options['rows']),)).fetchone()
+                done += 1
+            with lock:
+                counts['reads'] += done
+
+        def writer():
+            conn = self.connect(path, profile)
+            begin = f'BEGIN {profile["transaction_mode"]}' if profile['transaction_mode'] else 'BEGIN'
+            done = locked = 0
+            while not stop.is_set():
+                try:
+                    # Read-then-write, like post.views += 1; post.save()
+                    conn.execute(begin)
+                    post_id = random.randint(1, options['rows'])
+                    views = conn.execute('SELECT views FROM post WHERE id = ?', (post_id,)).fetchone()[0]
+                    conn.execute('UPDATE post SET views = ? WHERE id = ?', (views + 1, post_id))
+                    conn.execute('COMMIT')
+                    done += 1
+                except sqlite3.OperationalError:
+                    locked += 1
+                    if conn.in_transaction:
+                        conn.execute('ROLLBACK')
+            with lock:
+                counts['writes'] += done
+                counts['locked'] += locked
+
+        threads = [threading.Thread(target=reader) for _ in range(options['readers'])]
+        threads += [threading.Thread(target=writer) for _ in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.unlink(path + suffix)
+        os.rmdir(directory)
+
+        seconds = options['seconds']
+        self.stdout.write(
+            f'{name:<12} reads/s {counts["reads"] / seconds:>10.1f}   '
+            f'writes/s {counts["writes"] / seconds:>8.1f}   '
+            f'"database is locked" errors {counts["locked"]}'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{options["readers"]} readers, {options["writers"]} writers, '
+            f'{options["rows"]} rows, {options["seconds"]}s per run'
+        )
+        self.run_profile('default', DEFAULT_PROFILE, options)
+        self.run_profile('production', SQLITE_PRODUCTION_OPTIONS, options)
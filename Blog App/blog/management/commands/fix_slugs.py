@@ -1,32 +1,40 @@
-from django.core.management.base import BaseCommand
+from django.utils import timezone
 from django.utils.text import slugify
+from blog.jobs import BatchJobCommand
 from blog.models import Post
+from blog.signals import posts_bulk_changed
 
 
-class Command(BaseCommand):
+class Command(BatchJobCommand):
     help = 'Fix any posts with missing or duplicate slugs'
 
-    def handle(self, *args, **kwargs):
-        posts_fixed = 0
-        
-        # Fix posts with empty slugs
-        posts_without_slugs = Post.objects.filter(slug='')
-        for post in posts_without_slugs:
-            base_slug = slugify(post.title)
+    def get_queryset(self):
+        return Post.objects.filter(slug='').only('pk', 'title', 'slug', 'updated_at')
+
+    def process_chunk(self, posts, results):
+        assigned = set()
+        now = timezone.now()
+        for post in posts:
+            base_slug = slugify(post.title) or 'post'
+            # One query for every slug the counter could collide with
+            taken = assigned | set(Post.objects.filter(slug__startswith=base_slug).values_list('slug', flat=True))
             slug = base_slug
             counter = 1
-            
-            # Ensure unique slug
-            while Post.objects.filter(slug=slug).exclude(pk=post.pk).exists():
+            while slug in taken:
                 slug = f'{base_slug}-{counter}'
                 counter += 1
-            
             post.slug = slug
-            post.save()
-            posts_fixed += 1
+            # bulk_update() skips auto_now, which save() used to set
+            post.updated_at = now
+            assigned.add(slug)
             self.stdout.write(self.style.SUCCESS(f'Fixed slug for post: {post.title} -> {slug}'))
-        
-        if posts_fixed == 0:
+
+        Post.objects.bulk_update(posts, ['slug', 'updated_at'])
+        posts_bulk_changed.send(sender=Post, post_ids=[post.pk for post in posts], fields=['slug'])
+        return len(posts)
+
+    def report(self, processed, changed):
+        if changed == 0:
             self.stdout.write(self.style.SUCCESS('No posts needed slug fixes'))
         else:
-            self.stdout.write(self.style.SUCCESS(f'Successfully fixed {posts_fixed} post(s)'))
+            self.stdout.write(self.style.SUCCESS(f'Successfully fixed {changed} post(s)'))
@@ -0,0 +1,57 @@
+from datetime import timedelta
+from itertools import islice
+
+from ckeditor_uploader.utils import storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from blog import uploads
+from blog.models import UploadReference
+
+
+class Command(BaseCommand):
+    help = 'Delete CKEditor uploads that no post references any more'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Files checked and deleted per batch')
+        parser.add_argument(
+            '--grace-hours', type=float, default=24,
+            help='Keep unreferenced files younger than this (uploads in posts still being written)',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+        parser.add_argument(
+            '--skip-reindex', action='store_true',
+            help='Trust the recorded references instead of re-scanning every post first',
+        )
+
+    def handle(self, *args, **options):
+        if not options['skip_reindex']:
+            posts = uploads.reindex(options['batch_size'])
+            self.stdout.write(f'Scanned {posts} post(s) for uploads')
+
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        files = uploads.iter_upload_files(storage)
+        checked = deleted = freed = 0
+        while True:
+            batch = list(islice(files, options['batch_size']))
+            if not batch:
+                break
+            checked += len(batch)
+            # A thumbnail lives as long as the upload it was made from
+            sources = {name: uploads.original_of(name) or name for name in batch}
+            referenced = set(
+                UploadReference.objects.filter(path__in=set(sources.values())).values_list('path', flat=True)
+            )
+            for name in batch:
+                if sources[name] in referenced or storage.get_modified_time(name) > cutoff:
+                    continue
+                freed += storage.size(name)
+                deleted += 1
+                if options['dry_run']:
+                    self.stdout.write(f'Would delete {name}')
+                else:
+                    storage.delete(name)
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {deleted} of {checked} upload(s), {freed / 1024 / 1024:.1f} MB'
+        ))
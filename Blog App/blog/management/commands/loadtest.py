@@ -0,0 +1,68 @@
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = '''Fire concurrent GET requests at a running server and report throughput and latency.
+
+Compare WSGI and ASGI deployments of the listing views by starting each one in
+turn and pointing this command at it, for example:
+
+    gunicorn advanced_blog.wsgi:application -w 4 --threads 8
+    BLOG_ASYNC_VIEWS=True gunicorn advanced_blog.asgi:application -w 4 -k uvicorn.workers.UvicornWorker
+
+    python manage.py loadtest http://127.0.0.1:8000/ --concurrency 64 --requests 2000
+'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', type=str, help='URL to request')
+        parser.add_argument('--concurrency', type=int, default=32, help='Requests in flight at once')
+        parser.add_argument('--requests', type=int, default=500, help='Total number of requests')
+        parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds')
+
+    def fetch(self, url, timeout):
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except (urllib.error.URLError, OSError):
+            status = None
+        return status, time.perf_counter() - start
+
+    def handle(self, *args, **options):
+        url = options['url']
+        total = options['requests']
+        concurrency = options['concurrency']
+
+        self.stdout.write(f'{total} requests to {url} with concurrency {concurrency}...')
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(lambda _: self.fetch(url, options['timeout']), range(total)))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(duration * 1000 for status, duration in results if status == 200)
+        errors = len(results) - len(latencies)
+        if not latencies:
+            self.stdout.write(self.style.ERROR(f'All {errors} requests failed'))
+            return
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+
+        self.stdout.write(f'Throughput: {len(results) / elapsed:.1f} req/s over {elapsed:.2f}s')
+        self.stdout.write(
+            f'Latency ms: mean {statistics.mean(latencies):.1f}  p50 {percentile(50):.1f}  '
+            f'p90 {percentile(90):.1f}  p99 {percentile(99):.1f}  max {latencies[-1]:.1f}'
+        )
+        if errors:
+            self.stdout.write(self.style.WARNING(f'{errors} request(s) failed or returned non-200'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All requests succeeded'))
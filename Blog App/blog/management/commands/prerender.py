@@ -0,0 +1,39 @@
+import shutil
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from blog import prerender
+from blog.models import PrerenderDependency
+
+
+class Command(BaseCommand):
+    help = 'Render every public page to PRERENDER_ROOT and rebuild the dependency graph'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Delete PRERENDER_ROOT and the recorded dependencies first',
+        )
+        parser.add_argument(
+            '--trending', action='store_true',
+            help='Only render the pages with a trending section again (run every few minutes)',
+        )
+
+    def handle(self, *args, **options):
+        if not prerender.enabled():
+            raise CommandError('PRERENDER_ROOT is not set')
+        if options['trending']:
+            pages = prerender.refresh_trending()
+            self.stdout.write(self.style.SUCCESS(f'Rendered {pages} page(s) with trending posts'))
+            return
+        if options['clear']:
+            shutil.rmtree(settings.PRERENDER_ROOT, ignore_errors=True)
+            PrerenderDependency.objects.all().delete()
+
+        started = time.monotonic()
+        pages = prerender.prerender_all()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered {pages} page(s) to {settings.PRERENDER_ROOT} in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from blog import profiling
+
+
+class Command(BaseCommand):
+    help = 'Print a signed header value that makes ProfilingMiddleware profile a request'
+
+    def handle(self, *args, **kwargs):
+        header = getattr(settings, 'PROFILER_HEADER', 'X-Profile')
+        hours = profiling.TOKEN_MAX_AGE / 3600
+        self.stdout.write(f'{header}: {profiling.make_token()}')
+        self.stderr.write(f'Valid for {hours:g} hours')
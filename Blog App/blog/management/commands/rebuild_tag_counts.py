@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from blog import tag_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute the published post count of every tag'
+
+    def handle(self, *args, **kwargs):
+        total = tag_counts.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Recounted {total} tag(s)'))
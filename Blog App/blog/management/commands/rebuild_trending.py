@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from blog.trending import rebuild_scores
+
+
+class Command(BaseCommand):
+    help = 'Recompute trending scores from hourly post activity and prune expired activity'
+
+    def handle(self, *args, **kwargs):
+        count = rebuild_scores()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt trending scores for {count} post(s)'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from blog import analytics
+
+
+class Command(BaseCommand):
+    help = 'Roll old daily post view counts up into weekly and monthly rows'
+
+    def handle(self, *args, **kwargs):
+        analytics.flush()
+        daily, weekly = analytics.rollup()
+        self.stdout.write(self.style.SUCCESS(
+            f'Merged {daily} daily row(s) into weeks and {weekly} weekly row(s) into months'
+        ))
@@ -0,0 +1,32 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database onto the local SQLite replicas (SQLITE_REPLICA_PATHS)'
+
+    def handle(self, *args, **kwargs):
+        primary = settings.DATABASES['default']
+        replicas = [
+            settings.DATABASES[alias] for alias in settings.REPLICA_DATABASES
+            if settings.DATABASES[alias]['ENGINE'] == 'django.db.backends.sqlite3'
+        ]
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('The primary database is not SQLite')
+        if not replicas:
+            raise CommandError('No SQLite replicas configured. Set SQLITE_REPLICA_PATHS first.')
+
+        source = sqlite3.connect(str(primary['NAME']))
+        try:
+            for replica in replicas:
+                # The backup API copies a consistent snapshot even while the primary is in use
+                target = sqlite3.connect(str(replica['NAME']))
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(self.style.SUCCESS(f'Synced replica {replica["NAME"]}'))
+        finally:
+            source.close()
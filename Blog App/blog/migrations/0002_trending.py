@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot', models.PositiveSmallIntegerField()),
+                ('hour', models.DateTimeField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('comments', models.PositiveIntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='blog.post')),
+            ],
+            options={
+                'verbose_name_plural': 'Post activity',
+                'constraints': [models.UniqueConstraint(fields=('post', 'slot'), name='unique_post_activity_slot')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='blog.post')),
+                ('log_score', models.FloatField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='blog.category')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-log_score'], name='blog_trendi_log_sco_856438_idx'), models.Index(fields=['category', '-log_score'], name='blog_trendi_categor_4d2551_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_trending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostViewStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')], default='day', max_length=5)),
+                ('start', models.DateField()),
+                ('referrer', models.CharField(blank=True, choices=[('', 'All'), ('direct', 'Direct'), ('internal', 'Internal'), ('search', 'Search'), ('social', 'Social'), ('other', 'Other')], default='', max_length=10)),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_stats', to='blog.post')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('post', 'period', 'start', 'referrer'), name='unique_post_view_stat')],
+            },
+        ),
+    ]
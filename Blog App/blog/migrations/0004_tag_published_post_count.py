@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:21
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_published_posts(apps, schema_editor):
+    Tag = apps.get_model('blog', 'Tag')
+    PostTag = apps.get_model('blog', 'Post').tags.through
+    published = (
+        PostTag.objects.filter(tag_id=OuterRef('pk'), post__status='published')
+        .values('tag_id')
+        .annotate(total=Count('*'))
+        .values('total')
+    )
+    Tag.objects.update(published_post_count=Coalesce(Subquery(published), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_post_view_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='published_post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_published_posts, migrations.RunPython.noop),
+    ]
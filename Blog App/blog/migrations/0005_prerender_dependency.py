@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_tag_published_post_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrerenderDependency',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255)),
+                ('key', models.CharField(db_index=True, max_length=50)),
+            ],
+            options={
+                'verbose_name_plural': 'Prerender dependencies',
+                'constraints': [models.UniqueConstraint(fields=('path', 'key'), name='unique_prerender_dependency')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_prerender_dependency'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadReference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(db_index=True, max_length=255)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_references', to='blog.post')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('post', 'path'), name='unique_upload_reference')],
+            },
+        ),
+    ]
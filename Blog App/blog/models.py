@@ -30,6 +30,8 @@ class Category(models.Model):
 class Tag(models.Model):
     name = models.CharField(max_length=50, unique=True)
     slug = models.SlugField(max_length=50, unique=True, blank=True)
+    # Maintained by blog.tag_counts; rebuild with `manage.py rebuild_tag_counts`
+    published_post_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -110,3 +112,119 @@ class Comment(models.Model):
     def __str__(self):
         return f'Comment by {self.user.username} on {self.post.title}'
 
+
+
+class PostActivity(models.Model):
+    """
+    Views and comments a post received during one hour. Each post has at most
+    TRENDING_WINDOW_HOURS of these rows: the slot for an hour is reused once
+    that hour falls out of the window, like a ring buffer.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='activity')
+    slot = models.PositiveSmallIntegerField()
+    hour = models.DateTimeField()
+    views = models.PositiveIntegerField(default=0)
+    comments = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name_plural = 'Post activity'
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'slot'], name='unique_post_activity_slot'),
+        ]
+    
+    def __str__(self):
+        return f'{self.post_id} @ {self.hour:%Y-%m-%d %H:00}'
+
+
+class TrendingScore(models.Model):
+    """
+    Exponentially decayed activity score of a post, stored as a logarithm
+    relative to a fixed epoch so it never needs rescaling and ordering by
+    log_score is the trending order (see blog.trending).
+    """
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='+')
+    log_score = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['-log_score']),
+            models.Index(fields=['category', '-log_score']),
+        ]
+    
+    def __str__(self):
+        return f'{self.post_id}: {self.log_score:.3f}'
+
+
+class PostViewStat(models.Model):
+    """
+    Number of views a post received during one day, week or month, split by
+    where readers came from. Daily rows are rolled up into weekly and then
+    monthly rows as they age (see blog.analytics).
+    """
+    PERIOD_CHOICES = (
+        ('day', 'Day'),
+        ('week', 'Week'),
+        ('month', 'Month'),
+    )
+    REFERRER_CHOICES = (
+        ('', 'All'),
+        ('direct', 'Direct'),
+        ('internal', 'Internal'),
+        ('search', 'Search'),
+        ('social', 'Social'),
+        ('other', 'Other'),
+    )
+    
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='view_stats')
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES, default='day')
+    start = models.DateField()
+    referrer = models.CharField(max_length=10, choices=REFERRER_CHOICES, blank=True, default='')
+    views = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'period', 'start', 'referrer'], name='unique_post_view_stat',
+            ),
+        ]
+    
+    def __str__(self):
+        return f'{self.post_id} {self.period} {self.start}: {self.views}'
+
+
+class PrerenderDependency(models.Model):
+    """
+    One edge of the pre-render dependency graph: the static page at ``path``
+    shows the object identified by ``key`` ("post:12", "category:3", "tag:7"
+    or "home") and must be rendered again when it changes (see blog.prerender).
+    """
+    path = models.CharField(max_length=255)
+    key = models.CharField(max_length=50, db_index=True)
+    
+    class Meta:
+        verbose_name_plural = 'Prerender dependencies'
+        constraints = [
+            models.UniqueConstraint(fields=['path', 'key'], name='unique_prerender_dependency'),
+        ]
+    
+    def __str__(self):
+        return f'{self.path} -> {self.key}'
+
+
+class UploadReference(models.Model):
+    """
+    A CKEditor upload (path relative to MEDIA_ROOT) used in a post's content.
+    Uploads nobody references are deleted by the gc_uploads command.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='upload_references')
+    path = models.CharField(max_length=255, db_index=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'path'], name='unique_upload_reference'),
+        ]
+    
+    def __str__(self):
+        return f'{self.post_id}: {self.path}'
@@ -0,0 +1,299 @@
+"""
+Static pre-rendering ("publish to disk") of the public pages.
+
+When PRERENDER_ROOT is set, the home page and the first page of every
+category and tag listing, plus every published post, are rendered to
+PRERENDER_ROOT/<url path>/index.html as content changes. Anonymous GET
+requests without a query string are answered from those files, by the front
+proxy or by PrerenderedPageMiddleware, so Django only sees signed-in users,
+later listing pages, searches and writes.
+
+Each rendered page records the objects it shows as PrerenderDependency rows
+("post:12", "category:3", "tag:7", "home"). A change marks the keys of the
+objects it touched and, once the transaction commits, only the pages
+depending on those keys are rendered again. A page whose object is gone or
+no longer published is removed.
+
+Trending sections change with views rather than saves, so the pages showing
+one also depend on "trending" and are rendered again by refresh_trending()
+(python manage.py prerender --trending, run every few minutes).
+"""
+import logging
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Q
+from django.http import FileResponse
+from django.template.loader import render_to_string
+from django.urls import Resolver404, resolve, reverse
+from django.utils._os import safe_join
+from .forms import CommentForm, SearchForm
+from .models import Category, Post, PrerenderDependency, Tag
+from . import trending
+from .views import POSTS_PER_PAGE, published_posts, get_featured_posts, get_popular_categories
+
+logger = logging.getLogger(__name__)
+
+ROOT = getattr(settings, 'PRERENDER_ROOT', '')
+# Cookies that mean the page may differ from what an anonymous reader sees
+PERSONAL_COOKIES = (settings.SESSION_COOKIE_NAME, 'messages')
+
+_local = threading.local()
+
+
+def enabled():
+    return bool(ROOT)
+
+
+def page_file(path):
+    return safe_join(ROOT, path.lstrip('/'), 'index.html')
+
+
+def _listing_deps(posts):
+    deps = set()
+    for post in posts:
+        deps.add(f'post:{post.pk}')
+        if post.category_id:
+            deps.add(f'category:{post.category_id}')
+    return deps
+
+
+def _first_page(posts, count=None):
+    paginator = Paginator(posts, POSTS_PER_PAGE)
+    if count is not None:
+        paginator.count = count
+    return paginator.get_page(1)
+
+
+def render_home():
+    page_obj = _first_page(published_posts())
+    featured_posts = list(get_featured_posts())
+    trending_posts = trending.trending_posts()
+    popular_categories = list(get_popular_categories())
+    context = {
+        'page_obj': page_obj,
+        'search_form': SearchForm(),
+        'featured_posts': featured_posts,
+        'trending_posts': trending_posts,
+        'popular_categories': popular_categories,
+    }
+    deps = {'home', 'trending'} | _listing_deps([*page_obj, *featured_posts, *trending_posts])
+    deps.update(f'category:{category.pk}' for category in popular_categories)
+    return render_to_string('blog/home.html', context), deps
+
+
+def render_post(slug):
+    post = published_posts().filter(slug=slug).first()
+    if post is None:
+        return None
+    related_posts = list(
+        Post.objects.filter(category=post.category, status='published').exclude(id=post.id)[:3]
+    )
+    context = {
+        'post': post,
+        'comments': post.comments.filter(approved=True).select_related('user'),
+        'comment_form': CommentForm(),
+        'related_posts': related_posts,
+        'prerendered': True,
+    }
+    deps = _listing_deps([post, *related_posts])
+    deps.update(f'tag:{tag.pk}' for tag in post.tags.all())
+    return render_to_string('blog/post_detail.html', context), deps
+
+
+def render_category(slug):
+    category = Category.objects.filter(slug=slug).first()
+    if category is None:
+        return None
+    page_obj = _first_page(published_posts().filter(category=category))
+    trending_posts = trending.trending_posts(category=category)
+    context = {
+        'category': category,
+        'page_obj': page_obj,
+        'trending_posts': trending_posts,
+    }
+    deps = {f'category:{category.pk}', 'trending'} | _listing_deps([*page_obj, *trending_posts])
+    return render_to_string('blog/category_posts.html', context), deps
+
+
+def render_tag(slug):
+    tag = Tag.objects.filter(slug=slug).first()
+    if tag is None:
+        return None
+    page_obj = _first_page(published_posts().filter(tags=tag), count=tag.published_post_count)
+    context = {
+        'tag': tag,
+        'page_obj': page_obj,
+    }
+    deps = {f'tag:{tag.pk}'} | _listing_deps(page_obj)
+    return render_to_string('blog/tag_posts.html', context), deps
+
+
+RENDERERS = {
+    'blog:home': render_home,
+    'blog:post_detail': render_post,
+    'blog:category': render_category,
+    'blog:tag': render_tag,
+}
+
+
+def _write(path, html):
+    filename = page_file(path)
+    directory = os.path.dirname(filename)
+    os.makedirs(directory, exist_ok=True)
+    # Write next to the target and rename so a page is never served half written
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(html)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, filename)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def remove_page(path):
+    PrerenderDependency.objects.filter(path=path).delete()
+    try:
+        os.unlink(page_file(path))
+    except FileNotFoundError:
+        pass
+
+
+def render_page(path):
+    """
+    Render one page to disk and record its dependencies. Returns False if
+    the page no longer exists and was removed.
+    """
+    try:
+        match = resolve(path)
+    except Resolver404:
+        remove_page(path)
+        return False
+    renderer = RENDERERS.get(match.view_name)
+    if renderer is None:
+        return False
+    result = renderer(**match.kwargs)
+    if result is None:
+        remove_page(path)
+        return False
+
+    html, deps = result
+    _write(path, html)
+    with transaction.atomic():
+        PrerenderDependency.objects.filter(path=path).delete()
+        PrerenderDependency.objects.bulk_create([PrerenderDependency(path=path, key=key) for key in deps])
+    return True
+
+
+def pages_for(keys):
+    return set(
+        PrerenderDependency.objects.filter(key__in=keys).values_list('path', flat=True).distinct()
+    )
+
+
+def _render_pending():
+    keys, paths = getattr(_local, 'keys', set()), getattr(_local, 'paths', set())
+    _local.keys, _local.paths = set(), set()
+    if not keys and not paths:
+        return
+    for path in sorted(paths | pages_for(keys)):
+        try:
+            render_page(path)
+        except Exception:
+            # The change is already committed; the page is fixed by the next render
+            logger.exception('Could not pre-render %s', path)
+
+
+def mark_dirty(keys=(), paths=()):
+    """
+    Render the pages depending on ``keys``, plus ``paths``, once the current
+    transaction commits. Keys marked during one transaction are rendered
+    together, each page once.
+    """
+    if not enabled():
+        return
+    if not hasattr(_local, 'keys'):
+        _local.keys, _local.paths = set(), set()
+    _local.keys.update(keys)
+    _local.paths.update(paths)
+    transaction.on_commit(_render_pending)
+
+
+def posts_changed(post_ids, tag_ids=(), category_ids=()):
+    """
+    Mark the posts, their own pages and the listings they are or should be
+    in. ``tag_ids`` and ``category_ids`` add listings the posts just left,
+    whose post counts changed.
+    """
+    if not enabled():
+        return
+    posts = Post.objects.filter(pk__in=post_ids)
+    keys = {'home', *(f'post:{post_id}' for post_id in post_ids)}
+    paths = set()
+    category_ids = set(category_ids)
+    for slug, status, category_id in posts.values_list('slug', 'status', 'category_id'):
+        category_ids.add(category_id)
+        if status == 'published':
+            paths.add(reverse('blog:post_detail', kwargs={'slug': slug}))
+    tags = Tag.objects.filter(Q(pk__in=set(tag_ids)) | Q(posts__in=posts)).distinct()
+    paths.update(tag.get_absolute_url() for tag in tags.only('slug'))
+    paths.update(category.get_absolute_url() for category in Category.objects.filter(pk__in=category_ids).only('slug'))
+    mark_dirty(keys, paths)
+
+
+def prerender_all():
+    """
+    Render every public page from scratch. Returns the number of pages written.
+    """
+    paths = [reverse('blog:home')]
+    paths += [post.get_absolute_url() for post in Post.objects.filter(status='published').only('slug').iterator()]
+    paths += [category.get_absolute_url() for category in Category.objects.only('slug').iterator()]
+    paths += [
+        tag.get_absolute_url()
+        for tag in Tag.objects.filter(published_post_count__gt=0).only('slug').iterator()
+    ]
+    # Pages that are no longer reachable are removed by render_page()
+    paths += PrerenderDependency.objects.exclude(path__in=paths).values_list('path', flat=True).distinct()
+    return sum(render_page(path) for path in dict.fromkeys(paths))
+
+
+def refresh_trending():
+    """
+    Render the pages with a trending section again. Returns the number of
+    pages written.
+    """
+    return sum(render_page(path) for path in sorted(pages_for({'trending'})))
+
+
+class PrerenderedPageMiddleware:
+    """
+    Answer anonymous GET requests from the pre-rendered files. Put it right
+    after WhiteNoise; a front proxy can do the same with try_files (see
+    DEPLOYMENT.md) and Django will not see these requests at all.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (
+            enabled()
+            and request.method in ('GET', 'HEAD')
+            and not request.META.get('QUERY_STRING')
+            and not any(name in request.COOKIES for name in PERSONAL_COOKIES)
+        ):
+            try:
+                filename = page_file(request.path_info)
+            except SuspiciousFileOperation:
+                filename = None
+            if filename and os.path.isfile(filename):
+                response = FileResponse(open(filename, 'rb'), content_type='text/html; charset=utf-8')
+                response['X-Prerendered'] = '1'
+                return response
+        return self.get_response(request)
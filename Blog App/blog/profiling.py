@@ -0,0 +1,186 @@
+"""
+Sampling profiler for production requests.
+
+ProfilingMiddleware profiles PROFILER_SAMPLE_RATE of all requests, plus any
+request carrying a valid signed PROFILER_HEADER (see the profile_token
+command). A request that is not picked costs one random() call and a
+header lookup.
+
+For a profiled request a sampler thread records the request thread's stack
+every PROFILER_INTERVAL seconds, in the collapsed "frame;frame;frame count"
+format that flamegraph.pl and speedscope read. Samples inside a template's
+render are also added up per template, and every SQL statement is timed
+through connection.execute_wrapper().
+
+The PROFILER_KEEP slowest profiles per URL name are kept in the cache, so
+every worker's slowest requests end up in one place. They are shown at
+/admin/profiles/.
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import connections
+from django.template.base import Template
+
+SAMPLE_RATE = getattr(settings, 'PROFILER_SAMPLE_RATE', 0.0)
+INTERVAL = getattr(settings, 'PROFILER_INTERVAL', 0.005)
+KEEP = getattr(settings, 'PROFILER_KEEP', 10)
+HEADER = 'HTTP_' + getattr(settings, 'PROFILER_HEADER', 'X-Profile').upper().replace('-', '_')
+TOKEN_MAX_AGE = getattr(settings, 'PROFILER_TOKEN_MAX_AGE', 24 * 60 * 60)
+MAX_QUERIES = 200
+MAX_STACKS = 500
+STORE_TIMEOUT = 7 * 24 * 60 * 60
+
+INDEX_KEY = 'blog:profiles:index'
+TOKEN_SALT = 'blog.profiling'
+TEMPLATE_RENDER = Template._render.__code__
+
+
+def make_token():
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign('profile')
+
+
+def valid_token(token):
+    try:
+        signing.TimestampSigner(salt=TOKEN_SALT).unsign(token, max_age=TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def _frame_label(code):
+    filename = code.co_filename.replace('\\', '/')
+    short = '/'.join(filename.rsplit('/', 2)[-2:])
+    return f'{code.co_qualname} ({short}:{code.co_firstlineno})'
+
+
+class Sampler(threading.Thread):
+    """
+    Records the stack of one thread at a fixed interval until stopped
+    """
+    def __init__(self, thread_id, interval=INTERVAL):
+        super().__init__(name='blog-profiler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.templates = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            templates = set()
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                if frame.f_code is TEMPLATE_RENDER:
+                    templates.add(getattr(frame.f_locals.get('self'), 'name', None) or '<string>')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(labels))] += 1
+            self.templates.update(templates)
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class QueryTimer:
+    def __init__(self, alias, queries):
+        self.alias = alias
+        self.queries = queries
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((self.alias, sql, (time.perf_counter() - start) * 1000))
+
+
+def store(profile):
+    """
+    Keep ``profile`` if it is among the KEEP slowest for its URL name
+    """
+    key = f'blog:profiles:{profile["url_name"]}'
+    profiles = cache.get(key, [])
+    if len(profiles) >= KEEP and profile['duration'] <= profiles[-1]['duration']:
+        return
+    profiles = sorted([*profiles, profile], key=lambda p: p['duration'], reverse=True)[:KEEP]
+    cache.set(key, profiles, STORE_TIMEOUT)
+    names = cache.get(INDEX_KEY, [])
+    if profile['url_name'] not in names:
+        cache.set(INDEX_KEY, sorted([*names, profile['url_name']]), STORE_TIMEOUT)
+
+
+def stored_profiles():
+    """
+    {url name: profiles, slowest first}
+    """
+    names = cache.get(INDEX_KEY, [])
+    found = cache.get_many([f'blog:profiles:{name}' for name in names])
+    return {name: found.get(f'blog:profiles:{name}', []) for name in names}
+
+
+class ProfilingMiddleware:
+    """
+    Put it first so the time spent in every other middleware is included.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def sampled(self, request):
+        token = request.META.get(HEADER)
+        if token:
+            return valid_token(token)
+        return SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+    def __call__(self, request):
+        if not self.sampled(request):
+            return self.get_response(request)
+
+        queries = []
+        sampler = Sampler(threading.get_ident())
+        started_at = time.time()
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(QueryTimer(connection.alias, queries)))
+                response = self.get_response(request)
+        finally:
+            sampler.stop()
+        duration = (time.perf_counter() - start) * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        store({
+            'url_name': match.view_name if match and match.view_name else 'unresolved',
+            'path': request.get_full_path(),
+            'method': request.method,
+            'status': response.status_code,
+            'started_at': started_at,
+            'duration': duration,
+            'pid': os.getpid(),
+            'samples': sampler.samples,
+            'interval': sampler.interval,
+            'stacks': dict(sampler.stacks.most_common(MAX_STACKS)),
+            'templates': {
+                name: count * sampler.interval * 1000 for name, count in sampler.templates.most_common()
+            },
+            'queries': sorted(queries, key=lambda q: q[2], reverse=True)[:MAX_QUERIES],
+            'query_count': len(queries),
+            'sql_time': sum(q[2] for q in queries),
+        })
+        return response
@@ -0,0 +1,45 @@
+from collections import Counter
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse
+from django.shortcuts import render
+from . import profiling
+
+
+@staff_member_required
+def profile_list(request):
+    context = {
+        'title': 'Slowest profiled requests',
+        'profiles': profiling.stored_profiles(),
+    }
+    return render(request, 'blog/profiles/list.html', context)
+
+
+@staff_member_required
+def profile_detail(request, url_name, index):
+    profiles = profiling.stored_profiles().get(url_name, [])
+    if index >= len(profiles):
+        raise Http404('Profile not found')
+    profile = profiles[index]
+
+    stacks = '\n'.join(f'{stack} {count}' for stack, count in profile['stacks'].items())
+    if request.GET.get('format') == 'collapsed':
+        # Feed this to flamegraph.pl or drop it on speedscope.app
+        response = HttpResponse(stacks, content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{url_name}-{index}.collapsed"'
+        return response
+
+    # Self time: samples where the function was the innermost frame
+    leaves = Counter()
+    for stack, count in profile['stacks'].items():
+        leaves[stack.rsplit(';', 1)[-1]] += count
+    interval_ms = profile['interval'] * 1000
+    context = {
+        'title': f'{url_name}: {profile["path"]}',
+        'url_name': url_name,
+        'index': index,
+        'profile': profile,
+        'stacks': stacks,
+        'hot_functions': [(name, count * interval_ms) for name, count in leaves.most_common(25)],
+    }
+    return render(request, 'blog/profiles/detail.html', context)
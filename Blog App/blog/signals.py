@@ -1,8 +1,20 @@
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import Signal, receiver
 from django.core.mail import send_mail
 from django.conf import settings
-from .models import Post, Comment
+from .caching import bump_version
+from .models import Post, Comment, Category, Tag, TrendingScore
+from . import edge, prerender, tag_counts, trending, uploads
+
+
+# Sent once per admin bulk action instead of one post_save per row.
+# posts_bulk_status_changed: post_ids, status
+# comments_bulk_moderated: comment_ids, post_ids, approved
+# posts_bulk_changed: post_ids, fields (batch jobs, see blog/jobs.py)
+posts_bulk_status_changed = Signal()
+comments_bulk_moderated = Signal()
+posts_bulk_changed = Signal()
 
 
 @receiver(post_save, sender=Post)
@@ -34,3 +46,263 @@ def comment_notification(sender, instance, created, **kwargs):
         #     subject = f'New comment on your post: {instance.post.title}'
         #     message = f'{instance.user.username} commented: {instance.content[:100]}'
         #     send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [instance.post.author.email])
+
+
+@receiver(posts_bulk_status_changed)
+def bulk_published_notification(sender, post_ids, status, **kwargs):
+    """
+    Send a single notification for a batch of posts published from the admin
+    """
+    if status == 'published' and post_ids:
+        print(f'{len(post_ids)} post(s) have been published!')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_content_cache(sender, instance, **kwargs):
+    """
+    Invalidate cached pages, feeds and sitemaps once the change is committed
+    """
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= {'views'}:
+        return
+    transaction.on_commit(bump_version)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def invalidate_content_cache_on_tags(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(bump_version)
+
+
+@receiver(posts_bulk_status_changed)
+def invalidate_content_cache_on_bulk_status(sender, post_ids, **kwargs):
+    if post_ids:
+        transaction.on_commit(bump_version)
+
+
+@receiver(posts_bulk_changed)
+def invalidate_content_cache_on_bulk_change(sender, post_ids, **kwargs):
+    if post_ids:
+        transaction.on_commit(bump_version)
+
+
+@receiver(comments_bulk_moderated)
+def invalidate_content_cache_on_bulk_moderation(sender, comment_ids, **kwargs):
+    if comment_ids:
+        transaction.on_commit(bump_version)
+
+
+@receiver(post_save, sender=Comment)
+def record_comment_activity(sender, instance, created, **kwargs):
+    if created and instance.approved:
+        trending.record_comment(instance.post)
+
+
+@receiver(post_save, sender=Post)
+def sync_trending_category(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Keep the category copied onto the post's trending score in step
+    """
+    if created or (update_fields and set(update_fields) <= {'views'}):
+        return
+    TrendingScore.objects.filter(post=instance).exclude(
+        category_id=instance.category_id,
+    ).update(category_id=instance.category_id)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def update_tag_counts_on_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Recount the tags whose post links changed
+    """
+    if action == 'pre_clear':
+        # pk_set is not provided for clear(), so remember what is about to go
+        if reverse:
+            instance._cleared_tag_ids = {instance.pk}
+        else:
+            instance._cleared_tag_ids = set(instance.tags.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        tag_counts.recount(getattr(instance, '_cleared_tag_ids', ()))
+    elif action in ('post_add', 'post_remove'):
+        tag_counts.recount([instance.pk] if reverse else pk_set)
+
+
+@receiver(post_save, sender=Post)
+def update_tag_counts_on_save(sender, instance, created, update_fields=None, **kwargs):
+    # A new post has no tags until the form saves them through m2m_changed
+    if created or (update_fields and set(update_fields) <= {'views'}):
+        return
+    tag_counts.recount(tag_counts.tag_ids_for_posts([instance.pk]))
+
+
+@receiver(pre_delete, sender=Post)
+def remember_tags_on_delete(sender, instance, **kwargs):
+    instance._deleted_tag_ids = tag_counts.tag_ids_for_posts([instance.pk])
+
+
+@receiver(post_delete, sender=Post)
+def update_tag_counts_on_delete(sender, instance, **kwargs):
+    tag_counts.recount(getattr(instance, '_deleted_tag_ids', ()))
+
+
+@receiver(posts_bulk_status_changed)
+def update_tag_counts_on_bulk_status(sender, post_ids, **kwargs):
+    if post_ids:
+        tag_counts.recount(tag_counts.tag_ids_for_posts(post_ids))
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_category(sender, instance, update_fields=None, **kwargs):
+    """
+    Keep the category a post is moving out of, for pre-rendering and edge purges
+    """
+    if instance.pk and not (update_fields and set(update_fields) <= {'views'}):
+        instance._previous_category_id = (
+            Post.objects.filter(pk=instance.pk).values_list('category_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Post)
+def prerender_post(sender, instance, update_fields=None, **kwargs):
+    """
+    Re-render the static pages showing a post once the change is committed
+    """
+    if update_fields and set(update_fields) <= {'views'}:
+        return
+    prerender.posts_changed([instance.pk], category_ids=[getattr(instance, '_previous_category_id', None)])
+
+
+@receiver(post_delete, sender=Post)
+def prerender_deleted_post(sender, instance, **kwargs):
+    prerender.posts_changed(
+        [instance.pk],
+        tag_ids=getattr(instance, '_deleted_tag_ids', ()),
+        category_ids=[instance.category_id],
+    )
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def prerender_on_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        if action == 'post_clear':
+            prerender.mark_dirty([f'tag:{instance.pk}'], [instance.get_absolute_url()])
+        else:
+            prerender.posts_changed(pk_set, tag_ids=[instance.pk])
+    else:
+        removed = pk_set if action == 'post_remove' else getattr(instance, '_cleared_tag_ids', ())
+        prerender.posts_changed([instance.pk], tag_ids=removed or ())
+
+
+@receiver(posts_bulk_status_changed)
+@receiver(posts_bulk_changed)
+def prerender_on_bulk_status(sender, post_ids, **kwargs):
+    if post_ids:
+        prerender.posts_changed(post_ids)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def prerender_on_comment(sender, instance, **kwargs):
+    prerender.mark_dirty([f'post:{instance.post_id}'])
+
+
+@receiver(comments_bulk_moderated)
+def prerender_on_bulk_moderation(sender, post_ids, **kwargs):
+    prerender.mark_dirty(f'post:{post_id}' for post_id in post_ids)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+def prerender_taxonomy(sender, instance, **kwargs):
+    key = f'{sender._meta.model_name}:{instance.pk}'
+    prerender.mark_dirty(['home', key], [instance.get_absolute_url()])
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+def prerender_deleted_taxonomy(sender, instance, **kwargs):
+    prerender.mark_dirty(['home', f'{sender._meta.model_name}:{instance.pk}'])
+
+
+def _post_purge_keys(posts, tag_ids=(), category_ids=()):
+    keys = {'home', 'feeds', 'sitemaps'} | edge.post_keys(posts)
+    keys.update(f'tag:{tag_id}' for tag_id in tag_ids)
+    keys.update(f'category:{category_id}' for category_id in category_ids if category_id)
+    return keys
+
+
+@receiver(post_save, sender=Post)
+def purge_post(sender, instance, update_fields=None, **kwargs):
+    """
+    Purge the edge copies of everything showing a post once the change is committed
+    """
+    if update_fields and set(update_fields) <= {'views'}:
+        return
+    edge.purge(_post_purge_keys(
+        [instance],
+        tag_ids=tag_counts.tag_ids_for_posts([instance.pk]),
+        category_ids=[getattr(instance, '_previous_category_id', None)],
+    ))
+
+
+@receiver(post_delete, sender=Post)
+def purge_deleted_post(sender, instance, **kwargs):
+    edge.purge(_post_purge_keys([instance], tag_ids=getattr(instance, '_deleted_tag_ids', ())))
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def purge_on_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        keys = {f'tag:{instance.pk}', *(f'post:{post_id}' for post_id in pk_set or ())}
+    else:
+        tag_ids = pk_set if action != 'post_clear' else getattr(instance, '_cleared_tag_ids', ())
+        keys = {f'post:{instance.pk}', *(f'tag:{tag_id}' for tag_id in tag_ids)}
+    edge.purge(keys)
+
+
+@receiver(posts_bulk_status_changed)
+@receiver(posts_bulk_changed)
+def purge_on_bulk_status(sender, post_ids, **kwargs):
+    if post_ids:
+        posts = Post.objects.filter(pk__in=post_ids).only('pk', 'author_id', 'category_id')
+        edge.purge(_post_purge_keys(posts, tag_ids=tag_counts.tag_ids_for_posts(post_ids)))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def purge_on_comment(sender, instance, **kwargs):
+    edge.purge([f'post:{instance.post_id}'])
+
+
+@receiver(comments_bulk_moderated)
+def purge_on_bulk_moderation(sender, post_ids, **kwargs):
+    edge.purge(f'post:{post_id}' for post_id in post_ids)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def purge_taxonomy(sender, instance, **kwargs):
+    edge.purge(['home', 'feeds', 'sitemaps', f'{sender._meta.model_name}:{instance.pk}'])
+
+
+@receiver(post_save, sender=Post)
+def track_uploads(sender, instance, update_fields=None, **kwargs):
+    """
+    Record which CKEditor uploads the post's content uses
+    """
+    if update_fields and 'content' not in update_fields:
+        return
+    uploads.sync_references(instance)
@@ -0,0 +1,106 @@
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import F, Max
+from django.http import Http404, StreamingHttpResponse
+from django.urls import reverse
+from .models import Post, Category, Tag
+
+# The sitemap protocol allows at most 50,000 URLs per file. Posts are split
+# into fixed primary-key ranges so a sub-sitemap is one indexed range scan and
+# its URL stays stable as new posts are added.
+CHUNK_SIZE = getattr(settings, 'BLOG_SITEMAP_CHUNK_SIZE', 50000)
+ITERATOR_CHUNK_SIZE = 2000
+
+SLUG_PLACEHOLDER = 'slug-placeholder'
+
+
+def _lastmod(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%S+00:00') if value else None
+
+
+def _entry(tag, loc, lastmod=None):
+    lastmod = f'<lastmod>{lastmod}</lastmod>' if lastmod else ''
+    return f'<{tag}><loc>{escape(loc)}</loc>{lastmod}</{tag}>\n'
+
+
+def _stream(root_tag, entries):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield f'<{root_tag} xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    yield from entries
+    yield f'</{root_tag}>\n'
+
+
+def _url_builder(request, url_name):
+    """
+    Build absolute URLs for a slug-based route without calling reverse()
+    once per row
+    """
+    template = request.build_absolute_uri(reverse(url_name, kwargs={'slug': SLUG_PLACEHOLDER}))
+    return lambda slug: template.replace(SLUG_PLACEHOLDER, slug)
+
+
+def _xml_response(chunks):
+    return StreamingHttpResponse(chunks, content_type='application/xml; charset=utf-8')
+
+
+def sitemap_index(request):
+    published = Post.objects.filter(status='published')
+    chunks = (
+        published.annotate(chunk=F('pk') / CHUNK_SIZE)
+        .values('chunk')
+        .annotate(lastmod=Max('updated_at'))
+        .order_by('chunk')
+    )
+
+    def entries():
+        yield _entry('sitemap', request.build_absolute_uri(
+            reverse('blog:sitemap_section', kwargs={'section': 'pages'})
+        ))
+        for section in ('categories', 'tags'):
+            yield _entry('sitemap', request.build_absolute_uri(
+                reverse('blog:sitemap_section', kwargs={'section': section})
+            ))
+        for row in chunks.iterator():
+            yield _entry('sitemap', request.build_absolute_uri(
+                reverse('blog:sitemap_posts', kwargs={'chunk': row['chunk']})
+            ), _lastmod(row['lastmod']))
+
+    return _xml_response(_stream('sitemapindex', entries()))
+
+
+def sitemap_posts(request, chunk):
+    posts = (
+        Post.objects.filter(
+            status='published',
+            pk__gte=chunk * CHUNK_SIZE,
+            pk__lt=(chunk + 1) * CHUNK_SIZE,
+        )
+        .order_by('pk')
+        .values_list('slug', 'updated_at')
+    )
+    if not posts.exists():
+        raise Http404('No posts in this sitemap chunk')
+    post_url = _url_builder(request, 'blog:post_detail')
+
+    def entries():
+        for slug, updated_at in posts.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+            yield _entry('url', post_url(slug), _lastmod(updated_at))
+
+    return _xml_response(_stream('urlset', entries()))
+
+
+def sitemap_section(request, section):
+    if section == 'pages':
+        entries = [_entry('url', request.build_absolute_uri(reverse('blog:home')))]
+    elif section == 'categories':
+        category_url = _url_builder(request, 'blog:category')
+        slugs = Category.objects.filter(posts__status='published').values_list('slug', flat=True).distinct()
+        entries = (_entry('url', category_url(slug)) for slug in slugs.iterator())
+    elif section == 'tags':
+        tag_url = _url_builder(request, 'blog:tag')
+        slugs = Tag.objects.filter(posts__status='published').values_list('slug', flat=True).distinct()
+        entries = (_entry('url', tag_url(slug)) for slug in slugs.iterator())
+    else:
+        raise Http404('Unknown sitemap section')
+    return _xml_response(_stream('urlset', entries))
@@ -0,0 +1,70 @@
+import hashlib
+import os
+import re
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+class ContentAddressedMixin:
+    """
+    Store uploads under the SHA-256 of their bytes, so uploading the same
+    image twice keeps one file:
+
+        <CKEDITOR_UPLOAD_PATH>/ab/cd/abcd1234....png
+
+    Only the extension of the requested name is kept. The thumbnails
+    ckeditor derives from a stored file ("<digest>_thumb.<ext>" next to
+    it) keep their name; any other upload is content-addressed, whatever it
+    is called.
+    """
+    upload_path = getattr(settings, 'CKEDITOR_UPLOAD_PATH', 'uploads/')
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in iter(lambda: content.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(self.upload_path, digest[:2], digest[2:4], digest + extension).replace('\\', '/')
+
+    def is_thumbnail(self, name):
+        """
+        Whether name is the thumbnail ckeditor derives from a stored upload
+        """
+        root, extension = os.path.splitext(name.replace('\\', '/'))
+        if not root.endswith('_thumb'):
+            return False
+        original = root[:-len('_thumb')] + extension
+        directory, digest = os.path.split(os.path.splitext(original)[0])
+        return (
+            re.fullmatch('[0-9a-f]{64}', digest) is not None
+            and directory == os.path.join(self.upload_path, digest[:2], digest[2:4]).replace('\\', '/')
+            and self.exists(original)
+        )
+
+    def get_available_name(self, name, max_length=None):
+        """
+        The name unchanged: _save() content-addresses it, and a file already
+        stored under a content address or thumbnail name holds the same
+        bytes, so it is reused rather than saved again under a free name
+        (which would no longer end in _thumb)
+        """
+        return name
+
+    def _save(self, name, content):
+        if not self.is_thumbnail(name):
+            name = self.content_name(name, content)
+        if self.exists(name):
+            # Uploaded again: restart the gc_uploads grace period
+            os.utime(self.path(name))
+            return name
+        return super()._save(name, content)
+
+
+class ContentAddressedStorage(ContentAddressedMixin, FileSystemStorage):
+    pass
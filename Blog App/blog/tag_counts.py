@@ -0,0 +1,52 @@
+"""
+Published post counters on Tag.
+
+Counts are recomputed for just the tags touched by a change, using one
+UPDATE with a correlated COUNT over the post/tag link table. Recounting
+instead of adding or subtracting one keeps the counters exact even when
+m2m_changed reports links that did not actually change.
+"""
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from .batching import iter_pk_batches
+from .models import Post, Tag
+
+PostTag = Post.tags.through
+
+
+BATCH_SIZE = 500
+
+
+def _chunks(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield ids[start:start + BATCH_SIZE]
+
+
+def recount(tag_ids):
+    published = (
+        PostTag.objects.filter(tag_id=OuterRef('pk'), post__status='published')
+        .values('tag_id')
+        .annotate(total=Count('*'))
+        .values('total')
+    )
+    for chunk in _chunks(tag_ids):
+        Tag.objects.filter(pk__in=chunk).update(published_post_count=Coalesce(Subquery(published), 0))
+
+
+def tag_ids_for_posts(post_ids):
+    tag_ids = set()
+    for chunk in _chunks(post_ids):
+        tag_ids.update(PostTag.objects.filter(post_id__in=chunk).values_list('tag_id', flat=True))
+    return tag_ids
+
+
+def rebuild(batch_size=BATCH_SIZE):
+    """
+    Recount every tag, one batch of tags at a time
+    """
+    total = 0
+    for tag_ids in iter_pk_batches(Tag.objects.all(), batch_size):
+        recount(tag_ids)
+        total += len(tag_ids)
+    return total
@@ -0,0 +1,64 @@
+import math
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+from blog import holes
+from common import metrics
+from blog.caching import CONTENT, versioned_key
+from blog.models import Tag
+
+register = template.Library()
+
+TAG_CLOUD_TIMEOUT = getattr(settings, 'BLOG_TAG_CLOUD_CACHE_TIMEOUT', 60 * 60)
+TAG_CLOUD_SIZES = 5
+
+
+def _tag_cloud(limit):
+    tags = list(
+        Tag.objects.filter(published_post_count__gt=0)
+        .order_by('-published_post_count', 'name')
+        .values('name', 'slug', 'published_post_count')[:limit]
+    )
+    if not tags:
+        return []
+    # Scale on a log curve so one very popular tag doesn't flatten the rest
+    top = math.log(tags[0]['published_post_count'] + 1)
+    bottom = math.log(tags[-1]['published_post_count'] + 1)
+    spread = (top - bottom) or 1
+    for tag in tags:
+        weight = (math.log(tag['published_post_count'] + 1) - bottom) / spread
+        tag['size'] = 1 + round(weight * (TAG_CLOUD_SIZES - 1))
+    return sorted(tags, key=lambda tag: tag['name'].lower())
+
+
+@register.inclusion_tag('blog/includes/tag_cloud.html')
+def tag_cloud(limit=30):
+    """
+    Most used tags, sized by their published post count. Cached until the
+    content changes, and read from Tag.published_post_count so rendering it
+    never counts posts.
+    """
+    key = versioned_key(CONTENT, 'tag_cloud', limit)
+    tags = cache.get(key)
+    metrics.cache_lookup('tag_cloud', tags is not None)
+    if tags is None:
+        tags = _tag_cloud(limit)
+        cache.set(key, tags, TAG_CLOUD_TIMEOUT)
+    return {'tags': tags}
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, **params):
+    """
+    Per-user region of a page. Renders blog/holes/<name>.html in place, or
+    a placeholder for blog.holes.fill() while the page is rendered for the
+    shared cache.
+    """
+    request = context.get('request')
+    if getattr(request, 'punch_holes', False):
+        return mark_safe(holes.placeholder(name, params))
+    template = context.template.engine.get_template(holes.FRAGMENTS[name])
+    with context.push(**params):
+        return template.render(context)
@@ -1,3 +1,888 @@
-from django.test import TestCase
+import contextvars
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.db import connection
+from django.db.models import F
+from django.db.utils import OperationalError
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.http import HttpResponse
+from django.template import Context, Engine, defaultfilters, engines
+from django.template.loader_tags import BlockNode, IncludeNode
+from django.test import RequestFactory
+from django.urls import ResolverMatch, resolve
+from django.utils import timezone
+from advanced_blog import db_router
+from blog import (
+    analytics, async_views, batching, caching, edge, holes, jobs, lazy, prerender, profiling, tag_counts, trending,
+)
+from common import metrics, querylog, template_timing
+from blog.models import Category, Comment, Post, PostActivity, Tag, TrendingScore
+from blog.templatetags import blog_tags
+from blog.signals import comments_bulk_moderated, posts_bulk_status_changed
+
+
+def png(color='teal'):
+    from PIL import Image
+
+    data = io.BytesIO()
+    Image.new('RGB', (40, 30), color).save(data, 'PNG')
+    return data.getvalue()
+
+
+def published_post(title='A post', author=None, **fields):
+    author = author or User.objects.get_or_create(username='author')[0]
+    return Post.objects.create(title=title, content='<p>Text</p>', author=author, status='published', **fields)
+
+
+class MediaRootMixin:
+    """
+    Uploads go to a scratch MEDIA_ROOT, removed after each test
+    """
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+
+@override_settings(CKEDITOR_IMAGE_BACKEND='ckeditor_uploader.backends.PillowBackend')
+class CKEditorUploadTests(MediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user('editor', password='secret', is_staff=True)
+
+    def upload(self, client, data, name='picture.png'):
+        return client.post('/ckeditor/upload/', {'upload': SimpleUploadedFile(name, data, 'image/png')})
+
+    def test_upload_view_is_csrf_exempt(self):
+        self.assertTrue(resolve('/ckeditor/upload/').func.csrf_exempt)
+
+    def test_staff_upload_without_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.staff)
+        response = self.upload(client, png())
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('/media/uploads/', response.content.decode())
+
+    def stored_files(self):
+        return sorted(
+            os.path.relpath(os.path.join(root, name), self.media_root).replace(os.sep, '/')
+            for root, _, names in os.walk(self.media_root) for name in names
+        )
+
+    def test_duplicate_upload_keeps_one_image_and_one_thumbnail(self):
+        self.client.force_login(self.staff)
+        first = self.upload(self.client, png(), name='first.png')
+        files = self.stored_files()
+        second = self.upload(self.client, png(), name='second.png')
+
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(self.stored_files(), files)
+        self.assertEqual(len(files), 2)
+        image, thumbnail = files
+        self.assertTrue(thumbnail.endswith('_thumb.png'))
+        self.assertEqual(os.path.splitext(thumbnail)[0], os.path.splitext(image)[0] + '_thumb')
+
+    def test_different_images_are_stored_apart(self):
+        self.client.force_login(self.staff)
+        self.upload(self.client, png('teal'))
+        self.upload(self.client, png('orange'))
+        self.assertEqual(len(self.stored_files()), 4)
+
+    def test_uploads_named_like_thumbnails_are_content_addressed(self):
+        self.client.force_login(self.staff)
+        self.upload(self.client, png('teal'), name='photo_thumb.png')
+        self.upload(self.client, png('orange'), name='photo_thumb.png')
+        self.assertEqual(len(self.stored_files()), 4)
+        self.assertFalse(any('photo' in name for name in self.stored_files()))
+
+    def test_duplicate_upload_restarts_the_grace_period(self):
+        self.client.force_login(self.staff)
+        self.upload(self.client, png())
+        paths = [os.path.join(self.media_root, name) for name in self.stored_files()]
+        for path in paths:
+            os.utime(path, (0, 0))
+        self.upload(self.client, png())
+        self.assertTrue(all(os.path.getmtime(path) > 0 for path in paths))
+
+    def test_upload_requires_staff(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(User.objects.create_user('reader', password='secret'))
+        self.assertEqual(self.upload(client, png()).status_code, 302)
+
+
+class LazyImportTests(TestCase):
+    def test_view_is_imported_on_its_first_request(self):
+        view = mock.Mock(return_value=HttpResponse('page'))
+        with mock.patch.object(lazy, 'import_string', return_value=view) as import_string:
+            wrapper = lazy.lazy_view('some.module.upload')
+            self.assertFalse(import_string.called)
+            request = RequestFactory().get('/')
+            responses = [wrapper(request, 1), wrapper(request, 2)]
+        import_string.assert_called_once_with('some.module.upload')
+        self.assertEqual([response.content for response in responses], [b'page', b'page'])
+        view.assert_called_with(request, 2)
+        self.assertEqual((wrapper.__name__, wrapper.__module__), ('upload', 'some.module'))
+
+    def test_boot_leaves_the_heavy_modules_unimported(self):
+        code = (
+            'import sys, django; django.setup(); import advanced_blog.urls, blog.forms; '
+            'print(sorted(set(sys.modules) & set(sys.argv[1:])))'
+        )
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'advanced_blog.settings', 'LAZY_IMPORTS': 'True'}
+        output = subprocess.run(
+            [sys.executable, '-c', code, *lazy.HEAVY_MODULES],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        self.assertEqual(output.strip(), '[]')
+
+    def test_ready_preloads_without_lazy_imports(self):
+        app = django_apps.get_app_config('blog')
+        with mock.patch.object(lazy, 'preload') as preload:
+            app.ready()
+            self.assertFalse(preload.called)
+            with mock.patch.object(lazy, 'LAZY_IMPORTS', False):
+                app.ready()
+        preload.assert_called_once_with()
+
+
+class VersionedCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.post = published_post('First post')
+
+    def test_saving_a_post_bumps_the_version(self):
+        before = caching.get_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            published_post('Second post')
+        self.assertEqual(caching.get_version(), before + 1)
+        self.assertNotEqual(caching.versioned_key(caching.CONTENT, 'page'), f'blog:content:{before}:page')
+
+    def test_cached_feed_is_rebuilt_after_a_content_change(self):
+        self.assertNotIn('Second post', self.client.get('/feed/').content.decode())
+        # TestCase never commits, so this save doesn't bump the version
+        second = published_post('Second post')
+        self.assertNotIn('Second post', self.client.get('/feed/').content.decode())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.save()
+        self.assertIn('Second post', self.client.get('/feed/').content.decode())
+
+    def test_etag_follows_the_version(self):
+        etag = self.client.get('/feed/')['ETag']
+        self.assertEqual(self.client.get('/feed/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        caching.bump_version()
+        self.assertEqual(self.client.get('/feed/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_timeout_zero_turns_the_cache_off(self):
+        view = lambda request: HttpResponse('page')  # noqa: E731
+        self.assertIs(caching.versioned_cache_page(0)(view), view)
+        self.assertIs(caching.hole_punched_cache_page(0)(view), view)
+
+
+class TrendingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # On the hour, the time rebuild_scores() gives a bucket's events
+        self.now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        news = Category.objects.create(name='News')
+        self.old = published_post('Old favourite', category=news)
+        self.new = published_post('New post', category=news)
+
+    def hours_ago(self, hours):
+        return self.now - timedelta(hours=hours)
+
+    def test_score_halves_every_half_life(self):
+        log_score = trending.log_weight(1.0, self.now)
+        later = self.now + timedelta(hours=trending.HALF_LIFE_HOURS)
+        self.assertAlmostEqual(trending.current_score(log_score, self.now), 1.0)
+        self.assertAlmostEqual(trending.current_score(log_score, later), 0.5)
+
+    def test_recent_activity_outranks_older_activity(self):
+        for _ in range(3):
+            trending.record_view(self.old, self.hours_ago(3 * trending.HALF_LIFE_HOURS))
+        trending.record_view(self.new, self.now)
+        self.assertEqual(trending.trending_posts(), [self.new, self.old])
+
+    def test_comments_weigh_more_than_views(self):
+        trending.record_view(self.old, self.now)
+        trending.record_comment(self.new, self.now)
+        self.assertEqual(trending.trending_posts(), [self.new, self.old])
+
+    def test_scores_add_up_like_a_rebuild(self):
+        for hours in (0, 5, 30):
+            trending.record_view(self.old, self.hours_ago(hours))
+        trending.record_comment(self.old, self.hours_ago(2))
+        incremental = TrendingScore.objects.get(post=self.old).log_score
+        trending.rebuild_scores(self.now)
+        self.assertAlmostEqual(TrendingScore.objects.get(post=self.old).log_score, incremental)
+
+    def test_slot_left_by_an_old_hour_starts_again(self):
+        trending.record_view(self.old, self.hours_ago(trending.WINDOW_HOURS))
+        trending.record_view(self.old, self.now)
+        trending.record_view(self.old, self.now)
+        bucket, = PostActivity.objects.filter(post=self.old)
+        self.assertEqual((bucket.views, bucket.comments), (2, 0))
+        self.assertEqual(bucket.hour, self.now.replace(minute=0, second=0, microsecond=0))
+
+    def test_prerendered_trending_sections_are_refreshed(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        with mock.patch.object(prerender, 'ROOT', root):
+            prerender.render_page('/')
+            trending.record_view(self.new, self.now)
+            cache.clear()
+            self.assertEqual(prerender.refresh_trending(), 1)
+            with open(prerender.page_file('/'), encoding='utf-8') as f:
+                self.assertIn('Trending Now', f.read())
+
+
+class TagCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.python = Tag.objects.create(name='python')
+        self.django = Tag.objects.create(name='django')
+        self.post = published_post()
+        self.post.tags.add(self.python, self.django)
+
+    def counts(self):
+        return dict(Tag.objects.values_list('name', 'published_post_count'))
+
+    def test_counts_follow_tagging_and_publishing(self):
+        draft = Post.objects.create(title='Draft', content='<p>Text</p>', author=self.post.author)
+        draft.tags.add(self.python)
+        self.assertEqual(self.counts(), {'python': 1, 'django': 1})
+
+        draft.status = 'published'
+        draft.save()
+        self.assertEqual(self.counts(), {'python': 2, 'django': 1})
+
+        self.post.tags.clear()
+        self.assertEqual(self.counts(), {'python': 1, 'django': 0})
+        draft.delete()
+        self.assertEqual(self.counts(), {'python': 0, 'django': 0})
+
+    def test_bulk_status_change_recounts(self):
+        Post.objects.filter(pk=self.post.pk).update(status='draft')
+        posts_bulk_status_changed.send(sender=Post, post_ids=[self.post.pk], status='draft')
+        self.assertEqual(self.counts(), {'python': 0, 'django': 0})
+
+    def test_rebuild_fixes_drifted_counts(self):
+        Tag.objects.update(published_post_count=7)
+        self.assertEqual(tag_counts.rebuild(batch_size=1), 2)
+        self.assertEqual(self.counts(), {'python': 1, 'django': 1})
+
+    def test_tag_cloud_reads_the_counters(self):
+        second = published_post('Second')
+        second.tags.add(self.python)
+        with self.assertNumQueries(1):
+            tags = blog_tags.tag_cloud()['tags']
+        self.assertEqual([(tag['name'], tag['size']) for tag in tags], [('django', 1), ('python', 5)])
+        with self.assertNumQueries(0):
+            self.assertEqual(blog_tags.tag_cloud()['tags'], tags)
+
+
+class HolePunchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user('reader', password='secret')
+
+    def request(self, user=None):
+        request = RequestFactory().get('/')
+        request.user = user or AnonymousUser()
+        return request
+
+    def test_placeholder_is_filled_for_each_reader(self):
+        body = f'<nav>{holes.placeholder("nav_links", {})}</nav>'
+        self.assertIn('Login', holes.fill(body, self.request()))
+        self.assertIn('Logout', holes.fill(body, self.request(self.reader)))
+
+    def test_placeholder_without_the_secret_marker_is_left_alone(self):
+        forged = holes.placeholder('nav_links', {}).replace(holes.marker(), '0' * 16)
+        self.assertEqual(holes.fill(forged, self.request(self.reader)), forged)
+
+    def test_marker_depends_on_the_secret_key(self):
+        marker = holes.marker()
+        with mock.patch.object(holes, '_marker', None), override_settings(SECRET_KEY='another secret'):
+            self.assertNotEqual(holes.marker(), marker)
+
+    def test_cached_page_is_personalised_on_a_hit(self):
+        post = published_post(category=Category.objects.create(name='News'))
+        with mock.patch('blog.caching.metrics.cache_lookup') as lookup:
+            anonymous = self.client.get(post.get_absolute_url()).content.decode()
+            self.client.force_login(self.reader)
+            signed_in = self.client.get(post.get_absolute_url()).content.decode()
+        self.assertEqual([c.args for c in lookup.call_args_list if c.args[0] == 'shell'],
+                         [('shell', False), ('shell', True)])
+        self.assertNotIn('Logout', anonymous)
+        self.assertIn('Logout', signed_in)
+        self.assertNotIn('<!--hole:', signed_in)
+
+
+class EdgeCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.post = published_post(category=Category.objects.create(name='News'))
+        edge.get_purger().reset()
+
+    def test_anonymous_page_is_public_with_surrogate_keys(self):
+        response = self.client.get(self.post.get_absolute_url())
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn(f's-maxage={edge.TTLS["post"]}', response['Cache-Control'])
+        keys = response['Surrogate-Key'].split()
+        for key in (f'post:{self.post.pk}', f'author:{self.post.author_id}', f'category:{self.post.category_id}'):
+            self.assertIn(key, keys)
+
+    def test_request_with_a_session_cookie_is_private(self):
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = 'anything'
+        response = self.client.get(self.post.get_absolute_url())
+        self.assertIn('private', response['Cache-Control'])
+        self.assertFalse(response.has_header('Surrogate-Key'))
+
+    def test_response_setting_a_cookie_is_private(self):
+        def view(request):
+            response = HttpResponse('page')
+            response.set_cookie('seen', '1')
+            return response
+
+        response = edge.EdgeCacheMiddleware(edge.edge_cache('home', keys=['home'])(view))(RequestFactory().get('/'))
+        self.assertIn('private', response['Cache-Control'])
+        self.assertFalse(response.has_header('Surrogate-Key'))
+
+    def test_saving_a_post_purges_its_keys_once_committed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.save()
+            self.assertEqual(list(edge.get_purger().purged), [])
+        purged, = edge.get_purger().purged
+        self.assertIn(f'post:{self.post.pk}', purged)
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.post = published_post(category=Category.objects.create(name='News'))
+
+    def test_requests_are_not_profiled_without_sampling_or_a_token(self):
+        self.client.get(self.post.get_absolute_url())
+        self.client.get(self.post.get_absolute_url(), HTTP_X_PROFILE='forged')
+        self.assertEqual(profiling.stored_profiles(), {})
+
+    def test_signed_request_is_profiled(self):
+        def view(request):
+            list(Post.objects.all())
+            time.sleep(0.05)
+            return HttpResponse('page')
+
+        request = RequestFactory().get('/slow/', HTTP_X_PROFILE=profiling.make_token())
+        request.resolver_match = ResolverMatch(view, (), {}, url_name='slow')
+        profiling.ProfilingMiddleware(view)(request)
+
+        profile, = profiling.stored_profiles()['slow']
+        self.assertEqual((profile['path'], profile['status'], profile['query_count']), ('/slow/', 200, 1))
+        self.assertGreater(profile['samples'], 0)
+        self.assertTrue(any('view' in stack for stack in profile['stacks']))
+
+    def test_sampled_requests_are_profiled(self):
+        with mock.patch.object(profiling, 'SAMPLE_RATE', 1.0):
+            self.client.get(self.post.get_absolute_url())
+        self.assertEqual(list(profiling.stored_profiles()), ['blog:post_detail'])
+
+    def test_only_the_slowest_profiles_are_kept(self):
+        with mock.patch.object(profiling, 'KEEP', 2):
+            for duration in (1, 5, 3, 4):
+                profiling.store({'url_name': 'home', 'duration': duration})
+        self.assertEqual([p['duration'] for p in profiling.stored_profiles()['home']], [5, 4])
+
+    @override_settings(STORAGES={
+        **settings.STORAGES,
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    })
+    def test_profiles_page_is_for_staff(self):
+        profiling.store({'url_name': 'home', 'duration': 12.5, 'path': '/', 'method': 'GET', 'status': 200,
+                         'started_at': time.time(), 'query_count': 3, 'sql_time': 1.0})
+        self.assertEqual(self.client.get('/admin/profiles/').status_code, 302)
+        self.client.force_login(User.objects.create_user('staff', password='secret', is_staff=True))
+        response = self.client.get('/admin/profiles/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'home')
+
+
+class TemplateTimingTests(TestCase):
+    def setUp(self):
+        # install() patches Django's template nodes and filters; undo it after each test
+        for patcher in (
+            mock.patch.object(IncludeNode, 'render', IncludeNode.render),
+            mock.patch.object(BlockNode, 'render', BlockNode.render),
+            mock.patch.dict(defaultfilters.register.filters),
+            mock.patch.object(template_timing, '_installed', False),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_nothing_is_timed_until_installed(self):
+        self.assertIsNone(template_timing.start('page.html'))
+        with mock.patch.object(template_timing, 'ENABLED', True):
+            metrics.TimedDjangoTemplates({'NAME': 'timed', 'DIRS': [], 'APP_DIRS': False, 'OPTIONS': {}})
+        profile = template_timing.start('page.html')
+        self.assertIsNotNone(profile)
+        template_timing.finish(profile)
+
+    def test_own_time_leaves_out_nested_sections(self):
+        profile = template_timing.Profile('page.html')
+        profile.enter()
+        time.sleep(0.01)
+        profile.enter()
+        time.sleep(0.02)
+        profile.exit('inner')
+        profile.exit('outer')
+
+        (inner_calls, inner_total, inner_own), (outer_calls, outer_total, outer_own) = (
+            profile.sections['inner'], profile.sections['outer'],
+        )
+        self.assertEqual((inner_calls, outer_calls), (1, 1))
+        self.assertEqual(inner_own, inner_total)
+        self.assertAlmostEqual(outer_own, outer_total - inner_total)
+        self.assertLess(outer_own, inner_own)
+
+    def test_includes_blocks_and_filters_are_sections(self):
+        template_timing.install()
+        engine = Engine(loaders=[('django.template.loaders.locmem.Loader', {
+            'base.html': '<main>{% block body %}{% endblock %}</main>',
+            'page.html': '{% extends "base.html" %}{% block body %}{% for post in posts %}'
+                         '{% include "part.html" %}{% endfor %}{% endblock %}',
+            'part.html': '{{ post|date:"Y" }}',
+        })])
+        with template_timing.collect() as profiles:
+            profile = template_timing.start('page.html')
+            html = engine.get_template('page.html').render(Context({'posts': [timezone.now()] * 3}))
+            template_timing.finish(profile)
+
+        self.assertEqual(html, '<main>' + timezone.now().strftime('%Y') * 3 + '</main>')
+        self.assertEqual(profiles, [profile])
+        calls = {label: section[0] for label, section in profile.sections.items()}
+        self.assertEqual(calls, {'{% block body %}': 1, '{% include "part.html" %}': 3, '|date': 3})
+        self.assertGreaterEqual(profile.elapsed, profile.sections['{% block body %}'][1])
+
+    def test_page_renders_feed_the_section_counters(self):
+        template_timing.install()
+        template = engines.all()[0].from_string('{{ when|date:"Y" }}')
+        with mock.patch.object(metrics, 'inc') as inc:
+            template.render({'when': timezone.now()})
+        self.assertIn(
+            mock.call('template_section_calls_total', 1, template='<string>', section='|date'), inc.call_args_list,
+        )
+        self.assertIsNone(template_timing._profile.get())
+
+
+class PostViewBeaconTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['analytics'].clear()
+        self.post = published_post()
+        self.url = f'/post/{self.post.slug}/view/'
+
+    def views(self):
+        return Post.objects.values_list('views', flat=True).get(pk=self.post.pk)
+
+    def test_repeated_beacons_count_once(self):
+        for _ in range(5):
+            self.assertEqual(self.client.post(self.url, REMOTE_ADDR='203.0.113.5').status_code, 204)
+        self.assertEqual(self.views(), 1)
+
+    def test_each_client_counts(self):
+        self.client.post(self.url, REMOTE_ADDR='203.0.113.5')
+        self.client.post(self.url, REMOTE_ADDR='203.0.113.6')
+        self.assertEqual(self.views(), 2)
+
+    def test_markers_survive_the_page_cache(self):
+        self.client.post(self.url, REMOTE_ADDR='203.0.113.5')
+        cache.clear()
+        self.client.post(self.url, REMOTE_ADDR='203.0.113.5')
+        self.assertEqual(self.views(), 1)
+
+    def test_forged_forwarded_for_is_ignored_behind_a_proxy(self):
+        with mock.patch.object(analytics, 'PROXY_COUNT', 1):
+            for forged in ('1.1.1.1', '2.2.2.2', '3.3.3.3'):
+                self.client.post(
+                    self.url, REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=f'{forged}, 203.0.113.5',
+                )
+        self.assertEqual(self.views(), 1)
+
+    def test_draft_posts_are_not_counted(self):
+        Post.objects.filter(pk=self.post.pk).update(status='draft')
+        self.assertEqual(self.client.post(self.url).status_code, 404)
+
+    def test_get_is_not_allowed(self):
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+
+class QueryLogTests(TestCase):
+    def setUp(self):
+        log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, log_dir, ignore_errors=True)
+        for name, value in {'LOG_DIR': log_dir, '_stats': {}, '_explained': set()}.items():
+            patcher = mock.patch.object(querylog, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_logged(self, *querysets, slow_ms=100):
+        with mock.patch.object(querylog, 'SLOW_MS', slow_ms), \
+                connection.execute_wrapper(querylog.QueryLogger(connection)):
+            for queryset in querysets:
+                list(queryset)
+
+    def test_fingerprint_folds_literals_and_in_lists(self):
+        a = querylog.fingerprint("SELECT * FROM t WHERE id IN (%s, %s) AND name = 'x' LIMIT 10")
+        b = querylog.fingerprint("SELECT  *  FROM t WHERE id IN (%s) AND name = 'other' LIMIT 20")
+        self.assertEqual(a, b)
+        self.assertEqual(a[1], 'SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?')
+
+    def test_statements_are_grouped_and_counted(self):
+        self.run_logged(*(Post.objects.filter(pk=pk) for pk in range(5)))
+        (stats,) = [s for s in querylog._stats.values() if 'blog_post' in s['sql']]
+        self.assertEqual(stats['count'], 5)
+        self.assertEqual(sum(stats['histogram']), 5)
+
+    def test_origin_is_only_looked_up_on_first_and_slow_runs(self):
+        with mock.patch.object(querylog, '_origin', return_value='blog/tests.py:1 test') as origin:
+            self.run_logged(*(Post.objects.filter(pk=pk) for pk in range(5)))
+            self.assertEqual(origin.call_count, 1)
+            self.run_logged(Post.objects.filter(pk=1), slow_ms=0)
+            self.assertEqual(origin.call_count, 2)
+
+    def test_flush_and_load_merge_processes(self):
+        self.run_logged(Post.objects.all())
+        querylog.flush()
+        merged = querylog.load()
+        self.assertEqual(merged.keys(), querylog._stats.keys())
+        querylog.reset()
+        self.assertEqual(querylog.load(), {})
+
+    def test_flag_plan(self):
+        flags = querylog.flag_plan('sqlite', ['SCAN blog_post', 'USE TEMP B-TREE FOR ORDER BY'])
+        self.assertEqual(len(flags), 2)
+        self.assertEqual(querylog.flag_plan('sqlite', ['SEARCH blog_post USING INDEX x (id=?)']), [])
+
+
+class MetricsViewTests(TestCase):
+    def get(self, **extra):
+        return self.client.get('/metrics', **extra)
+
+    def test_allowed_ip_without_a_proxy(self):
+        response = self.get(REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('# TYPE analytics_pending_views gauge', response.content.decode())
+        self.assertEqual(self.get(REMOTE_ADDR='203.0.113.5').status_code, 403)
+
+    def test_behind_a_proxy_only_the_token_is_accepted(self):
+        with mock.patch.object(metrics, 'PROXY_COUNT', 1), mock.patch.object(metrics, 'TOKEN', 'secret'):
+            self.assertEqual(self.get(REMOTE_ADDR='127.0.0.1').status_code, 403)
+            self.assertEqual(self.get(REMOTE_ADDR='127.0.0.1', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+            self.assertEqual(self.get(REMOTE_ADDR='127.0.0.1', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+    def test_behind_a_proxy_without_a_token_nobody_is_allowed(self):
+        with mock.patch.object(metrics, 'PROXY_COUNT', 1), mock.patch.object(metrics, 'TOKEN', ''):
+            self.assertEqual(self.get(REMOTE_ADDR='127.0.0.1', HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+
+    def test_values_keep_their_precision(self):
+        self.assertEqual(metrics._format_value(1234567.891), '1234567.891')
+        self.assertEqual(metrics._format_value(float('inf')), '+Inf')
+        self.assertEqual(metrics._format_value(3), '3')
+
+    def test_queries_on_other_threads_are_counted(self):
+        def in_thread():
+            list(Post.objects.all())
+            connection.close()
+
+        def view(request):
+            # Like blog.async_views' query pool: the thread runs in a copy of the context
+            thread = threading.Thread(target=contextvars.copy_context().run, args=(in_thread,))
+            thread.start()
+            thread.join()
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        with mock.patch.object(metrics, 'inc') as inc:
+            metrics.MetricsMiddleware(view)(request)
+        self.assertIn(mock.call('db_queries_total', 1, view='unresolved'), inc.call_args_list)
+
+
+class AsyncListingTests(TransactionTestCase):
+    """
+    The pool threads have their own connections, so the data is committed
+    """
+    def setUp(self):
+        cache.clear()
+        self.post = published_post(category=Category.objects.create(name='News'))
+
+    def get(self, view, *args):
+        request = RequestFactory().get('/', HTTP_HOST='localhost')
+        request.user = AnonymousUser()
+        return async_to_sync(view)(request, *args)
+
+    def test_home_is_hole_punch_cached(self):
+        with mock.patch('blog.caching.metrics.cache_lookup') as lookup:
+            first = self.get(async_views.home)
+            second = self.get(async_views.home)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        self.assertIn(self.post.title, second.content.decode())
+        self.assertEqual([c.args for c in lookup.call_args_list if c.args[0] == 'shell'],
+                         [('shell', False), ('shell', True)])
+
+    def test_connection_is_checked_once_per_request_and_thread(self):
+        threads = []
+        with mock.patch.object(async_views, 'close_old_connections', lambda: threads.append(threading.get_ident())):
+            self.get(async_views.home)
+        self.assertTrue(threads)
+        self.assertEqual(len(threads), len(set(threads)))
+
+
+@override_settings(REPLICA_DATABASES=['replica1', 'replica2'])
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(db_router, '_skip_until', {})
+        self.skip_until = patcher.start()
+        self.addCleanup(patcher.stop)
+        healthy = mock.patch.object(db_router, '_is_healthy', lambda alias: alias not in self.skip_until)
+        healthy.start()
+        self.addCleanup(healthy.stop)
+        # TestCase wraps each test in a transaction, which pins reads to the primary
+        outside = mock.patch.object(db_router, 'connections', {'default': mock.Mock(in_atomic_block=False)})
+        outside.start()
+        self.addCleanup(outside.stop)
+        self.router = db_router.PrimaryReplicaRouter()
+
+    def test_reads_go_to_replicas_and_writes_to_the_primary(self):
+        self.assertIn(self.router.db_for_read(Post), ['replica1', 'replica2'])
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    def test_pinned_reads_go_to_the_primary(self):
+        token = db_router._pinned_to_primary.set(True)
+        self.addCleanup(db_router._pinned_to_primary.reset, token)
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_unhealthy_replicas_are_skipped(self):
+        self.skip_until.update({'replica1': float('inf'), 'replica2': float('inf')})
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def request(self, view, method='get'):
+        """
+        Run ``view`` behind the middleware the way Django's handler does
+        """
+        def get_response(request):
+            try:
+                return view(request)
+            except Exception as e:
+                response = middleware.process_exception(request, e)
+                if response is None:
+                    raise
+                return response
+
+        middleware = db_router.ReplicaPinningMiddleware(get_response)
+        request = getattr(RequestFactory(), method)('/')
+        request.resolver_match = ResolverMatch(view, (), {})
+        return middleware(request)
+
+    def test_failed_replica_read_is_retried_on_the_primary(self):
+        used = []
+
+        def view(request):
+            alias = self.router.db_for_read(Post)
+            used.append(alias)
+            if alias != 'default':
+                raise OperationalError('replica went away')
+            return HttpResponse('ok')
+
+        with mock.patch('random.choice', lambda aliases: aliases[0]):
+            response = self.request(view)
+        self.assertEqual(response.content, b'ok')
+        self.assertEqual(used, ['replica1', 'default'])
+        self.assertIn('replica1', self.skip_until)
+        self.assertEqual(self.router.db_for_read(Post), 'replica2')
+
+    def test_primary_errors_are_not_retried(self):
+        def view(request):
+            raise OperationalError('primary went away')
+
+        with self.assertRaises(OperationalError):
+            self.request(view, method='post')
+
+
+class FixSlugsTests(TestCase):
+    def setUp(self):
+        checkpoints = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, checkpoints, ignore_errors=True)
+        patcher = mock.patch.object(jobs, 'CHECKPOINT_DIR', checkpoints)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_slugs_are_fixed_and_updated_at_is_bumped(self):
+        published_post('Same title')
+        post = published_post('Same title')
+        Post.objects.filter(pk=post.pk).update(slug='')
+        before = Post.objects.get(pk=post.pk).updated_at
+
+        out = io.StringIO()
+        call_command('fix_slugs', stdout=out)
+
+        post.refresh_from_db()
+        self.assertEqual(post.slug, 'same-title-1')
+        self.assertGreater(post.updated_at, before)
+        self.assertIn('Fixed slug for post: Same title -> same-title-1', out.getvalue())
+        self.assertIn('Successfully fixed 1 post(s)', out.getvalue())
+
+
+class BatchingTests(TestCase):
+    def setUp(self):
+        self.posts = [published_post(f'Post {i}') for i in range(5)]
+        self.pks = [post.pk for post in self.posts]
+
+    def test_pk_batches_and_ranges_cover_every_row_once(self):
+        self.assertEqual(list(batching.iter_pk_batches(Post.objects.all(), 2)),
+                         [self.pks[0:2], self.pks[2:4], self.pks[4:]])
+        self.assertEqual(list(batching.iter_pk_ranges(Post.objects.all(), 2)),
+                         [(None, self.pks[1]), (self.pks[1], self.pks[3]), (self.pks[3], self.pks[4])])
+        self.assertEqual(list(batching.iter_pk_ranges(Post.objects.all(), 2, after=self.pks[3])),
+                         [(self.pks[3], self.pks[4])])
+
+    def test_update_in_batches_rechecks_rows(self):
+        Post.objects.filter(pk=self.pks[0]).update(status='draft')
+        batches = []
+        updated = batching.update_in_batches(
+            Post.objects.all(), {'views': 7}, only_if={'status': 'published'}, batch_size=2, on_batch=batches.append,
+        )
+        self.assertEqual(sorted(updated), self.pks[1:])
+        self.assertEqual([sorted(batch) for batch in batches], [self.pks[1:2], self.pks[2:4], self.pks[4:]])
+        self.assertEqual(Post.objects.filter(views=7).count(), 4)
+
+
+@override_settings(BLOG_BULK_ACTION_BATCH_SIZE=2)
+class AdminBulkActionTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        self.client.force_login(self.admin)
+        author = User.objects.create_user('writer')
+        self.drafts = [
+            Post.objects.create(title=f'Draft {i}', content='<p>Text</p>', author=author, status='draft')
+            for i in range(5)
+        ]
+
+    def act(self, url, action, objects):
+        return self.client.post(url, {'action': action, '_selected_action': [obj.pk for obj in objects]})
+
+    def test_publish_sends_one_signal_and_bumps_updated_at(self):
+        before = {post.pk: post.updated_at for post in self.drafts}
+        received = []
+        handler = lambda sender, post_ids, status, **kwargs: received.append((sorted(post_ids), status))
+        posts_bulk_status_changed.connect(handler)
+        self.addCleanup(posts_bulk_status_changed.disconnect, handler)
+
+        self.act('/admin/blog/post/', 'publish_posts', self.drafts)
+
+        self.assertEqual(received, [(sorted(before), 'published')])
+        for post in Post.objects.filter(pk__in=before):
+            self.assertEqual(post.status, 'published')
+            self.assertGreater(post.updated_at, before[post.pk])
+
+    def test_moderation_reports_the_posts_touched(self):
+        comments = [Comment.objects.create(post=post, user=self.admin, content='Hi', approved=False)
+                    for post in self.drafts[:3]]
+        received = []
+        handler = lambda sender, comment_ids, post_ids, approved, **kwargs: received.append(
+            (sorted(comment_ids), post_ids, approved))
+        comments_bulk_moderated.connect(handler)
+        self.addCleanup(comments_bulk_moderated.disconnect, handler)
+
+        self.act('/admin/blog/comment/', 'approve_comments', comments)
+
+        self.assertEqual(received, [(
+            sorted(comment.pk for comment in comments), sorted(post.pk for post in self.drafts[:3]), True,
+        )])
+        self.assertEqual(Comment.objects.filter(approved=True).count(), 3)
+
+
+class CountViewsJob(jobs.BatchJobCommand):
+    def get_queryset(self):
+        return Post.objects.all()
+
+    def process_chunk(self, posts, results):
+        return Post.objects.filter(pk__in=[post.pk for post in posts]).update(views=F('views') + 1)
+
+
+class BatchJobTests(TestCase):
+    def setUp(self):
+        checkpoints = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, checkpoints, ignore_errors=True)
+        patcher = mock.patch.object(jobs, 'CHECKPOINT_DIR', checkpoints)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.posts = [published_post(f'Post {i}') for i in range(5)]
+
+    def run_job(self, **options):
+        out = io.StringIO()
+        call_command(CountViewsJob(), chunk_size=2, stdout=out, stderr=io.StringIO(), **options)
+        return out.getvalue()
+
+    def test_interrupted_job_resumes_after_the_last_chunk(self):
+        process_chunk = CountViewsJob.process_chunk
+        chunks = []
+
+        def interrupt_second_chunk(job, posts, results):
+            chunks.append(posts)
+            if len(chunks) == 2:
+                raise KeyboardInterrupt
+            return process_chunk(job, posts, results)
+
+        with mock.patch.object(CountViewsJob, 'process_chunk', interrupt_second_chunk):
+            with self.assertRaises(KeyboardInterrupt):
+                self.run_job()
+        checkpoint = jobs.Checkpoint('tests')
+        self.assertTrue(checkpoint.load())
+        self.assertEqual((checkpoint.after, checkpoint.processed), (self.posts[1].pk, 2))
+        self.assertEqual(checkpoint.options, {'chunk_size': 2, 'workers': 0})
+
+        output = self.run_job()
+        self.assertIn(f'Resuming after pk {self.posts[1].pk}', output)
+        self.assertIn('Processed 5 row(s), 5 changed', output)
+        self.assertEqual(set(Post.objects.values_list('views', flat=True)), {1})
+        self.assertFalse(jobs.Checkpoint('tests').load())
+
+    def test_resume_with_other_options_is_refused(self):
+        checkpoint = jobs.Checkpoint('tests')
+        checkpoint.options = {'chunk_size': 3, 'workers': 0}
+        checkpoint.after, checkpoint.processed = self.posts[1].pk, 2
+        checkpoint.save()
+
+        with self.assertRaisesMessage(CommandError, '--restart'):
+            self.run_job()
+        self.assertEqual(set(Post.objects.values_list('views', flat=True)), {0})
+        self.assertTrue(jobs.Checkpoint('tests').load())
+
+        out = io.StringIO()
+        call_command(CountViewsJob(), chunk_size=3, stdout=out)
+        self.assertIn('Processed 5 row(s), 3 changed', out.getvalue())
+
+    def test_restart_ignores_the_checkpoint(self):
+        checkpoint = jobs.Checkpoint('tests')
+        checkpoint.after = self.posts[-1].pk
+        checkpoint.save()
+        self.assertIn('Processed 5 row(s), 5 changed', self.run_job(restart=True))
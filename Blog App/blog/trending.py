@@ -0,0 +1,140 @@
+"""
+Time-decayed trending ranking.
+
+Every view or comment adds weight * exp(-DECAY * age) to a post's score, so
+activity loses half its weight every TRENDING_HALF_LIFE_HOURS. Instead of
+decaying every score over time, the score is stored in log space relative to
+a fixed epoch:
+
+    log_score = log(sum(weight * exp(DECAY * (event_time - EPOCH))))
+
+All scores share the same reference point, so ordering by log_score is the
+trending order at any moment, a new event is a single atomic UPDATE
+(log-sum-exp of the old value and the event) and the top-N is an index scan
+on TrendingScore. Raw hourly counts are kept in PostActivity so the scores
+can be rebuilt, for instance after changing the half-life.
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.utils import timezone
+from common import metrics
+from .models import Post, PostActivity, TrendingScore
+
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+HALF_LIFE_HOURS = getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 24)
+WINDOW_HOURS = getattr(settings, 'TRENDING_WINDOW_HOURS', 168)
+VIEW_WEIGHT = getattr(settings, 'TRENDING_VIEW_WEIGHT', 1.0)
+COMMENT_WEIGHT = getattr(settings, 'TRENDING_COMMENT_WEIGHT', 5.0)
+CACHE_TIMEOUT = getattr(settings, 'TRENDING_CACHE_TIMEOUT', 60)
+
+DECAY = math.log(2) / (HALF_LIFE_HOURS * 3600)
+
+
+def log_weight(weight, when):
+    return math.log(weight) + DECAY * (when - EPOCH).total_seconds()
+
+
+def current_score(log_score, now=None):
+    """
+    Decayed score as of ``now``, for display
+    """
+    now = now or timezone.now()
+    return math.exp(log_score - DECAY * (now - EPOCH).total_seconds())
+
+
+def _add_to_score(post, weight, when):
+    event = log_weight(weight, when)
+    # log(exp(a) + exp(b)) = max(a, b) + log(1 + exp(-|a - b|))
+    new_score = Greatest(F('log_score'), Value(event)) + Ln(
+        Value(1.0) + Exp(-Abs(F('log_score') - Value(event)))
+    )
+    if TrendingScore.objects.filter(post_id=post.pk).update(log_score=new_score):
+        return
+    _, created = TrendingScore.objects.get_or_create(
+        post_id=post.pk, defaults={'log_score': event, 'category_id': post.category_id},
+    )
+    if not created:
+        TrendingScore.objects.filter(post_id=post.pk).update(log_score=new_score)
+
+
+def _add_to_bucket(post, field, when):
+    hour = when.replace(minute=0, second=0, microsecond=0)
+    slot = int((hour - EPOCH).total_seconds() // 3600) % WINDOW_HOURS
+    current = PostActivity.objects.filter(post_id=post.pk, slot=slot, hour=hour)
+    if current.update(**{field: F(field) + 1}):
+        return
+    # The slot is empty or still holds an hour that has left the window. Only
+    # one of several concurrent requests resets a stale row (the UPDATE is
+    # conditional on the old hour) and each then adds its own event
+    stale = PostActivity.objects.filter(post_id=post.pk, slot=slot, hour__lt=hour)
+    if not stale.update(hour=hour, views=0, comments=0):
+        PostActivity.objects.get_or_create(post_id=post.pk, slot=slot, defaults={'hour': hour})
+    current.update(**{field: F(field) + 1})
+
+
+def record_view(post, when=None):
+    when = when or timezone.now()
+    _add_to_bucket(post, 'views', when)
+    _add_to_score(post, VIEW_WEIGHT, when)
+
+
+def record_comment(post, when=None):
+    when = when or timezone.now()
+    _add_to_bucket(post, 'comments', when)
+    _add_to_score(post, COMMENT_WEIGHT, when)
+
+
+def trending_posts(limit=5, category=None):
+    """
+    Top published posts by decayed score, cached for TRENDING_CACHE_TIMEOUT seconds
+    """
+    key = f'blog:trending:{category.pk if category else "all"}:{limit}'
+    posts = cache.get(key)
+    metrics.cache_lookup('trending', posts is not None)
+    if posts is None:
+        scores = TrendingScore.objects.filter(post__status='published')
+        if category is not None:
+            scores = scores.filter(category=category)
+        post_ids = list(scores.order_by('-log_score').values_list('post_id', flat=True)[:limit])
+        by_id = Post.objects.select_related('author', 'category').in_bulk(post_ids)
+        posts = [by_id[pk] for pk in post_ids if pk in by_id]
+        cache.set(key, posts, CACHE_TIMEOUT)
+    return posts
+
+
+def rebuild_scores(now=None):
+    """
+    Recompute every score from the hourly buckets still inside the window
+    and drop the buckets that have left it
+    """
+    now = now or timezone.now()
+    oldest = now - timedelta(hours=WINDOW_HOURS)
+    buckets = PostActivity.objects.filter(hour__gt=oldest)
+    weights = {}
+    for post_id, hour, views, comments in buckets.values_list(
+        'post_id', 'hour', 'views', 'comments',
+    ).iterator(chunk_size=2000):
+        weight = views * VIEW_WEIGHT + comments * COMMENT_WEIGHT
+        if weight:
+            weights.setdefault(post_id, []).append(log_weight(weight, hour))
+    categories = dict(
+        Post.objects.filter(activity__hour__gt=oldest).values_list('pk', 'category_id').distinct()
+    )
+
+    scores = []
+    for post_id, post_weights in weights.items():
+        peak = max(post_weights)
+        log_score = peak + math.log(sum(math.exp(w - peak) for w in post_weights))
+        scores.append(TrendingScore(post_id=post_id, category_id=categories.get(post_id), log_score=log_score))
+
+    with transaction.atomic():
+        TrendingScore.objects.all().delete()
+        TrendingScore.objects.bulk_create(scores, batch_size=500)
+        PostActivity.objects.filter(hour__lte=oldest).delete()
+    return len(scores)
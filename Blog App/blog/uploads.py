@@ -0,0 +1,81 @@
+"""
+Which CKEditor uploads are still in use.
+
+Every saved post's content is scanned for links into MEDIA_URL +
+CKEDITOR_UPLOAD_PATH and the paths are kept in UploadReference. Files under
+the upload directory without a reference are garbage, collected by the
+gc_uploads command.
+"""
+import os
+import re
+from urllib.parse import unquote, urlparse
+
+from django.conf import settings
+from django.db import transaction
+from .batching import iter_pk_batches
+from .models import Post, UploadReference
+
+UPLOAD_PATH = getattr(settings, 'CKEDITOR_UPLOAD_PATH', 'uploads/')
+MEDIA_PATH = urlparse(settings.MEDIA_URL).path
+URL_ATTRIBUTE = re.compile(r'''\b(?:src|href)\s*=\s*["']([^"']+)["']''', re.IGNORECASE)
+
+
+def referenced_paths(html):
+    """
+    Upload paths, relative to MEDIA_ROOT, linked from a piece of HTML
+    """
+    paths = set()
+    for url in URL_ATTRIBUTE.findall(html or ''):
+        path = unquote(urlparse(url).path)
+        if path.startswith(MEDIA_PATH + UPLOAD_PATH):
+            paths.add(path[len(MEDIA_PATH):])
+    return paths
+
+
+def sync_references(post):
+    wanted = referenced_paths(post.content)
+    existing = set(UploadReference.objects.filter(post=post).values_list('path', flat=True))
+    if existing - wanted:
+        UploadReference.objects.filter(post=post, path__in=existing - wanted).delete()
+    if wanted - existing:
+        UploadReference.objects.bulk_create(
+            [UploadReference(post=post, path=path) for path in wanted - existing],
+            ignore_conflicts=True,
+        )
+
+
+def reindex(batch_size=500):
+    """
+    Re-scan every post, one batch per transaction. Returns the number of posts.
+    """
+    total = 0
+    for post_ids in iter_pk_batches(Post.objects.all(), batch_size):
+        with transaction.atomic():
+            for post in Post.objects.filter(pk__in=post_ids).only('pk', 'content'):
+                sync_references(post)
+        total += len(post_ids)
+    return total
+
+
+def iter_upload_files(storage, path=UPLOAD_PATH):
+    """
+    Every file under the upload directory, as storage names
+    """
+    try:
+        directories, files = storage.listdir(path)
+    except FileNotFoundError:
+        return
+    for filename in files:
+        yield os.path.join(path, filename).replace('\\', '/')
+    for directory in directories:
+        yield from iter_upload_files(storage, os.path.join(path, directory))
+
+
+def original_of(name):
+    """
+    The upload a thumbnail was made from, or None if ``name`` is not a thumbnail
+    """
+    stem, extension = os.path.splitext(name)
+    if stem.endswith('_thumb'):
+        return stem[:-len('_thumb')] + extension
+    return None
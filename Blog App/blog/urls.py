@@ -1,18 +1,51 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, feeds, sitemaps
+from .caching import versioned_cache_page
+from .edge import edge_cache
 
 app_name = 'blog'
 
+# Listing views run their independent queries concurrently when served over ASGI
+listing_views = views
+if getattr(settings, 'BLOG_ASYNC_VIEWS', False):
+    from . import async_views as listing_views
+
+cached = versioned_cache_page(getattr(settings, 'BLOG_FEED_CACHE_TIMEOUT', 60 * 60))
+
+
+def feed(view):
+    return edge_cache('feed', keys=['feeds'])(cached(view))
+
+
+def sitemap(view):
+    return edge_cache('sitemap', keys=['sitemaps'])(cached(view))
+
+
 urlpatterns = [
-    path('', views.home, name='home'),
+    path('', listing_views.home, name='home'),
     # Post create must come before post detail to avoid slug conflict
     path('post/create/', views.create_post, name='create_post'),
     path('post/<slug:slug>/', views.post_detail, name='post_detail'),
+    path('post/<slug:slug>/view/', views.record_post_view, name='record_post_view'),
     path('post/<slug:slug>/edit/', views.edit_post, name='edit_post'),
     path('post/<slug:slug>/delete/', views.delete_post, name='delete_post'),
     # Categories and Tags
-    path('category/<slug:slug>/', views.category_posts, name='category'),
-    path('tag/<slug:slug>/', views.tag_posts, name='tag'),
+    path('category/<slug:slug>/', listing_views.category_posts, name='category'),
+    path('tag/<slug:slug>/', listing_views.tag_posts, name='tag'),
     # Comments
     path('comment/<int:comment_id>/delete/', views.delete_comment, name='delete_comment'),
+    # Feeds
+    path('feed/', feed(feeds.LatestPostsFeed()), name='feed'),
+    path('feed/atom/', feed(feeds.LatestPostsAtomFeed()), name='feed_atom'),
+    path('category/<slug:slug>/feed/', feed(feeds.CategoryFeed()), name='category_feed'),
+    path('category/<slug:slug>/feed/atom/', feed(feeds.CategoryAtomFeed()), name='category_feed_atom'),
+    path('tag/<slug:slug>/feed/', feed(feeds.TagFeed()), name='tag_feed'),
+    path('tag/<slug:slug>/feed/atom/', feed(feeds.TagAtomFeed()), name='tag_feed_atom'),
+    path('author/<str:username>/feed/', feed(feeds.AuthorFeed()), name='author_feed'),
+    path('author/<str:username>/feed/atom/', feed(feeds.AuthorAtomFeed()), name='author_feed_atom'),
+    # Sitemaps
+    path('sitemap.xml', sitemap(sitemaps.sitemap_index), name='sitemap'),
+    path('sitemap-posts-<int:chunk>.xml', sitemap(sitemaps.sitemap_posts), name='sitemap_posts'),
+    path('sitemap-<str:section>.xml', sitemap(sitemaps.sitemap_section), name='sitemap_section'),
 ]
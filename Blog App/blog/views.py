@@ -1,17 +1,28 @@
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
 from django.db.models import Q, Count
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from .models import Post, Category, Tag, Comment
 from .forms import PostForm, CommentForm, SearchForm
+from . import analytics, trending
+from .caching import hole_punched_cache_page
+from .edge import add_keys, edge_cache, post_keys
 
 
-def home(request):
-    posts = Post.objects.filter(status='published').select_related('author', 'category').prefetch_related('tags')
-    
-    # Search functionality
-    search_form = SearchForm(request.GET)
+POSTS_PER_PAGE = 9
+PAGE_CACHE_TIMEOUT = getattr(settings, 'BLOG_PAGE_CACHE_TIMEOUT', 60 * 10)
+
+
+def published_posts():
+    return Post.objects.filter(status='published').select_related('author', 'category').prefetch_related('tags')
+
+
+def search_posts(posts, search_form):
     if search_form.is_valid():
         query = search_form.cleaned_data.get('query')
         if query:
@@ -20,35 +31,73 @@ def home(request):
                 Q(content__icontains=query) |
                 Q(excerpt__icontains=query)
             )
+    return posts
+
+
+def get_featured_posts():
+    # Most viewed posts
+    return Post.objects.filter(status='published').order_by('-views')[:3]
+
+
+def get_popular_categories():
+    return Category.objects.annotate(
+        post_count=Count('posts')
+    ).filter(post_count__gt=0).order_by('-post_count')[:5]
+
+
+@edge_cache('home')
+@hole_punched_cache_page(PAGE_CACHE_TIMEOUT)
+def home(request):
+    # Search functionality
+    search_form = SearchForm(request.GET)
+    posts = search_posts(published_posts(), search_form)
     
     # Pagination
-    paginator = Paginator(posts, 9)  # 9 posts per page
+    paginator = Paginator(posts, POSTS_PER_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    featured_posts = list(get_featured_posts())
+    trending_posts = trending.trending_posts()
+    popular_categories = list(get_popular_categories())
     
-    # Get featured posts (most viewed)
-    featured_posts = Post.objects.filter(status='published').order_by('-views')[:3]
-    
-    # Get popular categories
-    popular_categories = Category.objects.annotate(
-        post_count=Count('posts')
-    ).filter(post_count__gt=0).order_by('-post_count')[:5]
+    add_keys(request, 'home', *post_keys([*page_obj, *featured_posts, *trending_posts]))
+    add_keys(request, *(f'category:{category.pk}' for category in popular_categories))
     
     context = {
         'page_obj': page_obj,
         'search_form': search_form,
         'featured_posts': featured_posts,
+        'trending_posts': trending_posts,
         'popular_categories': popular_categories,
     }
     return render(request, 'blog/home.html', context)
 
 
+def count_view(post, request):
+    """
+    Count a view, once per client and post every ANALYTICS_VIEW_DEDUP_SECONDS
+    """
+    if not analytics.first_view(post, request):
+        return
+    post.views += 1
+    post.save(update_fields=['views'])
+    trending.record_view(post)
+    analytics.record_view(post, request)
+
+
+def count_cached_view(request, slug):
+    post = Post.objects.filter(slug=slug, status='published').first()
+    if post is not None:
+        count_view(post, request)
+
+
+@edge_cache('post')
+@hole_punched_cache_page(PAGE_CACHE_TIMEOUT, on_hit=count_cached_view)
 def post_detail(request, slug):
     post = get_object_or_404(Post, slug=slug, status='published')
     
     # Increment views
-    post.views += 1
-    post.save(update_fields=['views'])
+    count_view(post, request)
     
     # Get comments
     comments = post.comments.filter(approved=True).select_related('user')
@@ -76,6 +125,8 @@ def post_detail(request, slug):
         status='published'
     ).exclude(id=post.id)[:3]
     
+    add_keys(request, *post_keys([post, *related_posts]), *(f'tag:{tag.pk}' for tag in post.tags.all()))
+    
     context = {
         'post': post,
         'comments': comments,
@@ -85,28 +136,48 @@ def post_detail(request, slug):
     return render(request, 'blog/post_detail.html', context)
 
 
+@csrf_exempt
+@require_POST
+def record_post_view(request, slug):
+    """
+    Count a view of a pre-rendered post page, reported by the page itself
+    """
+    post = get_object_or_404(Post, slug=slug, status='published')
+    count_view(post, request)
+    return HttpResponse(status=204)
+
+
+@edge_cache('listing')
+@hole_punched_cache_page(PAGE_CACHE_TIMEOUT)
 def category_posts(request, slug):
     category = get_object_or_404(Category, slug=slug)
     posts = Post.objects.filter(category=category, status='published')
     
-    paginator = Paginator(posts, 9)
+    paginator = Paginator(posts, POSTS_PER_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    add_keys(request, f'category:{category.pk}', *post_keys(page_obj))
     
     context = {
         'category': category,
         'page_obj': page_obj,
+        'trending_posts': trending.trending_posts(category=category),
     }
     return render(request, 'blog/category_posts.html', context)
 
 
+@edge_cache('listing')
+@hole_punched_cache_page(PAGE_CACHE_TIMEOUT)
 def tag_posts(request, slug):
     tag = get_object_or_404(Tag, slug=slug)
     posts = Post.objects.filter(tags=tag, status='published')
     
-    paginator = Paginator(posts, 9)
+    paginator = Paginator(posts, POSTS_PER_PAGE)
+    # Maintained by blog.tag_counts, saves a COUNT over the post/tag table
+    paginator.count = tag.published_post_count
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    add_keys(request, f'tag:{tag.pk}', *post_keys(page_obj))
     
     context = {
         'tag': tag,
@@ -0,0 +1,274 @@
+"""
+Slow query log.
+
+Every statement run through a Django connection is timed by an execute
+wrapper, installed on each connection as it is opened. Statements are
+grouped by fingerprint (the SQL with literals and IN lists folded), and
+each fingerprint keeps a latency histogram and the places in QUERYLOG_APPS
+it was run from. The stack is only walked for those on a fingerprint's
+first run and on slow runs; on every statement it would cost more than
+the timing itself.
+
+Statements slower than QUERYLOG_SLOW_MS are explained once per fingerprint
+by a background thread, with EXPLAIN QUERY PLAN on SQLite and EXPLAIN on
+PostgreSQL (EXPLAIN ANALYZE for SELECTs if QUERYLOG_EXPLAIN_ANALYZE is on,
+which is what shows sorts spilling to disk). Plans are flagged for full
+table scans and sorts done without an index or on disk.
+
+Each process writes its numbers to QUERYLOG_DIR/<pid>.json every
+QUERYLOG_FLUSH_INTERVAL seconds and at exit; `manage.py query_report`
+merges them. Nothing is recorded unless QUERYLOG_DIR is set.
+"""
+import atexit
+import hashlib
+import json
+import os
+import queue
+import re
+import sys
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+LOG_DIR = getattr(settings, 'QUERYLOG_DIR', '')
+SLOW_MS = getattr(settings, 'QUERYLOG_SLOW_MS', 100)
+APPS = getattr(settings, 'QUERYLOG_APPS', ())
+FLUSH_INTERVAL = getattr(settings, 'QUERYLOG_FLUSH_INTERVAL', 10)
+EXPLAIN_ANALYZE = getattr(settings, 'QUERYLOG_EXPLAIN_ANALYZE', False)
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float('inf')]
+MAX_ORIGINS = 5
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+_stats = {}
+_explained = set()
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+_local = threading.local()
+_explain_queue = queue.Queue(maxsize=100)
+_app_dirs = tuple(f'{os.sep}{app}{os.sep}' for app in APPS)
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """
+    (id, normalised SQL) shared by every run of the same statement shape
+    """
+    normalised = _STRING.sub('?', sql)
+    normalised = _NUMBER.sub('?', normalised)
+    normalised = _IN_LIST.sub('IN (...)', normalised)
+    normalised = _SPACE.sub(' ', normalised).strip()
+    return hashlib.md5(normalised.encode()).hexdigest()[:12], normalised
+
+
+def _origin():
+    """
+    The innermost frame in one of QUERYLOG_APPS, as "app/file.py:line function"
+    """
+    frame = sys._getframe(3)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        for app_dir in _app_dirs:
+            index = filename.rfind(app_dir)
+            if index != -1 and f'{os.sep}migrations{os.sep}' not in filename:
+                relative = filename[index + 1:].replace(os.sep, '/')
+                return f'{relative}:{frame.f_lineno} {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+def _record(alias, vendor, sql, params, many, ms):
+    key, normalised = fingerprint(sql)
+    known = _stats.get(key)
+    if known is None or (ms >= SLOW_MS and len(known['origins']) < MAX_ORIGINS):
+        origin = _origin()
+    else:
+        origin = None
+    with _lock:
+        stats = _stats.get(key)
+        if stats is None:
+            stats = _stats[key] = {
+                'sql': normalised, 'vendor': vendor, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                'histogram': [0] * len(BUCKETS), 'origins': [], 'plan': None, 'flags': [],
+            }
+        stats['count'] += 1
+        stats['total_ms'] += ms
+        stats['max_ms'] = max(stats['max_ms'], ms)
+        stats['histogram'][bisect_left(BUCKETS, ms)] += 1
+        if origin and origin not in stats['origins'] and len(stats['origins']) < MAX_ORIGINS:
+            stats['origins'].append(origin)
+        explain = ms >= SLOW_MS and not many and key not in _explained
+        if explain:
+            _explained.add(key)
+    if explain:
+        try:
+            _explain_queue.put_nowait((key, alias, sql, params))
+        except queue.Full:
+            with _lock:
+                _explained.discard(key)
+    if time.monotonic() - _last_flush >= FLUSH_INTERVAL:
+        flush()
+
+
+class QueryLogger:
+    def __init__(self, connection):
+        self.alias = connection.alias
+        self.vendor = connection.vendor
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_local, 'explaining', False):
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            _record(self.alias, self.vendor, sql, params, many, (time.perf_counter() - start) * 1000)
+
+
+def flag_plan(vendor, plan):
+    flags = []
+    text = '\n'.join(plan)
+    if vendor == 'sqlite':
+        for line in plan:
+            if re.search(r'\bSCAN\b', line) and 'USING' not in line and 'CONSTANT ROW' not in line:
+                flags.append(f'full table scan: {line.strip()}')
+        if 'USE TEMP B-TREE FOR' in text:
+            flags.append('sort or grouping without an index (temp b-tree)')
+    elif vendor == 'postgresql':
+        for table in re.findall(r'Seq Scan on (\S+)', text):
+            flags.append(f'full table scan: {table}')
+        if re.search(r'external (?:merge|sort)|Disk:', text):
+            flags.append('sort spilled to disk')
+        elif re.search(r'^\s*(?:->\s*)?Sort\b', text, re.MULTILINE):
+            flags.append('sort without an index')
+    return flags
+
+
+def _explain(key, alias, sql, params):
+    connection = connections[alias]
+    if not sql.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'WITH')):
+        return
+    if connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    elif connection.vendor == 'postgresql':
+        analyze = EXPLAIN_ANALYZE and sql.lstrip().upper().startswith('SELECT')
+        prefix = 'EXPLAIN (ANALYZE, BUFFERS) ' if analyze else 'EXPLAIN '
+    else:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        rows = cursor.fetchall()
+    # SQLite rows are (id, parent, notused, detail); PostgreSQL rows are one line each
+    plan = [str(row[-1]) for row in rows]
+    with _lock:
+        stats = _stats.get(key)
+        if stats is not None:
+            stats['plan'] = plan
+            stats['flags'] = flag_plan(connection.vendor, plan)
+
+
+def _explain_worker():
+    _local.explaining = True
+    while True:
+        key, alias, sql, params = _explain_queue.get()
+        try:
+            _explain(key, alias, sql, params)
+        except Exception as e:
+            with _lock:
+                if key in _stats:
+                    _stats[key]['plan'] = [f'EXPLAIN failed: {e}']
+        finally:
+            connections.close_all()
+
+
+def flush():
+    """
+    Write this process's numbers to QUERYLOG_DIR/<pid>.json
+    """
+    global _last_flush
+    with _lock:
+        _last_flush = time.monotonic()
+        data = json.dumps({'pid': os.getpid(), 'written_at': time.time(), 'buckets': BUCKETS[:-1], 'stats': _stats})
+    os.makedirs(LOG_DIR, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=LOG_DIR, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        f.write(data)
+    os.replace(tmp, os.path.join(LOG_DIR, f'{os.getpid()}.json'))
+
+
+def _install_on(sender, connection, **kwargs):
+    if not any(isinstance(wrapper, QueryLogger) for wrapper in connection.execute_wrappers):
+        connection.execute_wrappers.append(QueryLogger(connection))
+
+
+def install():
+    if not LOG_DIR:
+        return
+    connection_created.connect(_install_on, dispatch_uid='common.querylog')
+    threading.Thread(target=_explain_worker, name='querylog-explain', daemon=True).start()
+    atexit.register(flush)
+
+
+def load(directory=None):
+    """
+    Merge the files of every process into {fingerprint: stats}
+    """
+    directory = directory or LOG_DIR
+    merged = {}
+    if not directory or not os.path.isdir(directory):
+        return merged
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for key, stats in data['stats'].items():
+            total = merged.get(key)
+            if total is None:
+                merged[key] = {**stats, 'histogram': list(stats['histogram']), 'origins': list(stats['origins'])}
+                continue
+            total['count'] += stats['count']
+            total['total_ms'] += stats['total_ms']
+            total['max_ms'] = max(total['max_ms'], stats['max_ms'])
+            total['histogram'] = [a + b for a, b in zip(total['histogram'], stats['histogram'])]
+            for origin in stats['origins']:
+                if origin not in total['origins'] and len(total['origins']) < MAX_ORIGINS:
+                    total['origins'].append(origin)
+            if total['plan'] is None and stats['plan'] is not None:
+                total['plan'], total['flags'] = stats['plan'], stats['flags']
+    return merged
+
+
+def percentile(histogram, q):
+    """
+    Upper bound (ms) of the bucket holding the q-th percentile
+    """
+    target = q / 100 * sum(histogram)
+    seen = 0
+    for bound, count in zip(BUCKETS, histogram):
+        seen += count
+        if count and seen >= target:
+            return bound
+    return 0
+
+
+def reset(directory=None):
+    directory = directory or LOG_DIR
+    if directory and os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.endswith('.json'):
+                os.unlink(os.path.join(directory, name))
@@ -0,0 +1,12 @@
+"""
+Instrumentation of this project.
+
+Listing 'common' in INSTALLED_APPS installs the slow query log
+(querylog.py) when the project starts and provides the query_report,
+profile_templates and profile_startup (startup.py) commands; metrics.py
+holds the MetricsMiddleware, template backend and /metrics view, and
+profiles.py the production pieces of settings. Every project of the
+repository is self-contained and carries its own copy of this app, so
+changes here are made to each copy. Everything is configured from the
+project's settings.
+"""
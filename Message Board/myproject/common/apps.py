@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class CommonConfig(AppConfig):
+    name = 'common'
+
+    def ready(self):
+        from common import querylog
+        querylog.install()
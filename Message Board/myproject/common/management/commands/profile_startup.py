@@ -0,0 +1,120 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from common import startup
+
+# Environment variable --compare switches when given no name
+COMPARE = getattr(settings, 'STARTUP_COMPARE_ENV', '')
+
+
+class Command(BaseCommand):
+    help = (
+        'Profile a cold start in a fresh interpreter: time to first response, '
+        'per-app ready() cost and per-module import time'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=3, help='Cold starts to take the median of')
+        parser.add_argument('--path', default='/', help='Path of the first request')
+        parser.add_argument('--host', default='localhost')
+        parser.add_argument('--top', type=int, default=25, help='Modules and packages to list')
+        parser.add_argument('--env', action='append', default=[], metavar='NAME=VALUE',
+                            help='Environment variable for the profiled process (repeatable)')
+        parser.add_argument('--compare', nargs='?', const=COMPARE, metavar='NAME',
+                            help='Profile with NAME=False and NAME=True side by side '
+                                 '(default NAME: STARTUP_COMPARE_ENV)')
+        parser.add_argument('--json', action='store_true', help='Print the raw results as JSON')
+
+    def handle(self, *args, **options):
+        env = {}
+        for item in options['env']:
+            name, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f'--env takes NAME=VALUE, not {item!r}')
+            env[name] = value
+
+        if options['compare'] is not None:
+            name = options['compare']
+            if not name:
+                raise CommandError('--compare needs a variable name when STARTUP_COMPARE_ENV is not set')
+            results = {
+                mode: self.profile(options, {**env, name: mode})
+                for mode in ('False', 'True')
+            }
+            if options['json']:
+                self.stdout.write(json.dumps(results, indent=2))
+                return
+            self.write_comparison(name, results)
+            return
+
+        result = self.profile(options, env)
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+        self.write_phases(result, options['path'])
+        self.write_apps(result)
+        self.write_modules(result, options['top'])
+
+    def profile(self, options, env):
+        try:
+            return startup.profile(options['repeat'], options['path'], options['host'], env)
+        except RuntimeError as e:
+            raise CommandError(f'The profiled process failed:\n{e}')
+
+    def write_phases(self, result, path):
+        median = result['median']
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Cold start, median of {result['runs']} run(s) (GET {path} -> {result['status']})"
+        ))
+        for name, label in startup.PHASES:
+            self.stdout.write(f'  {label:<24} {median[name]:>8.1f} ms')
+        self.stdout.write(f"  {'boot to first response':<24} {median['total_ms']:>8.1f} ms")
+        self.stdout.write(f"  {'whole process':<24} {median['process_ms']:>8.1f} ms")
+
+    def write_apps(self, result):
+        self.stdout.write(self.style.MIGRATE_HEADING('Apps (ms)'))
+        self.stdout.write(f"  {'app':<28} {'import':>8} {'models':>8} {'ready()':>8}")
+        def cost(app):
+            return app.get('create', 0) + app.get('import_models', 0) + app.get('ready', 0)
+
+        for app in sorted(result['apps'], key=cost, reverse=True):
+            self.stdout.write(
+                f"  {app['name']:<28} {app.get('create', 0):>8.1f} {app.get('import_models', 0):>8.1f} "
+                f"{app.get('ready', 0):>8.1f}"
+            )
+
+    def write_modules(self, result, top):
+        modules = result['modules']
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'Slowest imports ({len(modules)} modules, {sum(m["self_ms"] for m in modules):.1f} ms in all)'
+        ))
+        self.stdout.write(f"  {'module':<52} {'cumulative':>10} {'self':>8}")
+        for module in sorted(modules, key=lambda module: module['cumulative_ms'], reverse=True)[:top]:
+            name = '  ' * min(module['depth'], 6) + module['name']
+            self.stdout.write(f"  {name:<52} {module['cumulative_ms']:>7.1f} ms {module['self_ms']:>5.1f} ms")
+        self.stdout.write(self.style.MIGRATE_HEADING('Import time per package (ms)'))
+        for package, total in startup.packages(modules)[:top]:
+            self.stdout.write(f'  {package:<52} {total:>7.1f}')
+
+    def write_comparison(self, name, results):
+        eager, lazy = results['False'], results['True']
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Cold start, median of {eager['runs']} run(s): {name}=False vs True"
+        ))
+        self.stdout.write(f"  {'':<24} {'False':>9} {'True':>9} {'change':>9}")
+        rows = [(label, phase) for phase, label in startup.PHASES]
+        rows += [('boot to first response', 'total_ms'), ('whole process', 'process_ms')]
+        for label, phase in rows:
+            before, after = eager['median'][phase], lazy['median'][phase]
+            self.stdout.write(f'  {label:<24} {before:>6.1f} ms {after:>6.1f} ms {after - before:>+6.1f} ms')
+        self.stdout.write(
+            f"  {'modules imported':<24} {len(eager['modules']):>9} {len(lazy['modules']):>9} "
+            f"{len(lazy['modules']) - len(eager['modules']):>+9}"
+        )
+        deferred = sorted({m['name'] for m in eager['modules']} - {m['name'] for m in lazy['modules']})
+        if deferred:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'Not imported with {name}=True'))
+            for package, total in startup.packages([m for m in eager['modules'] if m['name'] in deferred]):
+                self.stdout.write(f'  {package:<52} {total:>7.1f} ms')
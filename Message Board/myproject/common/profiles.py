@@ -0,0 +1,46 @@
+"""
+Settings shared by the projects' settings modules, imported from there.
+"""
+import copy
+
+# Production SQLite profile (SQLITE_PRODUCTION=True in the projects' settings)
+# WAL lets readers run alongside the single writer, synchronous=NORMAL is
+# durable across app crashes in WAL mode, mmap/cache keep hot pages in memory,
+# and BEGIN IMMEDIATE takes the write lock at the start of a transaction so a
+# busy writer waits (up to `timeout` seconds, SQLite's busy_timeout) instead of
+# failing with "database is locked" when a read transaction upgrades to a write.
+SQLITE_PRODUCTION_OPTIONS = {
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA mmap_size=268435456;'  # 256 MB
+        'PRAGMA cache_size=-64000;'  # 64 MB
+        'PRAGMA temp_store=MEMORY;'
+    ),
+    'transaction_mode': 'IMMEDIATE',
+    'timeout': 20,
+}
+
+
+def production_templates(templates):
+    """
+    TEMPLATES for the production profile (DJANGO_PRODUCTION=True): the
+    Django engine without the debug information DEBUG records for every
+    node, and with explicit cached loaders so each template is compiled
+    once per process. (Django 5.2 already caches loaded templates when no
+    loaders are configured, even with DEBUG on.)
+    """
+    templates = copy.deepcopy(templates)
+    for engine in templates:
+        if not engine['BACKEND'].endswith('DjangoTemplates'):
+            continue
+        engine['APP_DIRS'] = False  # replaced by the loaders below
+        engine.setdefault('OPTIONS', {})
+        engine['OPTIONS']['debug'] = False
+        engine['OPTIONS']['loaders'] = [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ]
+    return templates
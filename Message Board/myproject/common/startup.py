@@ -0,0 +1,168 @@
+"""
+Cold start profile of the project, measured in a fresh interpreter.
+
+profile() runs PROBE in a new Python process with -X importtime. The probe
+sets up Django, timing each app's creation (importing its package), models
+import and ready(), then builds the WSGI application, loads the URLconf and
+sends one request through the WSGI application, as a new worker would.
+The per-module times CPython prints to stderr are parsed by
+parse_importtime().
+"""
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+
+PROBE = r'''
+import json, os, sys, time
+start = time.perf_counter()
+marks = {}
+apps = {}
+
+import django
+from django.apps.config import AppConfig
+marks['import_django'] = time.perf_counter()
+
+create = AppConfig.create.__func__
+
+
+def timed(config, name):
+    method = getattr(config, name)
+
+    def run(*args, **kwargs):
+        began = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            apps[config.label][name] = (time.perf_counter() - began) * 1000
+    setattr(config, name, run)
+
+
+def timed_create(cls, entry):
+    began = time.perf_counter()
+    config = create(cls, entry)
+    apps[config.label] = {'name': config.name, 'create': (time.perf_counter() - began) * 1000}
+    timed(config, 'import_models')
+    timed(config, 'ready')
+    return config
+
+
+AppConfig.create = classmethod(timed_create)
+django.setup()
+marks['setup'] = time.perf_counter()
+
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+marks['wsgi'] = time.perf_counter()
+
+from django.urls import get_resolver
+get_resolver().url_patterns
+marks['urls'] = time.perf_counter()
+
+from wsgiref.util import setup_testing_defaults
+environ = {'PATH_INFO': os.environ['STARTUP_PATH'], 'HTTP_HOST': os.environ['STARTUP_HOST']}
+setup_testing_defaults(environ)
+status = []
+response = application(environ, lambda code, headers, exc_info=None: status.append(code))
+b''.join(response)
+response.close()
+marks['first_response'] = time.perf_counter()
+
+previous = start
+phases = {}
+for name, mark in marks.items():
+    phases[name] = (mark - previous) * 1000
+    previous = mark
+print(json.dumps({
+    'phases': phases,
+    'total_ms': (previous - start) * 1000,
+    'status': status[0] if status else None,
+    'apps': list(apps.values()),
+}))
+'''
+
+PHASES = [
+    ('import_django', 'import django'),
+    ('setup', 'django.setup()'),
+    ('wsgi', 'WSGI application'),
+    ('urls', 'URLconf'),
+    ('first_response', 'first response'),
+]
+
+_IMPORTTIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def parse_importtime(output):
+    """
+    The modules listed by -X importtime as dicts of name, self_ms,
+    cumulative_ms and depth (0 for a module imported by the probe itself)
+    """
+    modules = []
+    for line in output.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            modules.append({
+                'name': name,
+                'self_ms': int(own) / 1000,
+                'cumulative_ms': int(cumulative) / 1000,
+                'depth': (len(indent) - 1) // 2,
+            })
+    return modules
+
+
+def packages(modules):
+    """
+    Import time per top-level package: the sum of its modules' own times
+    """
+    totals = {}
+    for module in modules:
+        package = module['name'].split('.')[0]
+        totals[package] = totals.get(package, 0) + module['self_ms']
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def run_probe(path='/', host='localhost', env=None):
+    environ = {
+        **os.environ,
+        'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE),
+        'STARTUP_PATH': path,
+        'STARTUP_HOST': host,
+        **(env or {}),
+    }
+    environ.pop('PYTHONPROFILEIMPORTTIME', None)
+    began = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE],
+        cwd=settings.BASE_DIR, env=environ, capture_output=True, text=True,
+    )
+    elapsed = (time.perf_counter() - began) * 1000
+    lines = process.stdout.strip().splitlines()
+    if process.returncode != 0 or not lines:
+        errors = [line for line in process.stderr.splitlines() if not line.startswith('import time:')]
+        raise RuntimeError('\n'.join(errors[-20:]) or f'probe exited with {process.returncode}')
+    result = json.loads(lines[-1])
+    result['process_ms'] = elapsed
+    result['modules'] = parse_importtime(process.stderr)
+    return result
+
+
+def profile(repeat=3, path='/', host='localhost', env=None):
+    """
+    Run the probe ``repeat`` times; the run with the median time to first
+    response is returned, with the median of every phase across runs
+    """
+    runs = sorted((run_probe(path, host, env) for _ in range(repeat)), key=lambda run: run['total_ms'])
+    result = runs[len(runs) // 2]
+    result['runs'] = repeat
+    result['median'] = {
+        name: statistics.median(run['phases'][name] for run in runs) for name, _ in PHASES
+    }
+    result['median']['total_ms'] = statistics.median(run['total_ms'] for run in runs)
+    result['median']['process_ms'] = statistics.median(run['process_ms'] for run in runs)
+    return result
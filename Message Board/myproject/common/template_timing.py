@@ -0,0 +1,145 @@
+"""
+Render time per template section.
+
+install() wraps IncludeNode.render, BlockNode.render and the filters named
+in TEMPLATE_TIMING_FILTERS. While a page renders (TimedTemplate in the
+project's metrics module) the time of every {% include %}, {% block %} and
+filter call is added up per section. Sections nest, and a section's own
+time leaves out the sections inside it, so the own times show where a
+page's render time actually goes.
+
+The wrappers cost time on every include, block and filter call, so they
+are only installed when TEMPLATE_SECTION_TIMING is on (off by default) or
+by the profile_templates command. Once installed, TimedTemplate adds the
+sections of every page render to the template_section_seconds_total and
+template_section_calls_total counters of /metrics; collect() hands the
+profiles to the caller.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.template import defaultfilters
+from django.template.loader_tags import BlockNode, IncludeNode
+
+ENABLED = getattr(settings, 'TEMPLATE_SECTION_TIMING', False)
+FILTERS = getattr(settings, 'TEMPLATE_TIMING_FILTERS', [
+    'date', 'time', 'timesince', 'truncatewords', 'truncatechars', 'linebreaks', 'linebreaksbr', 'urlize',
+])
+
+_profile = contextvars.ContextVar('template_profile', default=None)
+_collector = contextvars.ContextVar('template_profile_collector', default=None)
+_installed = False
+
+
+class Profile:
+    def __init__(self, template):
+        self.template = template
+        self.started = time.perf_counter()
+        self.elapsed = None
+        # label -> [calls, total seconds, own seconds]
+        self.sections = {}
+        # [start, seconds spent in nested sections] of the open sections
+        self._stack = []
+
+    def enter(self):
+        self._stack.append([time.perf_counter(), 0.0])
+
+    def exit(self, label):
+        start, nested = self._stack.pop()
+        elapsed = time.perf_counter() - start
+        if self._stack:
+            self._stack[-1][1] += elapsed
+        section = self.sections.setdefault(label, [0, 0.0, 0.0])
+        section[0] += 1
+        section[1] += elapsed
+        section[2] += elapsed - nested
+
+
+def _timed(label, function, *args, **kwargs):
+    profile = _profile.get()
+    if profile is None:
+        return function(*args, **kwargs)
+    profile.enter()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        profile.exit(label)
+
+
+def _timed_filter(name, function):
+    label = f'|{name}'
+
+    # wraps() keeps is_safe, needs_autoescape and the signature the parser checks
+    @wraps(function)
+    def timed(*args, **kwargs):
+        return _timed(label, function, *args, **kwargs)
+    return timed
+
+
+def _include_label(node):
+    token = getattr(node, 'token', None)
+    contents = token.contents if token is not None else f'include {node.template.token}'
+    return '{% ' + (contents if len(contents) <= 80 else contents[:77] + '...') + ' %}'
+
+
+def install():
+    """
+    Wrap the include and block tags and the timed filters; templates
+    compiled before this runs are not timed
+    """
+    global _installed
+    if _installed:
+        return
+    _installed = True
+
+    render_include = IncludeNode.render
+    render_block = BlockNode.render
+
+    def timed_include(self, context):
+        return _timed(_include_label(self), render_include, self, context)
+
+    def timed_block(self, context):
+        return _timed(f'{{% block {self.name} %}}', render_block, self, context)
+
+    IncludeNode.render = timed_include
+    BlockNode.render = timed_block
+    for name in FILTERS:
+        if name in defaultfilters.register.filters:
+            defaultfilters.register.filters[name] = _timed_filter(name, defaultfilters.register.filters[name])
+
+
+def start(template):
+    """
+    Start profiling a page render; None if the wrappers are not installed
+    or a page is already being profiled (templates rendered while
+    rendering count towards it)
+    """
+    if not _installed or _profile.get() is not None:
+        return None
+    profile = Profile(template)
+    profile.token = _profile.set(profile)
+    return profile
+
+
+def finish(profile):
+    profile.elapsed = time.perf_counter() - profile.started
+    _profile.reset(profile.token)
+    collector = _collector.get()
+    if collector is not None:
+        collector.append(profile)
+
+
+@contextmanager
+def collect():
+    """
+    The profiles of the pages rendered inside the with block, as a list
+    """
+    profiles = []
+    token = _collector.set(profiles)
+    try:
+        yield profiles
+    finally:
+        _collector.reset(token)
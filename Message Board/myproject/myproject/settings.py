@@ -11,6 +11,9 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import os
+
+from common import profiles
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -38,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'posts.apps.PostsConfig',  # posts app
+    'common',  # instrumentation (common/)
 ]
 
 MIDDLEWARE = [
@@ -54,7 +58,7 @@ ROOT_URLCONF = 'myproject.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'common.metrics.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -81,6 +85,10 @@ DATABASES = {
     }
 }
 
+if os.environ.get('SQLITE_PRODUCTION', 'False') == 'True':
+    # WAL, busy timeout and BEGIN IMMEDIATE, see common/profiles.py
+    DATABASES['default']['OPTIONS'] = dict(profiles.SQLITE_PRODUCTION_OPTIONS)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -127,12 +135,43 @@ LOGIN_URL = '/admin/login/'
 LOGIN_REDIRECT_URL = '/admin/'
 LOGOUT_REDIRECT_URL = '/'
 
+# Cache shared by every process when REDIS_URL is set. LocMemCache is per
+# process: the archive_posts command (a separate process) then cannot clear
+# what the web workers cached, so their archive count only catches up after
+# POSTS_ARCHIVE_COUNT_TIMEOUT
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Session Security
 SESSION_COOKIE_AGE = 1800  # 30 minutes
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
 SESSION_COOKIE_HTTPONLY = True
 SESSION_SAVE_EVERY_REQUEST = True
+# Sliding expiry without a write per request: the row is only written when
+# the data changes or the expiry has moved by SESSION_REFRESH_THRESHOLD
+# seconds (posts/sessions.py). With REDIS_URL sessions are also read through
+# SESSION_CACHE_ALIAS; that cache must be shared by every process or a
+# logout in one worker leaves the session signed in on the others, so
+# without Redis each request reads the row
+SESSION_ENGINE = 'posts.sessions'
+SESSION_USE_CACHE = bool(os.environ.get('REDIS_URL'))
+SESSION_CACHE_ALIAS = 'default'
+SESSION_REFRESH_THRESHOLD = 60
+SESSION_CACHE_TIMEOUT = 300
+SESSION_PURGE_PROBABILITY = 0.01
+SESSION_PURGE_BATCH_SIZE = 500
 
 # Admin Security
 ADMIN_LOGIN_ATTEMPTS = 3
@@ -154,3 +193,51 @@ X_FRAME_OPTIONS = 'DENY'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Slow query log: times every statement per fingerprint and EXPLAINs the
+# ones slower than QUERYLOG_SLOW_MS in the background. Off unless
+# QUERYLOG_DIR is set (python manage.py query_report)
+QUERYLOG_DIR = os.environ.get('QUERYLOG_DIR', '')
+QUERYLOG_SLOW_MS = float(os.environ.get('QUERYLOG_SLOW_MS', 100))
+QUERYLOG_APPS = ['posts']
+QUERYLOG_FLUSH_INTERVAL = 10
+QUERYLOG_EXPLAIN_ANALYZE = False  # PostgreSQL only; runs the slow SELECT again
+
+# Prometheus metrics at /metrics. Each worker writes its numbers to
+# METRICS_DIR so a scrape adds up all processes; without it a scrape only
+# sees the worker that answers it
+MIDDLEWARE.insert(0, 'common.metrics.MetricsMiddleware')
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = 15
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Live home page updates (server-sent events at /events/, ASGI only). Point
+# POSTS_BROADCASTER at a shared pub/sub broadcaster to run several processes
+POSTS_BROADCASTER = 'posts.events.LocalBroadcaster'
+POSTS_STREAM_HEARTBEAT = 20  # seconds between keep-alive comments
+POSTS_STREAM_QUEUE_SIZE = 100  # events a slow client may fall behind by
+POSTS_STREAM_BACKLOG = 100  # missed posts sent on reconnect
+
+# Messages older than this move from Post to ArchivedPost when
+# `python manage.py archive_posts` runs (e.g. nightly from cron)
+POSTS_ARCHIVE_AFTER_DAYS = 365
+POSTS_ARCHIVE_BATCH_SIZE = 1000
+POSTS_ARCHIVE_COUNT_TIMEOUT = 300  # seconds the archived message count is cached
+
+# Full-text search (posts/search.py): only the newest matches of each table
+# are ranked, which bounds the cost of searching for very common words
+POSTS_SEARCH_RANK_WINDOW = 5000
+
+# Production profile (opt in with DJANGO_PRODUCTION=True), see
+# common.profiles.production_templates
+if os.environ.get('DJANGO_PRODUCTION', 'False') == 'True':
+    DEBUG = False
+    ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
+    TEMPLATES = profiles.production_templates(TEMPLATES)
+
+# Render time per {% include %}, {% block %} and filter in /metrics
+# (common/template_timing.py). Off by default: the timing wraps every
+# include, block and filter call; python manage.py profile_templates works
+# without it
+TEMPLATE_SECTION_TIMING = os.environ.get('TEMPLATE_SECTION_TIMING', 'False') == 'True'
@@ -16,8 +16,10 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from common import metrics
 
 urlpatterns = [
+    path('metrics', metrics.metrics_view, name='metrics'),
     path('admin/', admin.site.urls),
     path('', include('posts.urls')),
 ]
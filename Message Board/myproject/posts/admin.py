@@ -1,8 +1,25 @@
 from django.contrib import admin
-from .models import Post
+from . import search
+from .models import AnyPost, ArchivedPost, Post
+
+
+class FullTextSearchMixin:
+    """
+    Search the changelist through the full-text index (posts.search) of
+    ``search_tables`` instead of LIKE '%term%' over every row
+    """
+    search_tables = ('post',)
+    
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or not search.available():
+            return super().get_search_results(request, queryset, search_term)
+        ids = search.matching_ids(search_term, self.search_tables)
+        if ids is None:
+            return queryset, False
+        return queryset.filter(id__in=ids), False
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ['text_preview', 'created_at', 'admin_actions']
     list_filter = ['created_at']
     search_fields = ['text']
@@ -19,6 +36,48 @@ class PostAdmin(admin.ModelAdmin):
         return 'Edit | Delete'
     admin_actions.short_description = 'Actions'
 
+
+@admin.register(ArchivedPost)
+class ArchivedPostAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    search_tables = ('archive',)
+    list_display = ['text_preview', 'created_at', 'archived_at']
+    list_filter = ['created_at']
+    search_fields = ['text']
+    ordering = ['-created_at']
+    readonly_fields = ['id', 'text', 'created_at', 'archived_at']
+    
+    def text_preview(self, obj):
+        return obj.text[:50] + '...' if len(obj.text) > 50 else obj.text
+    text_preview.short_description = 'Message Preview'
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(AnyPost)
+class AnyPostAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    """
+    Search over hot and archived messages together
+    """
+    search_tables = ('post', 'archive')
+    list_display = ['text_preview', 'created_at', 'archived']
+    list_filter = ['archived', 'created_at']
+    search_fields = ['text']
+    ordering = ['-created_at']
+    
+    def text_preview(self, obj):
+        return obj.text[:50] + '...' if len(obj.text) > 50 else obj.text
+    text_preview.short_description = 'Message Preview'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 # Customize admin site headers
 admin.site.site_header = 'Message Board Administration'
 admin.site.site_title = 'Message Board Admin'
@@ -0,0 +1,62 @@
+"""
+Hot/archive split of the messages.
+
+Post only keeps the last POSTS_ARCHIVE_AFTER_DAYS days of messages, so the
+home page, the admin and the statistics work on a table that stays small
+and in memory. Older messages are moved to ArchivedPost by the
+archive_posts command, one bounded batch per transaction so writers are
+never held up for long. AnyPost is a UNION ALL view over both tables for
+the pages that need every message (admin search, the older messages page).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from .models import ArchivedPost, Post
+
+ARCHIVE_AFTER_DAYS = getattr(settings, 'POSTS_ARCHIVE_AFTER_DAYS', 365)
+BATCH_SIZE = getattr(settings, 'POSTS_ARCHIVE_BATCH_SIZE', 1000)
+COUNT_TIMEOUT = getattr(settings, 'POSTS_ARCHIVE_COUNT_TIMEOUT', 300)
+
+COUNT_KEY = 'posts:archive:count'
+
+
+def cutoff(days=ARCHIVE_AFTER_DAYS):
+    return timezone.now() - timedelta(days=days)
+
+
+def archive_batch(before, batch_size=BATCH_SIZE):
+    """
+    Move up to ``batch_size`` of the oldest messages created before
+    ``before`` to the archive. Returns the number moved.
+    """
+    with transaction.atomic():
+        rows = list(
+            Post.objects.filter(created_at__lt=before)
+            .order_by('created_at', 'id')
+            .values_list('id', 'text', 'created_at')[:batch_size]
+        )
+        if not rows:
+            return 0
+        ArchivedPost.objects.bulk_create(
+            [ArchivedPost(id=pk, text=text, created_at=created_at) for pk, text, created_at in rows],
+            ignore_conflicts=True,
+        )
+        Post.objects.filter(id__in=[pk for pk, _, _ in rows]).delete()
+    cache.delete(COUNT_KEY)
+    return len(rows)
+
+
+def archived_count():
+    """
+    Number of archived messages. The archive only changes when
+    archive_batch() runs, which clears the cached count; the timeout covers
+    processes that do not share a cache with archive_posts
+    """
+    count = cache.get(COUNT_KEY)
+    if count is None:
+        count = ArchivedPost.objects.count()
+        cache.set(COUNT_KEY, count, COUNT_TIMEOUT)
+    return count
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from datetime import datetime, timedelta
+from datetime import timedelta
+from django.utils import timezone
+from posts.archive import archived_count
 from posts.models import Post
 
 def admin_statistics(request):
@@ -9,18 +11,21 @@ def admin_statistics(request):
     if not request.path.startswith('/admin/'):
         return {}
     
-    today = datetime.now().date()
+    # Datetime ranges rather than __date lookups, so the created_at index is used
+    today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
     week_ago = today - timedelta(days=7)
     
     try:
-        total_posts = Post.objects.count()
-        today_posts = Post.objects.filter(created_at__date=today).count()
-        week_posts = Post.objects.filter(created_at__date__gte=week_ago).count()
+        archived_posts = archived_count()
+        total_posts = Post.objects.count() + archived_posts
+        today_posts = Post.objects.filter(created_at__gte=today).count()
+        week_posts = Post.objects.filter(created_at__gte=week_ago).count()
     except:
-        total_posts = today_posts = week_posts = 0
+        total_posts = today_posts = week_posts = archived_posts = 0
     
     return {
         'total_posts': total_posts,
         'today_posts': today_posts,
         'week_posts': week_posts,
+        'archived_posts': archived_posts,
     }
\ No newline at end of file
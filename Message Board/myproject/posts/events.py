@@ -0,0 +1,179 @@
+"""
+Live updates for the home page over server-sent events.
+
+Each new Post is rendered once and published, after its transaction
+commits, to the broadcaster named by POSTS_BROADCASTER. LocalBroadcaster
+fans it out to the /events/ streams open in this process; a broadcaster
+for a shared pub/sub (Redis, PostgreSQL LISTEN/NOTIFY) only has to call
+LocalBroadcaster.publish() in every process for each event it receives.
+
+Event ids are (created_at, id) cursors. A client that reconnects sends the
+last one it saw as Last-Event-ID and first gets the posts it missed from
+the database, so a dropped connection, a restart or a stream closed for
+falling behind loses nothing.
+
+Streams need the ASGI server (myproject/asgi.py): one idle stream is a
+queue waiting on the event loop, not a thread.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import Post
+
+HEARTBEAT = getattr(settings, 'POSTS_STREAM_HEARTBEAT', 20)
+RETRY_MS = getattr(settings, 'POSTS_STREAM_RETRY_MS', 3000)
+QUEUE_SIZE = getattr(settings, 'POSTS_STREAM_QUEUE_SIZE', 100)
+BACKLOG_LIMIT = getattr(settings, 'POSTS_STREAM_BACKLOG', 100)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def cursor(created_at, pk):
+    """
+    (microseconds since the epoch, id), ordered like the posts
+    """
+    return (created_at - EPOCH) // timedelta(microseconds=1), pk
+
+
+def format_cursor(key):
+    return f'{key[0]}-{key[1]}'
+
+
+def parse_cursor(value):
+    microseconds, pk = value.split('-')
+    return int(microseconds), int(pk)
+
+
+def latest_cursor():
+    """
+    Cursor of the newest post, or of now if there are none
+    """
+    latest = Post.objects.order_by('-created_at', '-id').values_list('created_at', 'id').first()
+    return format_cursor(cursor(*latest) if latest else cursor(timezone.now(), 0))
+
+
+def post_event(post):
+    key = cursor(post.created_at, post.pk)
+    return {
+        'key': key,
+        'id': format_cursor(key),
+        'data': json.dumps({'id': post.pk, 'html': render_to_string('posts/includes/post.html', {'post': post})}),
+    }
+
+
+def missed_events(after, limit=BACKLOG_LIMIT):
+    created_at = EPOCH + timedelta(microseconds=after[0])
+    posts = Post.objects.filter(
+        Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=after[1])
+    ).order_by('created_at', 'id')[:limit]
+    return [post_event(post) for post in posts]
+
+
+class Subscription:
+    def __init__(self, loop, queue_size):
+        self.loop = loop
+        self.queue = asyncio.Queue(queue_size)
+        self.overflowed = False
+
+    def deliver(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too far behind; the stream ends and the client catches up on reconnect
+            self.overflowed = True
+
+
+class LocalBroadcaster:
+    """
+    Fans events out to the subscribers in this process. publish() may be
+    called from any thread; each event loop is woken once per event.
+    """
+    def __init__(self, queue_size=QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.lock = threading.Lock()
+
+    def subscribe(self):
+        subscription = Subscription(asyncio.get_running_loop(), self.queue_size)
+        with self.lock:
+            self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+    def publish(self, event):
+        by_loop = defaultdict(list)
+        with self.lock:
+            for subscription in self.subscribers:
+                by_loop[subscription.loop].append(subscription)
+        for loop, subscriptions in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_deliver_all, subscriptions, event)
+            except RuntimeError:
+                # The loop is closed; its streams are gone
+                for subscription in subscriptions:
+                    self.unsubscribe(subscription)
+
+
+def _deliver_all(subscriptions, event):
+    for subscription in subscriptions:
+        subscription.deliver(event)
+
+
+_broadcaster = None
+
+
+def get_broadcaster():
+    global _broadcaster
+    if _broadcaster is None:
+        _broadcaster = import_string(getattr(settings, 'POSTS_BROADCASTER', 'posts.events.LocalBroadcaster'))()
+    return _broadcaster
+
+
+def publish_post(post):
+    get_broadcaster().publish(post_event(post))
+
+
+def _message(event):
+    return f'id: {event["id"]}\nevent: post\ndata: {event["data"]}\n\n'
+
+
+async def stream(after=None):
+    """
+    The event stream of one client: the posts after ``after``, then new
+    posts as they are published, with a comment line every HEARTBEAT
+    seconds to keep proxies from closing an idle connection
+    """
+    broadcaster = get_broadcaster()
+    # Subscribe before reading the backlog so nothing falls in between
+    subscription = broadcaster.subscribe()
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        last = after
+        if after is not None:
+            for event in await sync_to_async(missed_events)(after):
+                yield _message(event)
+                last = event['key']
+        while not subscription.overflowed:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            if last is not None and event['key'] <= last:
+                continue
+            yield _message(event)
+            last = event['key']
+    finally:
+        broadcaster.unsubscribe(subscription)
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from posts import archive
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Move messages older than the retention window to the archive table, in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=archive.ARCHIVE_AFTER_DAYS, help='Keep this many days in the hot table')
+        parser.add_argument('--batch-size', type=int, default=archive.BATCH_SIZE, help='Messages moved per transaction')
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches')
+        parser.add_argument('--sleep', type=float, default=0.05, help='Seconds to pause between batches, to let other writers in')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be moved')
+
+    def handle(self, *args, **options):
+        before = archive.cutoff(options['days'])
+        if options['dry_run']:
+            count = Post.objects.filter(created_at__lt=before).count()
+            self.stdout.write(f'{count} message(s) created before {before:%Y-%m-%d %H:%M} would be archived.')
+            return
+
+        moved = batches = 0
+        start = time.perf_counter()
+        while options['max_batches'] is None or batches < options['max_batches']:
+            count = archive.archive_batch(before, options['batch_size'])
+            if not count:
+                break
+            moved += count
+            batches += 1
+            self.stdout.write(f'Batch {batches}: {count} message(s) archived')
+            time.sleep(options['sleep'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {moved} message(s) in {batches} batch(es), {elapsed:.1f}s. '
+            f'{Post.objects.count()} message(s) left in the hot table.'
+        ))
@@ -0,0 +1,112 @@
+import itertools
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from posts import search
+
+
+class Command(BaseCommand):
+    help = (
+        'Time LIKE and FTS5 searches over a generated message table in a scratch SQLite '
+        'database (the project database is not touched)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query')
+        parser.add_argument('--db', help='Scratch database file (default: a temporary file, deleted afterwards)')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        path = options['db'] or os.path.join(tempfile.mkdtemp(), 'bench_search.sqlite3')
+        db = sqlite3.connect(path)
+        try:
+            vocabulary = self.populate(db, options['messages'], random.Random(options['seed']))
+            self.run(db, vocabulary, options['repeat'])
+        finally:
+            db.close()
+            if not options['db']:
+                os.unlink(path)
+
+    def populate(self, db, count, rng):
+        """
+        posts_post with ``count`` messages of 8-40 words from a Zipf-like
+        vocabulary, indexed the way migration 0004 indexes it
+        """
+        syllables = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'to', 'vi', 'de', 'po', 'la', 'zen', 'tor', 'ben']
+        vocabulary = sorted({''.join(rng.choices(syllables, k=rng.randint(2, 4))) for _ in range(20000)})
+        rng.shuffle(vocabulary)
+        cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+
+        start = time.perf_counter()
+        db.execute('DROP TABLE IF EXISTS posts_post_fts')
+        db.execute('DROP TABLE IF EXISTS posts_post')
+        db.execute('CREATE TABLE posts_post (id INTEGER PRIMARY KEY, text TEXT NOT NULL, created_at TEXT NOT NULL)')
+        db.execute('CREATE INDEX posts_post_created_at ON posts_post (created_at)')
+        batch = []
+        for pk in range(1, count + 1):
+            text = ' '.join(rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(8, 40)))
+            batch.append((pk, text, f'2025-01-01 00:00:{pk:010d}'))
+            if len(batch) == 10000:
+                db.executemany('INSERT INTO posts_post VALUES (?, ?, ?)', batch)
+                batch = []
+        db.executemany('INSERT INTO posts_post VALUES (?, ?, ?)', batch)
+        loaded = time.perf_counter() - start
+
+        start = time.perf_counter()
+        db.execute(
+            "CREATE VIRTUAL TABLE posts_post_fts USING fts5(text, content='posts_post', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        db.execute("INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')")
+        db.commit()
+        self.stdout.write(
+            f'{count} messages generated in {loaded:.1f}s, FTS5 index built in {time.perf_counter() - start:.1f}s'
+        )
+        return vocabulary
+
+    def time_query(self, db, sql, params, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            db.execute(sql, params).fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def run(self, db, vocabulary, repeat):
+        queries = {
+            'common word': vocabulary[0],
+            'rare word': vocabulary[-1],
+            'prefix (3 letters)': vocabulary[5][:3],
+            'two words': f'{vocabulary[1]} {vocabulary[50]}',
+        }
+        # What the admin changelist ran before: a count and a page, both LIKE '%term%' per word
+        fts_sql = search.ranked_sql('posts_post', 'FALSE').replace('%s', '?')
+        count_sql = search.matching_sql('posts_post').replace('%s', '?')
+
+        self.stdout.write(f'{"query":<20} {"LIKE count+page":>17} {"FTS5 count+page":>17} {"matches":>9}')
+        for label, query in queries.items():
+            terms = search.words(query)
+            where = ' AND '.join(['text LIKE ?'] * len(terms))
+            like_params = [f'%{term}%' for term in terms]
+            like = [
+                self.time_query(db, f'SELECT COUNT(*) FROM posts_post WHERE {where}', like_params, repeat),
+                self.time_query(
+                    db, f'SELECT id FROM posts_post WHERE {where} ORDER BY created_at DESC LIMIT 100', like_params, repeat,
+                ),
+            ]
+            expression = search.match_expression(query)
+            fts = [
+                self.time_query(db, f'SELECT COUNT(*) FROM ({count_sql})', [expression], repeat),
+                self.time_query(db, f'SELECT * FROM ({fts_sql}) ORDER BY rank LIMIT 20', [expression] * 2, repeat),
+            ]
+            matches = db.execute(f'SELECT COUNT(*) FROM ({count_sql})', [expression]).fetchone()[0]
+            self.stdout.write(
+                f'{label:<20} {sum(like):>14.1f} ms {sum(fts):>14.1f} ms {matches:>9}'
+            )
+        self.stdout.write('Median of each query over --repeat runs.')
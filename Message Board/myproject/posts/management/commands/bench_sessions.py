@@ -0,0 +1,80 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+
+ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'coalescing': 'posts.sessions',
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+class SessionQueryCounter:
+    def __init__(self):
+        self.reads = 0
+        self.writes = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if 'django_session' in sql:
+            if sql.lstrip().upper().startswith('SELECT'):
+                self.reads += 1
+            else:
+                self.writes += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = 'Compare session reads and writes per request across session engines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=20, help='Simultaneous sessions')
+        parser.add_argument('--requests', type=int, default=25, help='Requests per client')
+        parser.add_argument('--engine', choices=list(ENGINES), action='append', help='Engines to run (default: all)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{options["clients"]} clients x {options["requests"]} requests '
+            '(half signed in to the admin, half anonymous on the login page)'
+        )
+        self.stdout.write(f'{"engine":<12} {"reads/req":>10} {"writes/req":>11} {"req/s":>8}')
+        for name in options['engine'] or ENGINES:
+            reads, writes, total, elapsed = self.run(ENGINES[name], options['clients'], options['requests'])
+            self.stdout.write(f'{name:<12} {reads / total:>10.3f} {writes / total:>11.3f} {total / elapsed:>8.0f}')
+
+    def run(self, engine, clients, requests):
+        """
+        Everything the run writes, sessions included, is rolled back
+        """
+        counter = SessionQueryCounter()
+        try:
+            with override_settings(SESSION_ENGINE=engine), transaction.atomic():
+                caches['default'].clear()
+                user = User.objects.create_user('bench-sessions', is_staff=True, is_superuser=True)
+                browsers = []
+                for i in range(clients):
+                    client = Client(HTTP_HOST='localhost')
+                    if i % 2 == 0:
+                        client.force_login(user)
+                        browsers.append((client, '/admin/'))
+                    else:
+                        browsers.append((client, '/admin/login/'))
+
+                start = time.perf_counter()
+                with connection.execute_wrapper(counter):
+                    for _ in range(requests):
+                        for client, path in browsers:
+                            client.get(path)
+                elapsed = time.perf_counter() - start
+                raise Rollback
+        except Rollback:
+            pass
+        return counter.reads, counter.writes, clients * requests, elapsed
@@ -0,0 +1,87 @@
+import asyncio
+import resource
+import statistics
+import time
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from posts import events
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Open many idle /events/ streams on one event loop and time the fan-out of one message'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=2000)
+        parser.add_argument('--events', type=int, default=5, help='Messages to publish')
+
+    def handle(self, *args, **options):
+        asyncio.run(self.run(options['subscribers'], options['events']))
+
+    async def run(self, subscribers, count):
+        application = get_asgi_application()
+        disconnect = asyncio.Event()
+        opened = asyncio.Semaphore(0)
+        received = [[] for _ in range(subscribers)]
+
+        async def subscriber(index):
+            requested = False
+
+            async def receive():
+                nonlocal requested
+                if not requested:
+                    requested = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                body = message.get('body', b'')
+                if body.startswith(b'retry:'):
+                    opened.release()
+                elif b'event: post' in body:
+                    received[index].append(time.perf_counter())
+
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': 'GET', 'scheme': 'http', 'path': '/events/', 'raw_path': b'/events/',
+                'query_string': b'', 'root_path': '',
+                'headers': [(b'host', b'localhost'), (b'accept', b'text/event-stream')],
+                'client': ('127.0.0.1', 10000 + index), 'server': ('localhost', 80),
+            }
+            await application(scope, receive, send)
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        tasks = [asyncio.create_task(subscriber(i)) for i in range(subscribers)]
+        for _ in range(subscribers):
+            await opened.acquire()
+        connect_time = time.perf_counter() - start
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.stdout.write(
+            f'{subscribers} streams open in {connect_time:.2f}s, '
+            f'max RSS +{(rss_after - rss_before) / 1024:.1f} MB '
+            f'({(rss_after - rss_before) / subscribers:.1f} KB per stream)'
+        )
+
+        latencies = []
+        for n in range(count):
+            # An unsaved post: the test publishes without writing to the database
+            post = Post(pk=10 ** 9 + n, text=f'Load test message {n}', created_at=timezone.now())
+            sent_at = time.perf_counter()
+            await asyncio.to_thread(events.publish_post, post)
+            while sum(len(times) > n for times in received) < subscribers:
+                await asyncio.sleep(0.001)
+            latencies += [times[n] - sent_at for times in received]
+            self.stdout.write(f'message {n + 1}: all {subscribers} delivered in {max(times[n] for times in received) - sent_at:.3f}s')
+
+        latencies.sort()
+        self.stdout.write(
+            f'delivery latency p50 {statistics.median(latencies) * 1000:.1f} ms, '
+            f'p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms'
+        )
+        disconnect.set()
+        await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), timeout=30)
+        self.stdout.write(f'{len(events.get_broadcaster().subscribers)} subscription(s) left after disconnect')
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0002_alter_post_options_alter_post_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnyPost',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('text', models.TextField(verbose_name='Message Content')),
+                ('created_at', models.DateTimeField()),
+                ('archived', models.BooleanField()),
+            ],
+            options={
+                'verbose_name': 'Message (including archive)',
+                'verbose_name_plural': 'All messages (including archive)',
+                'db_table': 'posts_anypost',
+                'ordering': ['-created_at'],
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedPost',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('text', models.TextField(verbose_name='Message Content')),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Archived message',
+                'verbose_name_plural': 'Archived messages',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.RunSQL(
+            sql=(
+                'CREATE VIEW posts_anypost AS '
+                'SELECT id, text, created_at, FALSE AS archived FROM posts_post '
+                'UNION ALL '
+                'SELECT id, text, created_at, TRUE AS archived FROM posts_archivedpost'
+            ),
+            reverse_sql='DROP VIEW posts_anypost',
+        ),
+    ]
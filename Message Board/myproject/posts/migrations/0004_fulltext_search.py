@@ -0,0 +1,56 @@
+from django.db import migrations
+
+TABLES = ['posts_post', 'posts_archivedpost']
+CONFIG = 'english'
+
+
+def create_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table in TABLES:
+        if vendor == 'sqlite':
+            # External-content FTS5 table: stores only the index, reads text from the table
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {table}_fts USING fts5("
+                f"text, content='{table}', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+            schema_editor.execute(
+                f"CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {table}_fts(rowid, text) VALUES (new.id, new.text); END"
+            )
+            schema_editor.execute(
+                f"CREATE TRIGGER {table}_fts_delete AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {table}_fts({table}_fts, rowid, text) VALUES ('delete', old.id, old.text); END"
+            )
+            schema_editor.execute(
+                f"CREATE TRIGGER {table}_fts_update AFTER UPDATE OF text ON {table} BEGIN "
+                f"INSERT INTO {table}_fts({table}_fts, rowid, text) VALUES ('delete', old.id, old.text); "
+                f"INSERT INTO {table}_fts(rowid, text) VALUES (new.id, new.text); END"
+            )
+            schema_editor.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+        elif vendor == 'postgresql':
+            schema_editor.execute(
+                f"CREATE INDEX {table}_text_fts ON {table} USING GIN (to_tsvector('{CONFIG}', text))"
+            )
+
+
+def drop_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table in TABLES:
+        if vendor == 'sqlite':
+            for trigger in ('insert', 'delete', 'update'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{trigger}')
+            schema_editor.execute(f'DROP TABLE IF EXISTS {table}_fts')
+        elif vendor == 'postgresql':
+            schema_editor.execute(f'DROP INDEX IF EXISTS {table}_text_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_archive'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
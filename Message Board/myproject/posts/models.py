@@ -5,7 +5,7 @@ class Post(models.Model):
         help_text="Write your message here. It will be displayed on the homepage for everyone to see.",
         verbose_name="Message Content"
     )
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     
     def __str__(self):
         """String representation that shows a preview of each message."""
@@ -15,3 +15,43 @@ class Post(models.Model):
         ordering = ['-created_at']  # Show newest posts first
         verbose_name = "Message"
         verbose_name_plural = "Messages"
+
+
+class ArchivedPost(models.Model):
+    """
+    A message moved out of Post by the archive_posts command, under the
+    same id, so the hot table only holds recent messages
+    """
+    id = models.BigIntegerField(primary_key=True)
+    text = models.TextField(verbose_name="Message Content")
+    created_at = models.DateTimeField(db_index=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.text[:50] + '...' if len(self.text) > 50 else self.text
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Archived message"
+        verbose_name_plural = "Archived messages"
+
+
+class AnyPost(models.Model):
+    """
+    Read-only view of every message, hot and archived (a UNION ALL view
+    created by migration 0003)
+    """
+    id = models.BigIntegerField(primary_key=True)
+    text = models.TextField(verbose_name="Message Content")
+    created_at = models.DateTimeField()
+    archived = models.BooleanField()
+
+    def __str__(self):
+        return self.text[:50] + '...' if len(self.text) > 50 else self.text
+
+    class Meta:
+        managed = False
+        db_table = 'posts_anypost'
+        ordering = ['-created_at']
+        verbose_name = "Message (including archive)"
+        verbose_name_plural = "All messages (including archive)"
@@ -0,0 +1,147 @@
+"""
+Full-text search over the messages, hot and archived.
+
+On SQLite each table has an external-content FTS5 index (posts_post_fts,
+posts_archivedpost_fts) kept up to date by triggers; on PostgreSQL each
+has a GIN index on to_tsvector(CONFIG, text). Both are created by
+migration 0004. Queries are ranked (bm25 / ts_rank), every word is matched
+as a prefix, so results come up while a word is still being typed, and
+matches are highlighted with <mark>.
+
+Ranking scores every match, which for a word in most messages costs more
+than the LIKE scan it replaces, so only the newest POSTS_SEARCH_RANK_WINDOW
+matches of each table are ranked; the total still counts every match.
+
+On any other database search() returns None and the callers fall back to
+LIKE.
+"""
+import re
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+CONFIG = 'english'  # PostgreSQL text search configuration of the GIN indexes
+SNIPPET_WORDS = 32
+RANK_WINDOW = getattr(settings, 'POSTS_SEARCH_RANK_WINDOW', 5000)
+TABLES = {'post': 'posts_post', 'archive': 'posts_archivedpost'}
+
+# Highlight markers that cannot occur in HTML-escaped text
+_START, _STOP = '\x02', '\x03'
+_WORD = re.compile(r'\w+')
+
+
+def available():
+    return connection.vendor in ('sqlite', 'postgresql')
+
+
+def words(query):
+    return _WORD.findall(query.lower())[:16]
+
+
+def match_expression(query):
+    """
+    The query as an FTS5 MATCH string or a PostgreSQL tsquery, every word
+    required and matched as a prefix; None if it has no words
+    """
+    terms = words(query)
+    if not terms:
+        return None
+    if connection.vendor == 'postgresql':
+        return ' & '.join(f'{term}:*' for term in terms)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def matching_sql(table):
+    if connection.vendor == 'postgresql':
+        return f"SELECT id FROM {table} WHERE to_tsvector('{CONFIG}', text) @@ to_tsquery('{CONFIG}', %s)"
+    return f'SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH %s'
+
+
+def matching_ids(query, tables=('post',)):
+    """
+    RawSQL for the ids of the messages in ``tables`` matching ``query``,
+    to filter a queryset with id__in; None if the query has no words
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return None
+    parts = [matching_sql(TABLES[name]) for name in tables]
+    return RawSQL(' UNION ALL '.join(parts), [expression] * len(parts))
+
+
+def ranked_sql(table, archived):
+    """
+    The newest RANK_WINDOW matches of ``table`` with their snippet and rank
+    (lower is better). Takes the match expression twice.
+    """
+    if connection.vendor == 'postgresql':
+        return (
+            f"SELECT id, created_at, {archived} AS archived, "
+            f"ts_headline('{CONFIG}', text, q, 'StartSel={_START}, StopSel={_STOP}, MaxWords={SNIPPET_WORDS}, MinWords=10') AS snippet, "
+            f"-ts_rank(to_tsvector('{CONFIG}', text), q) AS rank "
+            f"FROM {table}, to_tsquery('{CONFIG}', %s) q WHERE to_tsvector('{CONFIG}', text) @@ q "
+            f"AND id >= COALESCE(({matching_sql(table)} ORDER BY id DESC LIMIT 1 OFFSET {RANK_WINDOW - 1}), 0)"
+        )
+    return (
+        f"SELECT t.id, t.created_at, {archived} AS archived, "
+        f"snippet({table}_fts, 0, '{_START}', '{_STOP}', '…', {SNIPPET_WORDS}) AS snippet, "
+        f"bm25({table}_fts) AS rank "
+        f"FROM {table}_fts JOIN {table} t ON t.id = {table}_fts.rowid WHERE {table}_fts MATCH %s "
+        f"AND {table}_fts.rowid >= COALESCE(({matching_sql(table)} ORDER BY rowid DESC LIMIT 1 OFFSET {RANK_WINDOW - 1}), 0)"
+    )
+
+
+def highlight(snippet):
+    """
+    Escape a snippet and turn its match markers into <mark> tags
+    """
+    return mark_safe(escape(snippet).replace(_START, '<mark>').replace(_STOP, '</mark>'))
+
+
+def search(query, limit=20, offset=0, archive=True):
+    """
+    (results, total) of the messages matching ``query``, best first; each
+    result is a dict of id, created_at, archived, snippet (highlighted HTML)
+    and rank. Returns None if the database has no full-text index.
+    """
+    if not available():
+        return None
+    expression = match_expression(query)
+    if expression is None:
+        return [], 0
+    tables = [('posts_post', 'FALSE')]
+    if archive:
+        tables.append(('posts_archivedpost', 'TRUE'))
+    ranked = ' UNION ALL '.join(ranked_sql(table, archived) for table, archived in tables)
+    counted = ' UNION ALL '.join(matching_sql(table) for table, _ in tables)
+    params = [expression] * len(tables)
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM ({counted}) matches', params)
+        total = cursor.fetchone()[0]
+        cursor.execute(
+            f'SELECT * FROM ({ranked}) ranked ORDER BY rank, created_at DESC LIMIT %s OFFSET %s',
+            [expression] * (2 * len(tables)) + [limit, offset],
+        )
+        rows = cursor.fetchall()
+
+    results = []
+    for pk, created_at, archived, snippet, rank in rows:
+        # Raw SQL skips the field converters: SQLite gives naive UTC values
+        if isinstance(created_at, str):
+            created_at = parse_datetime(created_at)
+        if timezone.is_naive(created_at):
+            created_at = timezone.make_aware(created_at, dt_timezone.utc)
+        results.append({
+            'id': pk,
+            'created_at': created_at,
+            'archived': bool(archived),
+            'snippet': highlight(snippet),
+            'rank': rank,
+        })
+    return results, total
@@ -0,0 +1,151 @@
+"""
+Write-coalescing session backend.
+
+With SESSION_SAVE_EVERY_REQUEST the stock backends write the session row on
+every request just to push its expiry forward, and with CSRF_USE_SESSIONS
+even anonymous visitors of a page with a form have a session. This store
+keeps the 30 minute sliding expiry but only writes when the data changed or
+the expiry has moved by SESSION_REFRESH_THRESHOLD seconds or more since it
+was stored, so a session may end up to that many seconds early.
+
+Without a shared cache the rows are read on every request. With
+SESSION_USE_CACHE (set with REDIS_URL) sessions are read through the cache
+named by SESSION_CACHE_ALIAS, kept for at most SESSION_CACHE_TIMEOUT
+seconds, so busy sessions are not read from the database either. That
+cache must be shared by every process (Redis, Memcached): with a
+per-process LocMemCache a logout in one worker would leave the session
+signed in on the others.
+
+Expired rows are deleted a batch at a time: one batch after
+SESSION_PURGE_PROBABILITY of the writes, and in batches by clearsessions,
+so a purge never holds SQLite's write lock for a whole-table delete.
+"""
+import logging
+import random
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.utils import timezone
+
+logger = logging.getLogger('django.contrib.sessions')
+
+KEY_PREFIX = 'posts.sessions'
+REFRESH_THRESHOLD = getattr(settings, 'SESSION_REFRESH_THRESHOLD', 60)
+CACHE_TIMEOUT = getattr(settings, 'SESSION_CACHE_TIMEOUT', 300)
+PURGE_PROBABILITY = getattr(settings, 'SESSION_PURGE_PROBABILITY', 0.01)
+PURGE_BATCH_SIZE = getattr(settings, 'SESSION_PURGE_BATCH_SIZE', 500)
+USE_CACHE = getattr(settings, 'SESSION_USE_CACHE', False)
+
+
+class CoalescingSessionStore(DBStore):
+    """
+    Database sessions written only when their data or expiry changed enough
+    """
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._stored_expiry = None
+
+    def load_entry(self):
+        s = self._get_session_from_db()
+        if s is None:
+            return None
+        return {'data': self.decode(s.session_data), 'expire_date': s.expire_date}
+
+    def load(self):
+        entry = self.load_entry()
+        if entry is None:
+            self._stored_expiry = None
+            return {}
+        self._stored_expiry = entry['expire_date']
+        return entry['data']
+
+    def is_current(self):
+        """
+        True if saving now would only move the expiry by less than
+        SESSION_REFRESH_THRESHOLD
+        """
+        if self.session_key is None:
+            return False
+        self._get_session()
+        if self.modified or self._stored_expiry is None:
+            return False
+        return (self.get_expiry_date() - self._stored_expiry).total_seconds() < REFRESH_THRESHOLD
+
+    def stored(self, expire_date):
+        self._stored_expiry = expire_date
+
+    def save(self, must_create=False):
+        if not must_create and self.is_current():
+            return
+        DBStore.save(self, must_create)
+        self.stored(self.get_expiry_date())
+        if random.random() < PURGE_PROBABILITY:
+            purge_expired()
+
+    async def aload(self):
+        return await sync_to_async(self.load)()
+
+    async def asave(self, must_create=False):
+        await sync_to_async(self.save)(must_create)
+
+    @classmethod
+    def clear_expired(cls):
+        purge_expired(max_batches=None)
+
+
+class CachedCoalescingSessionStore(CoalescingSessionStore, CachedDBStore):
+    """
+    CoalescingSessionStore read through the shared SESSION_CACHE_ALIAS
+    """
+    cache_key_prefix = KEY_PREFIX
+
+    def _cache_entry(self, data, expire_date):
+        timeout = min(self.get_expiry_age(expiry=expire_date), CACHE_TIMEOUT)
+        self._cache.set(self.cache_key, {'data': data, 'expire_date': expire_date}, timeout)
+
+    def load_entry(self):
+        try:
+            entry = self._cache.get(self.cache_key)
+        except Exception:
+            # Some backends raise on invalid cache keys; see cached_db
+            entry = None
+        if entry is not None and entry['expire_date'] <= timezone.now():
+            entry = None
+
+        if entry is None:
+            entry = super().load_entry()
+            if entry is not None:
+                self._cache_entry(entry['data'], entry['expire_date'])
+        return entry
+
+    def stored(self, expire_date):
+        try:
+            self._cache_entry(self._session, expire_date)
+        except Exception:
+            logger.exception('Error saving to cache (%s)', self._cache)
+        super().stored(expire_date)
+
+
+SessionStore = CachedCoalescingSessionStore if USE_CACHE else CoalescingSessionStore
+
+
+def purge_expired(batch_size=PURGE_BATCH_SIZE, max_batches=1):
+    """
+    Delete expired sessions, oldest first, ``batch_size`` rows per
+    statement. Returns the number of rows deleted.
+    """
+    model = SessionStore.get_model_class()
+    deleted = batches = 0
+    while max_batches is None or batches < max_batches:
+        keys = list(
+            model.objects.filter(expire_date__lt=timezone.now())
+            .order_by('expire_date')
+            .values_list('session_key', flat=True)[:batch_size]
+        )
+        if not keys:
+            break
+        deleted += model.objects.filter(session_key__in=keys).delete()[0]
+        batches += 1
+    return deleted
@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .events import publish_post
+from .models import Post
+
+
+@receiver(post_save, sender=Post)
+def publish_new_post(sender, instance, created, **kwargs):
+    """
+    Push new messages to the open home pages once they are committed
+    """
+    if created:
+        transaction.on_commit(lambda: publish_post(instance))
@@ -1,3 +1,198 @@
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from posts import archive, events, search, sessions
+from posts.models import AnyPost, ArchivedPost, Post
+
+
+def post(text, days_ago=0):
+    message = Post.objects.create(text=text)
+    if days_ago:
+        Post.objects.filter(pk=message.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        message.refresh_from_db()
+    return message
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_archive_batch_moves_old_messages_under_the_same_id(self):
+        old = [post(f'old {i}', days_ago=400 + i) for i in range(3)]
+        recent = post('recent', days_ago=10)
+
+        self.assertEqual(archive.archive_batch(archive.cutoff(), batch_size=2), 2)
+        self.assertEqual(archive.archive_batch(archive.cutoff(), batch_size=2), 1)
+        self.assertEqual(archive.archive_batch(archive.cutoff(), batch_size=2), 0)
+
+        self.assertEqual(list(Post.objects.values_list('pk', flat=True)), [recent.pk])
+        self.assertEqual(
+            sorted(ArchivedPost.objects.values_list('pk', 'text')),
+            sorted((message.pk, message.text) for message in old),
+        )
+        self.assertEqual(AnyPost.objects.count(), 4)
+        self.assertEqual(AnyPost.objects.filter(archived=True).count(), 3)
+
+    def test_archived_count_is_cleared_by_archive_batch(self):
+        post('old', days_ago=400)
+        self.assertEqual(archive.archived_count(), 0)
+        archive.archive_batch(archive.cutoff())
+        self.assertEqual(archive.archived_count(), 1)
+
+    def test_archived_count_expires(self):
+        with mock.patch.object(archive.cache, 'set', wraps=archive.cache.set) as cache_set:
+            archive.archived_count()
+        cache_set.assert_called_once_with(archive.COUNT_KEY, 0, archive.COUNT_TIMEOUT)
+        self.assertIsNotNone(archive.COUNT_TIMEOUT)
+
+
+class CoalescingSessionTests(TestCase):
+    store_class = sessions.CoalescingSessionStore
+    read_queries = 1
+
+    def setUp(self):
+        cache.clear()
+        self.store = self.store_class()
+        self.store['cart'] = [1]
+        self.store.save()
+
+    def reopen(self):
+        return self.store_class(self.store.session_key)
+
+    def writes(self, store):
+        with CaptureQueriesContext(connection) as queries:
+            store.save()
+        return [query['sql'] for query in queries if not query['sql'].startswith('SELECT')]
+
+    def test_unchanged_session_is_not_written_again(self):
+        store = self.reopen()
+        self.assertEqual(store['cart'], [1])
+        self.assertEqual(self.writes(store), [])
+
+    def test_changed_session_is_written(self):
+        store = self.reopen()
+        store['cart'] = [1, 2]
+        self.assertTrue(self.writes(store))
+        cache.clear()
+        self.assertEqual(self.reopen()['cart'], [1, 2])
+
+    def test_moved_expiry_is_written(self):
+        store = self.reopen()
+        store['cart']
+        store._stored_expiry -= timedelta(seconds=sessions.REFRESH_THRESHOLD)
+        self.assertTrue(self.writes(store))
+
+    def test_deleted_session_is_gone_from_the_cache(self):
+        self.reopen().delete()
+        self.assertEqual(self.reopen().load(), {})
+
+    def test_reading_a_session(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.reopen()['cart'], [1])
+        self.assertEqual(len(queries), self.read_queries)
+
+    def test_cache_is_only_used_when_shared(self):
+        self.assertIs(sessions.SessionStore, sessions.CoalescingSessionStore)
+
+    def test_purge_expired_in_batches(self):
+        model = sessions.SessionStore.get_model_class()
+        for i in range(5):
+            store = sessions.SessionStore()
+            store['n'] = i
+            store.save()
+        model.objects.exclude(session_key=self.store.session_key).update(
+            expire_date=timezone.now() - timedelta(days=1),
+        )
+        self.assertEqual(sessions.purge_expired(batch_size=2), 2)
+        self.assertEqual(sessions.purge_expired(batch_size=2, max_batches=None), 3)
+        self.assertEqual(model.objects.count(), 1)
+
+
+class CachedCoalescingSessionTests(CoalescingSessionTests):
+    """
+    The same tests with sessions read through the cache
+    """
+    store_class = sessions.CachedCoalescingSessionStore
+    read_queries = 0
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.hello = post('Hello world, said the <b>robot</b>')
+        self.help = post('Help is on the way')
+        post('Nothing to see here')
+        self.old = post('An old hello from last year', days_ago=400)
+        archive.archive_batch(archive.cutoff())
+
+    def test_prefix_search_covers_hot_and_archived_messages(self):
+        results, total = search.search('hel')
+        self.assertEqual(total, 3)
+        self.assertEqual({(r['id'], r['archived']) for r in results},
+                         {(self.hello.pk, False), (self.help.pk, False), (self.old.pk, True)})
+
+    def test_every_word_must_match(self):
+        results, total = search.search('hello wor')
+        self.assertEqual(([r['id'] for r in results], total), ([self.hello.pk], 1))
+
+    def test_snippets_are_escaped_and_highlighted(self):
+        (result,), _ = search.search('robot')
+        self.assertIn('<mark>robot</mark>', result['snippet'])
+        self.assertIn('&lt;b&gt;', result['snippet'])
+
+    def test_archive_can_be_left_out(self):
+        _, total = search.search('hello', archive=False)
+        self.assertEqual(total, 1)
+
+    def test_matching_ids_filters_a_queryset(self):
+        ids = search.matching_ids('help')
+        self.assertEqual(list(Post.objects.filter(id__in=ids)), [self.help])
+        self.assertIsNone(search.matching_ids('!!'))
+
+    def test_search_page(self):
+        response = self.client.get('/search/', {'q': 'hello'})
+        self.assertContains(response, '<mark>')
+
+
+class EventStreamTests(TestCase):
+    def test_wsgi_request_is_told_not_to_reconnect(self):
+        response = self.client.get(reverse('posts:events'))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(response.streaming)
+
+    def test_cursor_round_trip(self):
+        message = post('hello')
+        key = events.cursor(message.created_at, message.pk)
+        self.assertEqual(events.parse_cursor(events.format_cursor(key)), key)
+        self.assertEqual(events.latest_cursor(), events.format_cursor(key))
+
+    def test_stream_replays_missed_posts_then_new_ones(self):
+        seen = post('seen')
+        missed = post('missed')
+
+        @async_to_sync
+        async def read():
+            stream = events.stream(events.cursor(seen.created_at, seen.pk))
+            try:
+                messages = [await stream.__anext__(), await stream.__anext__()]
+                new = await sync_to_async(post)('new')
+                # Already replayed, so skipped when it comes in again
+                events.get_broadcaster().publish(events.post_event(missed))
+                events.get_broadcaster().publish(events.post_event(new))
+                messages.append(await stream.__anext__())
+                return new, messages
+            finally:
+                await stream.aclose()
 
-# Create your tests here.
+        new, (retry, replayed, live) = read()
+        self.assertTrue(retry.startswith('retry: '))
+        self.assertIn(f'"id": {missed.pk}', replayed)
+        self.assertIn(f'"id": {new.pk}', live)
+        self.assertEqual(events.get_broadcaster().subscribers, set())
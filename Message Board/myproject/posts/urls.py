@@ -1,8 +1,11 @@
 from django.urls import path
-from .views import HomePageView
+from .views import HomePageView, older_posts, post_stream, search_posts
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', HomePageView.as_view(), name='home'),
-]
\ No newline at end of file
+    path('older/', older_posts, name='older'),
+    path('search/', search_posts, name='search'),
+    path('events/', post_stream, name='events'),
+]
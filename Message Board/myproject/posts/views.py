@@ -1,8 +1,103 @@
+from datetime import timedelta
+
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Q
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.views.generic import ListView
-from .models import Post
+from django.utils.html import escape
+from django.utils.text import Truncator
+from . import archive, events, search
+from .models import AnyPost, ArchivedPost, Post
+
+OLDER_PAGE_SIZE = 50
+SEARCH_PAGE_SIZE = 20
 
 class HomePageView(ListView):
     model = Post
     template_name = 'posts/home.html'
     context_object_name = 'posts'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['stream_cursor'] = events.latest_cursor()
+        context['has_archive'] = archive.archived_count() > 0
+        return context
+
+
+def older_posts(request):
+    """
+    Archived messages, newest first, OLDER_PAGE_SIZE at a time. Pages are
+    addressed by the (created_at, id) cursor of the last message shown, so
+    every page is an index range scan, however deep.
+    """
+    posts = ArchivedPost.objects.order_by('-created_at', '-id')
+    try:
+        before = events.parse_cursor(request.GET.get('before', ''))
+    except ValueError:
+        before = None
+    if before is not None:
+        created_at = events.EPOCH + timedelta(microseconds=before[0])
+        posts = posts.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=before[1]))
+    page = list(posts[:OLDER_PAGE_SIZE + 1])
+    next_cursor = None
+    if len(page) > OLDER_PAGE_SIZE:
+        page = page[:OLDER_PAGE_SIZE]
+        next_cursor = events.format_cursor(events.cursor(page[-1].created_at, page[-1].pk))
+    return render(request, 'posts/older.html', {
+        'posts': page,
+        'before': before,
+        'next_cursor': next_cursor,
+        'archive_after_days': archive.ARCHIVE_AFTER_DAYS,
+    })
+
+
+def search_posts(request):
+    """
+    Ranked full-text search over every message, hot and archived
+    """
+    query = request.GET.get('q', '').strip()
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    offset = (page - 1) * SEARCH_PAGE_SIZE
+    
+    found = search.search(query, limit=SEARCH_PAGE_SIZE, offset=offset) if query else ([], 0)
+    if found is None:
+        # No full-text index on this database
+        matches = AnyPost.objects.filter(text__icontains=query).order_by('-created_at')
+        found = [
+            {'id': post.pk, 'created_at': post.created_at, 'archived': post.archived,
+             'snippet': escape(Truncator(post.text).words(32))}
+            for post in matches[offset:offset + SEARCH_PAGE_SIZE]
+        ], matches.count()
+    results, total = found
+    
+    return render(request, 'posts/search.html', {
+        'query': query,
+        'results': results,
+        'total': total,
+        'page': page,
+        # Only the newest matches are ranked (search.RANK_WINDOW), so stop at a short page
+        'has_next': len(results) == SEARCH_PAGE_SIZE and offset + len(results) < total,
+    })
+
+
+async def post_stream(request):
+    """
+    Server-sent events with each new message, resuming after Last-Event-ID
+    (or ?after=, the cursor the page was rendered at)
+    """
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would be tied up for as long as the stream is open;
+        # 204 tells EventSource not to reconnect
+        return HttpResponse(status=204)
+    try:
+        after = events.parse_cursor(request.headers.get('Last-Event-ID') or request.GET.get('after', ''))
+    except ValueError:
+        after = None
+    response = StreamingHttpResponse(events.stream(after), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: pass events through as they come
+    return response
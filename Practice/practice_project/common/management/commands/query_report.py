@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from common import querylog
+
+
+class Command(BaseCommand):
+    help = 'Report the slowest SQL statements recorded by the slow query log, with flagged plans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20, help='Number of statements to show')
+        parser.add_argument('--sort', choices=['total', 'p95', 'max', 'count'], default='total')
+        parser.add_argument('--flagged', action='store_true', help='Only statements with a flagged plan')
+        parser.add_argument('--dir', help='Read this directory instead of QUERYLOG_DIR')
+        parser.add_argument('--reset', action='store_true', help='Delete the recorded numbers afterwards')
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or querylog.LOG_DIR
+        if not directory:
+            raise CommandError('Set QUERYLOG_DIR (or pass --dir) to record and report slow queries.')
+
+        stats = querylog.load(directory)
+        for entry in stats.values():
+            entry['p50'] = querylog.percentile(entry['histogram'], 50)
+            entry['p95'] = querylog.percentile(entry['histogram'], 95)
+        entries = list(stats.items())
+        if options['flagged']:
+            entries = [(key, entry) for key, entry in entries if entry['flags']]
+        sort_key = {'total': 'total_ms', 'p95': 'p95', 'max': 'max_ms', 'count': 'count'}[options['sort']]
+        entries.sort(key=lambda item: item[1][sort_key], reverse=True)
+
+        self.stdout.write(f'{len(stats)} statement(s) recorded, {sum(e["flags"] != [] for e in stats.values())} flagged')
+        for key, entry in entries[:options['limit']]:
+            p95 = f'<={entry["p95"]:g}' if entry['p95'] != float('inf') else f'>{querylog.BUCKETS[-2]}'
+            self.stdout.write('')
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{key}  {entry["count"]} call(s), {entry["total_ms"]:.1f} ms total, '
+                f'{entry["total_ms"] / entry["count"]:.2f} ms avg, p95 {p95} ms, max {entry["max_ms"]:.1f} ms'
+            ))
+            self.stdout.write(f'  {entry["sql"][:500]}')
+            for origin in entry['origins']:
+                self.stdout.write(f'  from {origin}')
+            for flag in entry['flags']:
+                self.stdout.write(self.style.WARNING(f'  ! {flag}'))
+            if entry['plan'] and options['verbosity'] > 1:
+                for line in entry['plan']:
+                    self.stdout.write(f'    {line}')
+
+        if options['reset']:
+            querylog.reset(directory)
+            self.stdout.write(self.style.SUCCESS('Recorded numbers deleted.'))
@@ -0,0 +1,36 @@
+from django.contrib import admin
+from .models import Author, Book, Publisher, Review, Tag
+
+
+@admin.register(Publisher)
+class PublisherAdmin(admin.ModelAdmin):
+    list_display = ['name', 'country']
+    search_fields = ['name']
+
+
+@admin.register(Author)
+class AuthorAdmin(admin.ModelAdmin):
+    list_display = ['name', 'email', 'publisher']
+    list_select_related = ['publisher']
+    search_fields = ['name', 'email']
+
+
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    search_fields = ['name']
+
+
+@admin.register(Book)
+class BookAdmin(admin.ModelAdmin):
+    list_display = ['title', 'author', 'published', 'price', 'review_count']
+    list_select_related = ['author']
+    search_fields = ['title']
+    raw_id_fields = ['author']
+    filter_horizontal = ['tags']
+
+
+@admin.register(Review)
+class ReviewAdmin(admin.ModelAdmin):
+    list_display = ['book', 'rating', 'created_at']
+    list_select_related = ['book']
+    raw_id_fields = ['book']
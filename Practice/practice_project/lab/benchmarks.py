@@ -0,0 +1,303 @@
+"""
+Side-by-side ORM micro-benchmarks over the lab tables.
+
+Each benchmark is a set of variants that produce the same result in
+different ways (select_related vs prefetch_related, ...). run() times
+every variant ``repeat`` times with DEBUG off (DEBUG keeps every query in
+memory), then once more counting its queries and tracing its peak Python
+memory, so the timings are not skewed by either. Variants that write run
+in a transaction that is rolled back.
+"""
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Prefetch
+from django.test.utils import override_settings
+from .models import Author, Book, Publisher, Review, Tag
+
+RESULTS_DIR = Path(getattr(settings, 'LAB_RESULTS_DIR', settings.BASE_DIR / 'lab_results'))
+
+# Rows each benchmark works on; small enough that the slow variants finish
+SAMPLE = 500
+
+BENCHMARKS = []
+
+
+class Rollback(Exception):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def benchmark(group, description):
+    """
+    Register a function returning {variant label: callable} as a benchmark
+    """
+    def register(function):
+        BENCHMARKS.append({
+            'name': function.__name__,
+            'group': group,
+            'description': description,
+            'variants': function,
+        })
+        return function
+    return register
+
+
+def rolled_back(function):
+    """
+    Run ``function`` in a transaction that is always rolled back
+    """
+    def run():
+        try:
+            with transaction.atomic():
+                function()
+                raise Rollback
+        except Rollback:
+            pass
+    return run
+
+
+@benchmark('Relations', f'Read {SAMPLE} reviews with book, author and publisher (a three level foreign key chain)')
+def fk_chain():
+    reviews = Review.objects.order_by('pk')
+
+    def touch(queryset):
+        return [review.book.author.publisher.name for review in queryset[:SAMPLE]]
+
+    return {
+        'lazy (N+1)': lambda: touch(reviews),
+        'select_related': lambda: touch(reviews.select_related('book__author__publisher')),
+        'prefetch_related': lambda: touch(reviews.prefetch_related('book__author__publisher')),
+    }
+
+
+@benchmark('Relations', f'Read {SAMPLE} books with their tags (many-to-many)')
+def m2m_tags():
+    books = Book.objects.order_by('pk').defer('content')
+
+    def touch(queryset):
+        return [[tag.name for tag in book.tags.all()] for book in queryset[:SAMPLE]]
+
+    return {
+        'lazy (N+1)': lambda: touch(books),
+        'prefetch_related': lambda: touch(books.prefetch_related('tags')),
+        'prefetch_related, only(name)': lambda: touch(
+            books.prefetch_related(Prefetch('tags', queryset=Tag.objects.only('name')))
+        ),
+    }
+
+
+@benchmark('Relations', 'Read every publisher with its authors (reverse foreign key)')
+def reverse_fk():
+    def touch(queryset):
+        return [[author.name for author in publisher.authors.all()] for publisher in queryset]
+
+    return {
+        'lazy (N+1)': lambda: touch(Publisher.objects.all()),
+        'prefetch_related': lambda: touch(Publisher.objects.prefetch_related('authors')),
+    }
+
+
+@benchmark('Loading', 'Walk every book once (large content column included)')
+def iterate_books():
+    def walk(rows):
+        total = 0
+        for book in rows:
+            total += len(book.content)
+        return total
+
+    return {
+        'list(queryset)': lambda: walk(list(Book.objects.all())),
+        'iterator(chunk_size=2000)': lambda: walk(Book.objects.iterator(chunk_size=2000)),
+        'iterator(chunk_size=100)': lambda: walk(Book.objects.iterator(chunk_size=100)),
+    }
+
+
+@benchmark('Loading', f'Load {SAMPLE * 4} books for a title listing')
+def only_defer():
+    books = Book.objects.order_by('pk')
+    size = SAMPLE * 4
+
+    def titles(queryset):
+        return [book.title for book in queryset[:size]]
+
+    return {
+        'all columns': lambda: titles(books),
+        'defer(content)': lambda: titles(books.defer('content')),
+        'only(title)': lambda: titles(books.only('title')),
+        'values_list(title)': lambda: list(books.values_list('title', flat=True)[:size]),
+    }
+
+
+@benchmark('Loading', f'Touch a deferred field on {SAMPLE // 5} books (the cost of deferring the wrong column)')
+def deferred_access():
+    books = Book.objects.order_by('pk')
+    size = SAMPLE // 5
+
+    return {
+        'all columns': lambda: [len(book.content) for book in books[:size]],
+        'defer(content), then read it': lambda: [len(book.content) for book in books.defer('content')[:size]],
+    }
+
+
+@benchmark('Writing', f'Insert {SAMPLE * 4} reviews (rolled back)')
+def bulk_create_batches():
+    size = SAMPLE * 4
+
+    def reviews():
+        book = Book.objects.order_by('pk').first()
+        created_at = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        return [Review(book=book, rating=3, body='x' * 200, created_at=created_at) for _ in range(size)]
+
+    def save_each():
+        for review in reviews():
+            review.save()
+
+    variants = {'save() each': rolled_back(save_each)}
+    for batch_size in (10, 100, 500, None):
+        label = f'bulk_create(batch_size={batch_size})'
+        variants[label] = rolled_back(
+            lambda batch_size=batch_size: Review.objects.bulk_create(reviews(), batch_size=batch_size)
+        )
+    return variants
+
+
+@benchmark('Aggregates', 'The 20 most reviewed books')
+def top_reviewed():
+    books = Book.objects.defer('content')
+    return {
+        'annotate(Count(reviews))': lambda: list(
+            books.annotate(reviews_total=Count('reviews')).order_by('-reviews_total', 'pk')[:20]
+        ),
+        'review_count (indexed counter)': lambda: list(books.order_by('-review_count', 'pk')[:20]),
+    }
+
+
+@benchmark('Aggregates', f'A page of {SAMPLE // 5} books with their number of reviews')
+def page_with_counts():
+    books = Book.objects.defer('content').order_by('pk')
+    size = SAMPLE // 5
+    return {
+        'reviews.count() per book (N+1)': lambda: [(book.title, book.reviews.count()) for book in books[:size]],
+        'annotate(Count(reviews))': lambda: [
+            (book.title, book.reviews_total) for book in books.annotate(reviews_total=Count('reviews'))[:size]
+        ],
+        'review_count (counter)': lambda: [(book.title, book.review_count) for book in books[:size]],
+    }
+
+
+def database():
+    version = connection.Database.sqlite_version if connection.vendor == 'sqlite' else ''
+    return f'{connection.display_name} {version}'.strip()
+
+
+def dataset():
+    return {
+        str(model._meta.verbose_name_plural): model.objects.count()
+        for model in (Publisher, Author, Tag, Book, Review)
+    }
+
+
+def measure(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    counter = QueryCounter()
+    tracemalloc.start()
+    try:
+        with connection.execute_wrapper(counter):
+            function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'median_ms': statistics.median(timings),
+        'min_ms': min(timings),
+        'queries': counter.count,
+        'peak_kb': peak // 1024,
+    }
+
+
+def run(repeat=5, names=None, log=None):
+    """
+    Run the benchmarks (all, or those in ``names``) and return the results
+    """
+    results = []
+    with override_settings(DEBUG=False):
+        for spec in BENCHMARKS:
+            if names and spec['name'] not in names and spec['group'] not in names:
+                continue
+            variants = []
+            for label, function in spec['variants']().items():
+                function()  # warm up caches and connections
+                variants.append({'label': label, **measure(function, repeat)})
+                if log:
+                    log(f"{spec['name']}: {label} {variants[-1]['median_ms']:.1f} ms")
+            fastest = min(variant['median_ms'] for variant in variants) or 1e-9
+            for variant in variants:
+                variant['relative'] = variant['median_ms'] / fastest
+            results.append({key: spec[key] for key in ('name', 'group', 'description')} | {'variants': variants})
+
+    return {
+        'generated_at': datetime.now(dt_timezone.utc).isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': database(),
+            'machine': f'{platform.system()} {platform.machine()}',
+            'processor': platform.processor() or platform.machine(),
+        },
+        'dataset': dataset(),
+        'repeat': repeat,
+        'benchmarks': results,
+    }
+
+
+def save(results, directory=RESULTS_DIR):
+    """
+    Write ``results`` to a timestamped file and to latest.json
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    text = json.dumps(results, indent=2)
+    path = directory / f"lab-{results['generated_at'].replace(':', '').replace('+0000', 'Z')}.json"
+    path.write_text(text)
+    (directory / 'latest.json').write_text(text)
+    return path
+
+
+def load(path=None):
+    """
+    Results of the run in ``path`` (default: the latest), or None
+    """
+    path = Path(path) if path else RESULTS_DIR / 'latest.json'
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def history(directory=RESULTS_DIR):
+    """
+    The saved result files, newest first
+    """
+    return sorted(Path(directory).glob('lab-*.json'), reverse=True)
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from lab import benchmarks
+from lab.models import Book, Review
+
+
+class Command(BaseCommand):
+    help = 'Run the ORM micro-benchmarks and save the results as JSON (shown at /lab/)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Benchmarks or groups to run (default: all)')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per variant')
+        parser.add_argument('--output', help=f'Results directory (default: {benchmarks.RESULTS_DIR})')
+        parser.add_argument('--list', action='store_true', help='List the benchmarks and exit')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for spec in benchmarks.BENCHMARKS:
+                self.stdout.write(f"{spec['group']:<12} {spec['name']:<22} {spec['description']}")
+            return
+        if not Book.objects.exists() or not Review.objects.exists():
+            raise CommandError('The lab tables are empty; run python manage.py seed_lab first.')
+        known = {spec['name'] for spec in benchmarks.BENCHMARKS} | {spec['group'] for spec in benchmarks.BENCHMARKS}
+        unknown = set(options['names']) - known
+        if unknown:
+            raise CommandError(f"Unknown benchmarks: {', '.join(sorted(unknown))} (see --list)")
+
+        log = self.stdout.write if options['verbosity'] > 1 else None
+        results = benchmarks.run(options['repeat'], options['names'], log)
+        path = benchmarks.save(results, options['output'] or benchmarks.RESULTS_DIR)
+
+        for result in results['benchmarks']:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{result['name']}: {result['description']}"))
+            for variant in result['variants']:
+                self.stdout.write(
+                    f"  {variant['label']:<34} {variant['median_ms']:>9.1f} ms {variant['relative']:>6.1f}x "
+                    f"{variant['queries']:>6} queries {variant['peak_kb']:>8} KB"
+                )
+        self.stdout.write(self.style.SUCCESS(f'Results written to {path}'))
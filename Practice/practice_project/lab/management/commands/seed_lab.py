@@ -0,0 +1,102 @@
+import random
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from lab.models import Author, Book, Publisher, Review, Tag
+
+WORDS = (
+    'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore '
+    'et dolore magna aliqua enim ad minim veniam quis nostrud exercitation ullamco laboris nisi aliquip '
+    'ex ea commodo consequat duis aute irure in reprehenderit voluptate velit esse cillum fugiat nulla'
+).split()
+
+BATCH_SIZE = 1000
+REVIEWS_FROM = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class Command(BaseCommand):
+    help = 'Fill the lab tables with generated publishers, authors, tags, books and reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--publishers', type=int, default=20)
+        parser.add_argument('--authors', type=int, default=500)
+        parser.add_argument('--tags', type=int, default=100)
+        parser.add_argument('--books', type=int, default=20000)
+        parser.add_argument('--reviews', type=int, default=5, help='Average reviews per book')
+        parser.add_argument('--tags-per-book', type=int, default=3)
+        parser.add_argument('--content-size', type=int, default=4000, help='Characters of Book.content')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--keep', action='store_true', help='Add to the existing rows instead of replacing them')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        start = time.perf_counter()
+        if not options['keep']:
+            for model in (Review, Book.tags.through, Book, Tag, Author, Publisher):
+                model.objects.all().delete()
+
+        with transaction.atomic():
+            publishers = Publisher.objects.bulk_create([
+                Publisher(name=f'Publisher {i}', country=rng.choice(['PK', 'US', 'UK', 'DE', 'IN']))
+                for i in range(options['publishers'])
+            ])
+            authors = Author.objects.bulk_create([
+                Author(name=f'Author {i}', email=f'author{i}@example.com', publisher=rng.choice(publishers))
+                for i in range(options['authors'])
+            ], batch_size=BATCH_SIZE)
+            Tag.objects.bulk_create([Tag(name=f'tag-{i}') for i in range(options['tags'])], ignore_conflicts=True)
+            tags = list(Tag.objects.all())
+
+        # Fifty distinct texts are enough: the benchmarks care about the size
+        paragraphs = [self.text(rng, options['content_size']) for _ in range(50)]
+        epoch = date(2000, 1, 1)
+        books = reviews = 0
+        for offset in range(0, options['books'], BATCH_SIZE):
+            count = min(BATCH_SIZE, options['books'] - offset)
+            review_counts = [rng.randint(0, 2 * options['reviews']) for _ in range(count)]
+            with transaction.atomic():
+                batch = Book.objects.bulk_create([
+                    Book(
+                        title=f'Book {offset + i}',
+                        author=rng.choice(authors),
+                        published=epoch + timedelta(days=rng.randint(0, 9000)),
+                        price=Decimal(rng.randint(199, 9999)) / 100,
+                        content=rng.choice(paragraphs),
+                        review_count=review_counts[i],
+                    )
+                    for i in range(count)
+                ])
+                Book.tags.through.objects.bulk_create([
+                    Book.tags.through(book_id=book.pk, tag_id=tag.pk)
+                    for book in batch
+                    for tag in rng.sample(tags, min(options['tags_per_book'], len(tags)))
+                ])
+                created = Review.objects.bulk_create([
+                    Review(
+                        book=book,
+                        rating=rng.randint(1, 5),
+                        body=self.text(rng, 300),
+                        created_at=REVIEWS_FROM + timedelta(minutes=rng.randint(0, 2_000_000)),
+                    )
+                    for book, review_count in zip(batch, review_counts)
+                    for _ in range(review_count)
+                ], batch_size=BATCH_SIZE)
+            books += len(batch)
+            reviews += len(created)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(publishers)} publishers, {len(authors)} authors, {len(tags)} tags, {books} books, '
+            f'{reviews} reviews in {time.perf_counter() - start:.1f}s'
+        ))
+
+    def text(self, rng, size):
+        words = []
+        length = 0
+        while length < size:
+            word = rng.choice(WORDS)
+            words.append(word)
+            length += len(word) + 1
+        return ' '.join(words)[:size]
@@ -0,0 +1,56 @@
+"""
+Data shapes for the ORM benchmarks: a foreign key chain (Review -> Book ->
+Author -> Publisher), a many-to-many (Book.tags), a large text column
+(Book.content) and a denormalized counter (Book.review_count). Filled by
+the seed_lab command.
+"""
+from django.db import models
+
+
+class Publisher(models.Model):
+    name = models.CharField(max_length=100)
+    country = models.CharField(max_length=50)
+
+    def __str__(self):
+        return self.name
+
+
+class Author(models.Model):
+    name = models.CharField(max_length=100)
+    email = models.EmailField()
+    publisher = models.ForeignKey(Publisher, on_delete=models.CASCADE, related_name='authors')
+
+    def __str__(self):
+        return self.name
+
+
+class Tag(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+class Book(models.Model):
+    title = models.CharField(max_length=200)
+    author = models.ForeignKey(Author, on_delete=models.CASCADE, related_name='books')
+    tags = models.ManyToManyField(Tag, related_name='books')
+    published = models.DateField()
+    price = models.DecimalField(max_digits=8, decimal_places=2)
+    content = models.TextField()
+    # Kept equal to reviews.count() by the seed_lab command, which is the
+    # only writer of reviews
+    review_count = models.PositiveIntegerField(default=0, db_index=True)
+
+    def __str__(self):
+        return self.title
+
+
+class Review(models.Model):
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='reviews')
+    rating = models.PositiveSmallIntegerField()
+    body = models.TextField()
+    created_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.book} ({self.rating})'
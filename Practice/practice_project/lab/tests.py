@@ -0,0 +1,40 @@
+import io
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+from lab import benchmarks
+from lab.models import Book
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_lab', publishers=3, authors=10, tags=5, books=30, reviews=2, content_size=200,
+            stdout=io.StringIO(),
+        )
+
+    def test_variants_of_a_benchmark_agree(self):
+        for spec in benchmarks.BENCHMARKS:
+            results = {label: function() for label, function in spec['variants']().items()}
+            answers = [result for result in results.values() if result is not None]
+            for answer in answers[1:]:
+                self.assertEqual(answer, answers[0], spec['name'])
+
+    def test_writes_are_rolled_back(self):
+        books = Book.objects.count()
+        benchmarks.run(repeat=1, names=['bulk_create_batches'])
+        self.assertEqual(Book.objects.count(), books)
+
+    def test_results_are_saved_and_loaded(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        results = benchmarks.run(repeat=1, names=['fk_chain'])
+        path = benchmarks.save(results, directory)
+
+        self.assertEqual(benchmarks.load(path), results)
+        self.assertEqual(benchmarks.history(directory), [path])
+        (variants,) = [spec['variants'] for spec in results['benchmarks']]
+        self.assertEqual(min(variant['relative'] for variant in variants), 1)
@@ -0,0 +1,24 @@
+from django.shortcuts import render
+from . import benchmarks
+
+
+def report(request):
+    """
+    The results of a run_lab run: the latest, or the file named by ?run=
+    """
+    runs = [path.name for path in benchmarks.history()]
+    selected = request.GET.get('run')
+    results = benchmarks.load(benchmarks.RESULTS_DIR / selected if selected in runs else None)
+    groups = {}
+    for result in (results or {}).get('benchmarks', []):
+        slowest = max(variant['median_ms'] for variant in result['variants']) or 1
+        for variant in result['variants']:
+            variant['width'] = max(1, round(variant['median_ms'] / slowest * 100))
+        groups.setdefault(result['group'], []).append(result)
+    context = {
+        'results': results,
+        'groups': groups,
+        'runs': runs,
+        'selected': selected if selected in runs else None,
+    }
+    return render(request, 'lab/report.html', context)
@@ -11,6 +11,9 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import os
+
+from common import profiles
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -37,6 +40,8 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'lab',  # ORM performance lab
+    'common',  # instrumentation (common/)
 ]
 
 MIDDLEWARE = [
@@ -53,7 +58,7 @@ ROOT_URLCONF = 'practice_project.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'common.metrics.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -79,6 +84,10 @@ DATABASES = {
     }
 }
 
+if os.environ.get('SQLITE_PRODUCTION', 'False') == 'True':
+    # WAL, busy timeout and BEGIN IMMEDIATE, see common/profiles.py
+    DATABASES['default']['OPTIONS'] = dict(profiles.SQLITE_PRODUCTION_OPTIONS)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -120,3 +129,29 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Prometheus metrics at /metrics. Each worker writes its numbers to
+# METRICS_DIR so a scrape adds up all processes; without it a scrape only
+# sees the worker that answers it
+MIDDLEWARE.insert(0, 'common.metrics.MetricsMiddleware')
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = 15
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# ORM performance lab (python manage.py seed_lab, then run_lab): each run
+# is written to LAB_RESULTS_DIR as JSON and shown at /lab/
+LAB_RESULTS_DIR = os.environ.get('LAB_RESULTS_DIR', BASE_DIR / 'lab_results')
+
+# Production profile (opt in with DJANGO_PRODUCTION=True), see
+# common.profiles.production_templates
+if os.environ.get('DJANGO_PRODUCTION', 'False') == 'True':
+    DEBUG = False
+    ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
+    TEMPLATES = profiles.production_templates(TEMPLATES)
+
+# Render time per {% include %}, {% block %} and filter in /metrics
+# (common/template_timing.py). Off by default: the timing wraps every
+# include, block and filter call; python manage.py profile_templates works
+# without it
+TEMPLATE_SECTION_TIMING = os.environ.get('TEMPLATE_SECTION_TIMING', 'False') == 'True'
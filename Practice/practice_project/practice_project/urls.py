@@ -15,10 +15,13 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
+from common import metrics
 from . import views
 
 urlpatterns = [
+    path('metrics', metrics.metrics_view, name='metrics'),
     path('', views.hello, name='hello'),
+    path('lab/', include('lab.urls')),
     path('admin/', admin.site.urls),
 ]
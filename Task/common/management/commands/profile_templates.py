@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from common import template_timing
+
+
+class Command(BaseCommand):
+    help = (
+        'Request pages and show which includes, blocks and filters their template render '
+        'time goes to'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=['/'], help='Pages to request (default: /)')
+        parser.add_argument('--repeat', type=int, default=20, help='Requests per page')
+        parser.add_argument('--host', default='localhost')
+        parser.add_argument('--top', type=int, default=15, help='Sections to list per template')
+
+    def handle(self, *args, **options):
+        template_timing.install()
+        client = Client(HTTP_HOST=options['host'])
+        for path in options['paths']:
+            client.get(path)  # compile the templates and warm the caches
+            with template_timing.collect() as profiles:
+                for _ in range(options['repeat']):
+                    response = client.get(path)
+            if not profiles:
+                raise CommandError(f'GET {path} ({response.status_code}) rendered no template')
+            self.report(path, profiles, options['top'])
+
+    def report(self, path, profiles, top):
+        by_template = {}
+        for profile in profiles:
+            by_template.setdefault(profile.template, []).append(profile)
+
+        for template, renders in by_template.items():
+            elapsed = sum(profile.elapsed for profile in renders)
+            sections = {}
+            for profile in renders:
+                for label, (calls, total, own) in profile.sections.items():
+                    section = sections.setdefault(label, [0, 0.0, 0.0])
+                    section[0] += calls
+                    section[1] += total
+                    section[2] += own
+            outside = elapsed - sum(own for _, _, own in sections.values())
+
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'GET {path}: {template}, {len(renders)} render(s), '
+                f'{elapsed / len(renders) * 1000:.2f} ms per render'
+            ))
+            self.stdout.write(f"  {'section':<60} {'calls':>7} {'own ms':>8} {'total ms':>9} {'share':>6}")
+            rows = sorted(sections.items(), key=lambda item: item[1][2], reverse=True)[:top]
+            rows.append(('(template text and tags outside sections)', [len(renders), outside, outside]))
+            for label, (calls, total, own) in rows:
+                self.stdout.write(
+                    f'  {label[:60]:<60} {calls / len(renders):>7.0f} {own / len(renders) * 1000:>8.2f} '
+                    f'{total / len(renders) * 1000:>9.2f} {own / elapsed:>6.0%}'
+                )
@@ -0,0 +1,317 @@
+"""
+Runtime metrics in the Prometheus text format, served at /metrics.
+
+MetricsMiddleware records request latency per URL name and the number and
+time of the SQL statements each request ran; TimedDjangoTemplates records
+how long each top-level template takes to render and, with
+TEMPLATE_SECTION_TIMING, how that time splits over its includes, blocks
+and filters (common/template_timing.py); cache_lookup() counts cache hits
+and misses. Apps add gauges with gauge() from their ready(); they are read
+from each process when it writes its numbers.
+
+Counters live in the memory of each worker process. With METRICS_DIR set,
+every process writes them to METRICS_DIR/<pid>.json every
+METRICS_FLUSH_INTERVAL seconds and at exit, and /metrics adds up the files
+of all processes, so a scrape sees the whole multi-process deployment
+whichever worker answers it. Files not written for METRICS_STALE_AFTER
+seconds (workers that are gone) are ignored.
+
+/metrics answers scrapers on METRICS_ALLOWED_IPS or sending METRICS_TOKEN as
+a bearer token. Behind a proxy (PROXY_COUNT > 0) every request comes from
+the proxy's address, so only the token is accepted.
+"""
+import atexit
+import contextvars
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.backends.django import DjangoTemplates, Template
+from django.utils.crypto import constant_time_compare
+from common import template_timing
+
+METRICS_DIR = getattr(settings, 'METRICS_DIR', '')
+FLUSH_INTERVAL = getattr(settings, 'METRICS_FLUSH_INTERVAL', 15)
+STALE_AFTER = getattr(settings, 'METRICS_STALE_AFTER', 300)
+ALLOWED_IPS = getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+TOKEN = getattr(settings, 'METRICS_TOKEN', '')
+PROXY_COUNT = getattr(settings, 'PROXY_COUNT', 0)
+
+# Upper bounds of the histogram buckets, in seconds
+BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf')]
+
+METRICS = {
+    'http_requests_total': ('counter', 'Requests by URL name, method and status.'),
+    'http_request_duration_seconds': ('histogram', 'Request latency by URL name.'),
+    'db_queries_total': ('counter', 'SQL statements run, by URL name.'),
+    'db_query_duration_seconds_total': ('counter', 'Time spent in SQL, by URL name.'),
+    'cache_requests_total': ('counter', 'Cache lookups by cache and result.'),
+    'template_render_duration_seconds': ('histogram', 'Render time of top-level templates.'),
+    'template_section_seconds_total': (
+        'counter', 'Own render time of template includes, blocks and filters, by page template.',
+    ),
+    'template_section_calls_total': ('counter', 'Renders of template includes, blocks and filters.'),
+}
+
+_gauges = {}
+_counters = {}
+_histograms = {}
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+# [queries, seconds] of the current request. A ContextVar rather than a
+# thread local, so queries a request runs on other threads with a copy of its
+# context (blog.async_views' query pool, sync_to_async) are counted too
+_request_queries = contextvars.ContextVar('request_queries', default=None)
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, seconds, **labels):
+    key = (name, _labels(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [0] * len(BUCKETS) + [0.0]
+        histogram[bisect_left(BUCKETS, seconds)] += 1
+        histogram[-1] += seconds
+
+
+def cache_lookup(cache_name, hit):
+    inc('cache_requests_total', cache=cache_name, result='hit' if hit else 'miss')
+
+
+def gauge(name, help_text, read):
+    """
+    Report read(), called with no arguments, as a per-process gauge
+    """
+    METRICS[name] = ('gauge', help_text)
+    _gauges[name] = read
+
+
+def gauges():
+    """
+    [(name, labels, value)] read from this process now
+    """
+    pid = str(os.getpid())
+    return [(name, {'pid': pid}, read()) for name, read in _gauges.items()]
+
+
+def snapshot():
+    with _lock:
+        counters = [[name, dict(labels), value] for (name, labels), value in _counters.items()]
+        histograms = [[name, dict(labels), list(values)] for (name, labels), values in _histograms.items()]
+    return {
+        'pid': os.getpid(),
+        'written_at': time.time(),
+        'counters': counters,
+        'histograms': histograms,
+        'gauges': [[name, labels, value] for name, labels, value in gauges()],
+    }
+
+
+def flush():
+    """
+    Write this process's numbers to METRICS_DIR/<pid>.json
+    """
+    global _last_flush
+    _last_flush = time.monotonic()
+    if not METRICS_DIR:
+        return
+    data = json.dumps(snapshot())
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=METRICS_DIR, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        f.write(data)
+    os.replace(tmp, os.path.join(METRICS_DIR, f'{os.getpid()}.json'))
+
+
+atexit.register(flush)
+
+
+def _snapshots():
+    """
+    The live numbers of this process plus the files of the other live ones
+    """
+    snapshots = [snapshot()]
+    if not METRICS_DIR or not os.path.isdir(METRICS_DIR):
+        return snapshots
+    own = f'{os.getpid()}.json'
+    now = time.time()
+    for name in os.listdir(METRICS_DIR):
+        if not name.endswith('.json') or name == own:
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, name)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if now - data['written_at'] <= STALE_AFTER:
+            snapshots.append(data)
+    return snapshots
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, **extra):
+    labels = {**labels, **extra}
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in sorted(labels.items())) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def exposition():
+    """
+    All processes' metrics, added up, in the Prometheus text format
+    """
+    counters, histograms, gauge_values = {}, {}, {}
+    for data in _snapshots():
+        for name, labels, value in data['counters']:
+            key = (name, _labels(labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, values in data['histograms']:
+            key = (name, _labels(labels))
+            total = histograms.setdefault(key, [0] * len(values))
+            histograms[key] = [a + b for a, b in zip(total, values)]
+        for name, labels, value in data.get('gauges', []):
+            gauge_values[(name, _labels(labels))] = value
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'histogram':
+            for (metric, labels), values in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS, values):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_labels(dict(labels), le=_format_value(float(bound)))} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(dict(labels))} {_format_value(float(values[-1]))}')
+                lines.append(f'{name}_count{_format_labels(dict(labels))} {cumulative}')
+        else:
+            values = counters if kind == 'counter' else gauge_values
+            for (metric, labels), value in sorted(values.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(dict(labels))} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    /metrics, for scrapers sending METRICS_TOKEN as a bearer token or, with
+    no proxy in front, on METRICS_ALLOWED_IPS
+    """
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    allowed = bool(TOKEN) and constant_time_compare(authorization, f'Bearer {TOKEN}')
+    if not allowed and not PROXY_COUNT:
+        # Behind a proxy REMOTE_ADDR is the proxy's, whoever the client is
+        allowed = request.META.get('REMOTE_ADDR') in ALLOWED_IPS
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def _count_query(execute, sql, params, many, context):
+    counts = _request_queries.get()
+    if counts is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            counts[0] += 1
+            counts[1] += elapsed
+
+
+def _install_on(sender, connection, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+class MetricsMiddleware:
+    """
+    Put it first so the time spent in every other middleware is included.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        connection_created.connect(_install_on, dispatch_uid='common.metrics')
+
+    def __call__(self, request):
+        counts = [0, 0.0]
+        token = _request_queries.set(counts)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+        duration = time.perf_counter() - start
+        queries, query_time = counts
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match and match.view_name else 'unresolved'
+        inc('http_requests_total', view=view, method=request.method, status=str(response.status_code))
+        observe('http_request_duration_seconds', duration, view=view)
+        if queries:
+            inc('db_queries_total', queries, view=view)
+            inc('db_query_duration_seconds_total', query_time, view=view)
+        if time.monotonic() - _last_flush >= FLUSH_INTERVAL:
+            flush()
+        return response
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        name = self.template.origin.template_name or '<string>'
+        profile = template_timing.start(name)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            observe('template_render_duration_seconds', time.perf_counter() - start, template=name)
+            if profile is not None:
+                template_timing.finish(profile)
+                for section, (calls, _, own) in profile.sections.items():
+                    inc('template_section_seconds_total', own, template=name, section=section)
+                    inc('template_section_calls_total', calls, template=name, section=section)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    DjangoTemplates whose templates record their render time
+    """
+    def __init__(self, params):
+        # Before the engine compiles any template
+        if template_timing.ENABLED:
+            template_timing.install()
+        super().__init__(params)
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
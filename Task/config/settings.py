@@ -11,6 +11,9 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 from pathlib import Path
+import os
+
+from common import profiles
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -38,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'students',  # Our student records app
+    'common',  # instrumentation (common/)
 ]
 
 MIDDLEWARE = [
@@ -54,7 +58,7 @@ ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'common.metrics.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -81,6 +85,10 @@ DATABASES = {
     }
 }
 
+if os.environ.get('SQLITE_PRODUCTION', 'False') == 'True':
+    # WAL, busy timeout and BEGIN IMMEDIATE, see common/profiles.py
+    DATABASES['default']['OPTIONS'] = dict(profiles.SQLITE_PRODUCTION_OPTIONS)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -122,3 +130,55 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Slow query log: times every statement per fingerprint and EXPLAINs the
+# ones slower than QUERYLOG_SLOW_MS in the background. Off unless
+# QUERYLOG_DIR is set (python manage.py query_report)
+QUERYLOG_DIR = os.environ.get('QUERYLOG_DIR', '')
+QUERYLOG_SLOW_MS = float(os.environ.get('QUERYLOG_SLOW_MS', 100))
+QUERYLOG_APPS = ['students']
+QUERYLOG_FLUSH_INTERVAL = 10
+QUERYLOG_EXPLAIN_ANALYZE = False  # PostgreSQL only; runs the slow SELECT again
+
+# Prometheus metrics at /metrics. Each worker writes its numbers to
+# METRICS_DIR so a scrape adds up all processes; without it a scrape only
+# sees the worker that answers it
+MIDDLEWARE.insert(0, 'common.metrics.MetricsMiddleware')
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = 15
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Cache of the enrolment report (students/reports.py). LocMemCache is per
+# process, so with several workers set REDIS_URL: a change made through one
+# worker then invalidates the report for all of them
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+STUDENTS_REPORT_TIMEOUT = None  # seconds; None keeps the report until a change
+
+# Bulk student changes (students/bulk.py): rows per transaction
+STUDENTS_BULK_BATCH_SIZE = 500
+
+# Production profile (opt in with DJANGO_PRODUCTION=True), see
+# common.profiles.production_templates
+if os.environ.get('DJANGO_PRODUCTION', 'False') == 'True':
+    DEBUG = False
+    ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
+    TEMPLATES = profiles.production_templates(TEMPLATES)
+
+# Render time per {% include %}, {% block %} and filter in /metrics
+# (common/template_timing.py). Off by default: the timing wraps every
+# include, block and filter call; python manage.py profile_templates works
+# without it
+TEMPLATE_SECTION_TIMING = os.environ.get('TEMPLATE_SECTION_TIMING', 'False') == 'True'
@@ -17,8 +17,10 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.views.generic import RedirectView
+from common import metrics
 
 urlpatterns = [
+    path('metrics', metrics.metrics_view, name='metrics'),
     path('admin/', admin.site.urls),
     path('students/', include('students.urls')),
     path('', RedirectView.as_view(url='/students/', permanent=True)),
@@ -1,10 +1,72 @@
 from django.contrib import admin
-from .models import Student
+from django.db.models import Count
+from django.template.response import TemplateResponse
+from .forms import MoveToCourseForm
+from .models import Course, Student
+from . import bulk
+
+
+@admin.register(Course)
+class CourseAdmin(admin.ModelAdmin):
+    list_display = ['name', 'student_count', 'created_at']
+    search_fields = ['name']
+    readonly_fields = ['created_at']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(student_count=Count('students'))
+
+    @admin.display(description='Students', ordering='student_count')
+    def student_count(self, obj):
+        return obj.student_count
 
 
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
     list_display = ['name', 'email', 'age', 'course', 'created_at']
     list_filter = ['course', 'age']
-    search_fields = ['name', 'email', 'course']
+    list_select_related = ['course']
+    search_fields = ['name', 'email', 'course__name']
+    autocomplete_fields = ['course']
     readonly_fields = ['created_at', 'updated_at']
+    actions = ['move_to_course', 'delete_in_batches']
+
+    def confirm_bulk_action(self, request, queryset, action, title, form=None):
+        """
+        Intermediate page of the bulk actions: the preview of the change
+        (a dry run) and, for moves, the course to move to
+        """
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': title,
+            'action': action,
+            'form': form,
+            'summary': bulk.summarize(queryset),
+            'batch_size': bulk.default_batch_size(),
+            'selected': request.POST.getlist(admin.helpers.ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across', '0'),
+        }
+        return TemplateResponse(request, 'admin/students/student/bulk_action.html', context)
+
+    @admin.action(description='Move selected students to a course', permissions=['change'])
+    def move_to_course(self, request, queryset):
+        form = MoveToCourseForm(request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            summary = bulk.move_to_course(queryset, form.cleaned_data['course'])
+            self.message_user(
+                request,
+                f"Moved {summary['affected']} of {summary['matched']} students to "
+                f"{summary['course']} in {summary['batches']} batch(es).",
+            )
+            return None
+        return self.confirm_bulk_action(request, queryset, 'move_to_course', 'Move students to a course', form)
+
+    @admin.action(description='Delete selected students in batches', permissions=['delete'])
+    def delete_in_batches(self, request, queryset):
+        if 'apply' in request.POST:
+            summary = bulk.delete(queryset)
+            self.message_user(
+                request, f"Deleted {summary['affected']} students in {summary['batches']} batch(es).",
+            )
+            return None
+        return self.confirm_bulk_action(request, queryset, 'delete_in_batches', 'Delete students in batches')
@@ -0,0 +1,176 @@
+"""
+Bulk changes to students.
+
+Every operation takes a queryset of the students to change (select()) and
+works through it in primary key batches of STUDENTS_BULK_BATCH_SIZE, one
+transaction per batch: a change to thousands of students is a few statements per batch
+rather than a request per student, and no transaction holds the write
+lock for long. With dry_run=True nothing is written and the summary tells
+what would change, batches included.
+
+QuerySet.update() and bulk_update() send no signals, so the enrolment
+report is invalidated here once the change is done.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from .models import Student
+from . import reports
+
+PREVIEW_SIZE = 20
+
+
+def default_batch_size():
+    """
+    STUDENTS_BULK_BATCH_SIZE, read when an operation runs
+    """
+    return getattr(settings, 'STUDENTS_BULK_BATCH_SIZE', 500)
+
+
+def select(ids=None, course=None, min_age=None, max_age=None):
+    """
+    The students matching every criterion given
+    """
+    queryset = Student.objects.all()
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+    if course is not None:
+        queryset = queryset.filter(course=course)
+    if min_age is not None:
+        queryset = queryset.filter(age__gte=min_age)
+    if max_age is not None:
+        queryset = queryset.filter(age__lte=max_age)
+    return queryset
+
+
+def batches(queryset, size=None):
+    """
+    The primary keys of ``queryset`` in ascending batches, each read when
+    the previous one has been handled, so rows changed by a batch are
+    never read again
+    """
+    size = size or default_batch_size()
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    last = 0
+    while True:
+        batch = list(pks.filter(pk__gt=last)[:size])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
+
+
+def summarize(queryset):
+    """
+    How many students ``queryset`` matches, per course, and the first
+    PREVIEW_SIZE of them
+    """
+    by_course = list(
+        queryset.order_by('course__name').values_list('course__name').annotate(count=Count('pk'))
+    )
+    sample = list(
+        queryset.select_related('course').order_by('name', 'pk')
+        .values('pk', 'name', 'email', 'age', 'course__name')[:PREVIEW_SIZE]
+    )
+    return {
+        'matched': sum(count for _, count in by_course),
+        'by_course': [{'course': name, 'students': count} for name, count in by_course],
+        'sample': [
+            {'id': row['pk'], 'name': row['name'], 'email': row['email'], 'age': row['age'],
+             'course': row['course__name']}
+            for row in sample
+        ],
+    }
+
+
+def _batch_count(rows, size):
+    return -(-rows // (size or default_batch_size()))
+
+
+def _done():
+    transaction.on_commit(reports.invalidate)
+
+
+def move_to_course(queryset, course, dry_run=False, batch_size=None):
+    """
+    Put the students of ``queryset`` on ``course`` with one UPDATE per batch
+    """
+    summary = {'action': 'move', 'course': course.name, 'dry_run': dry_run, **summarize(queryset)}
+    if not dry_run:
+        summary['affected'] = 0
+    elif course.pk is None:
+        # A course that a real run would add: every student moves
+        summary['affected'] = summary['matched']
+    else:
+        summary['affected'] = queryset.exclude(course=course).count()
+    summary['batches'] = 0
+    if dry_run:
+        summary['batches'] = _batch_count(summary['matched'], batch_size)
+        return summary
+    for pks in batches(queryset, batch_size):
+        with transaction.atomic():
+            summary['affected'] += Student.objects.filter(pk__in=pks).exclude(course=course).update(
+                course=course, updated_at=timezone.now(),
+            )
+        summary['batches'] += 1
+    _done()
+    return summary
+
+
+def delete(queryset, dry_run=False, batch_size=None):
+    """
+    Delete the students of ``queryset`` one batch per transaction (these
+    deletes send post_delete, which invalidates the report)
+    """
+    summary = {'action': 'delete', 'dry_run': dry_run, **summarize(queryset)}
+    summary['affected'] = summary['matched'] if dry_run else 0
+    summary['batches'] = 0
+    if dry_run:
+        summary['batches'] = _batch_count(summary['matched'], batch_size)
+        return summary
+    for pks in batches(queryset, batch_size):
+        with transaction.atomic():
+            deleted, _ = Student.objects.filter(pk__in=pks).delete()
+        summary['affected'] += deleted
+        summary['batches'] += 1
+    return summary
+
+
+def apply_changes(changes, dry_run=False, batch_size=None):
+    """
+    Give each student its own new values: ``changes`` maps a student id to
+    a dict of field values (age, course). Written with bulk_update, one
+    UPDATE statement per batch; a dry run reads the same batches without
+    locking them.
+    """
+    summary = {'action': 'update', 'dry_run': dry_run, **summarize(select(ids=list(changes)))}
+    summary.update(affected=0, batches=0, missing=[])
+    found = set()
+    for pks in batches(select(ids=list(changes)), batch_size):
+        with transaction.atomic():
+            changed = []
+            fields = set()
+            students = Student.objects.select_related('course').filter(pk__in=pks)
+            if not dry_run:
+                students = students.select_for_update(of=('self',))
+            for student in students:
+                found.add(student.pk)
+                values = {
+                    field: value for field, value in changes[student.pk].items()
+                    if getattr(student, field) != value
+                }
+                if values:
+                    for field, value in values.items():
+                        setattr(student, field, value)
+                    student.updated_at = timezone.now()
+                    changed.append(student)
+                    fields.update(values)
+            if changed and not dry_run:
+                Student.objects.bulk_update(changed, [*sorted(fields), 'updated_at'])
+        summary['affected'] += len(changed)
+        summary['batches'] += 1
+    summary['missing'] = sorted(set(changes) - found)
+    if not dry_run:
+        _done()
+    return summary
@@ -1,14 +1,30 @@
 from django import forms
-from .models import Student
+from .models import Course, Student
 
 
 class StudentForm(forms.ModelForm):
     """
     ModelForm for Student model with custom styling.
+
+    The course is typed in and matched to an existing Course in any
+    spelling; a name that matches none adds a new course.
     """
+    course = forms.CharField(
+        max_length=50,
+        label='Course',
+        help_text="Enter course name",
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Enter course name',
+            'list': 'course-options',
+            'autocomplete': 'off',
+            'required': True
+        }),
+    )
+
     class Meta:
         model = Student
-        fields = ['name', 'email', 'age', 'course']
+        fields = ['name', 'email', 'age']
         widgets = {
             'name': forms.TextInput(attrs={
                 'class': 'form-control',
@@ -27,15 +43,106 @@ class StudentForm(forms.ModelForm):
                 'max': '150',
                 'required': True
             }),
-            'course': forms.TextInput(attrs={
-                'class': 'form-control',
-                'placeholder': 'Enter course name',
-                'required': True
-            }),
         }
         labels = {
             'name': 'Student Name',
             'email': 'Email Address',
             'age': 'Age',
-            'course': 'Course',
         }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.course_id:
+            self.initial.setdefault('course', self.instance.course.name)
+        self.course_options = Course.objects.values_list('name', flat=True)
+
+    def save(self, commit=True):
+        self.instance.course = Course.objects.for_name(self.cleaned_data['course'])
+        return super().save(commit)
+
+
+class BulkActionForm(forms.Form):
+    """
+    Selects students by id list and/or filters and what to do with them.
+    """
+    ACTION_CHOICES = [
+        ('move', 'Move to course'),
+        ('delete', 'Delete'),
+    ]
+
+    action = forms.ChoiceField(choices=ACTION_CHOICES, widget=forms.Select(attrs={'class': 'form-control'}))
+    ids = forms.CharField(
+        required=False,
+        label='Student IDs',
+        help_text='Comma or space separated',
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g. 4, 8, 15'}),
+    )
+    course = forms.ModelChoiceField(
+        queryset=Course.objects.all(),
+        to_field_name='key',
+        required=False,
+        label='Current Course',
+        empty_label='Any course',
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    min_age = forms.IntegerField(
+        required=False, min_value=1, max_value=150, label='Minimum Age',
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+    )
+    max_age = forms.IntegerField(
+        required=False, min_value=1, max_value=150, label='Maximum Age',
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+    )
+    target_course = forms.CharField(
+        required=False,
+        max_length=50,
+        label='New Course',
+        help_text='Required to move students; a new name adds a course',
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Enter course name',
+            'list': 'course-options',
+            'autocomplete': 'off',
+        }),
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.course_options = Course.objects.values_list('name', flat=True)
+
+    def clean_ids(self):
+        value = self.cleaned_data['ids'].replace(',', ' ').split()
+        if not value:
+            return None
+        try:
+            return sorted({int(pk) for pk in value})
+        except ValueError:
+            raise forms.ValidationError('Student IDs must be whole numbers.')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        criteria = [cleaned_data.get(name) for name in ('ids', 'course', 'min_age', 'max_age')]
+        if all(value is None for value in criteria) and not self.errors:
+            raise forms.ValidationError('Choose the students: give IDs or at least one filter.')
+        if cleaned_data.get('action') == 'move' and not cleaned_data.get('target_course'):
+            self.add_error('target_course', 'Enter the course to move the students to.')
+        return cleaned_data
+
+    def selection(self):
+        return {name: self.cleaned_data[name] for name in ('ids', 'course', 'min_age', 'max_age')}
+
+
+class StudentChangeForm(forms.Form):
+    """
+    One entry of a bulk update: a student id and its new values.
+    """
+    id = forms.IntegerField(min_value=1)
+    age = forms.IntegerField(required=False, min_value=1, max_value=150)
+    course = forms.CharField(required=False, max_length=50)
+
+
+class MoveToCourseForm(forms.Form):
+    """
+    Target course of the admin "move to course" action.
+    """
+    course = forms.ModelChoiceField(queryset=Course.objects.all(), label='New Course')
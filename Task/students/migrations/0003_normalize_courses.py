@@ -0,0 +1,76 @@
+"""
+Move the free-text Student.course values onto Course rows.
+
+Spellings that only differ in case or spacing ("python", "Python ",
+"PYTHON") become one course, named after its most common spelling.
+Students are linked in primary key batches of BATCH_SIZE, each in its own
+transaction, so a large table never holds the write lock for long; the
+migration is not atomic and picks up where it stopped if it is run again.
+"""
+from collections import Counter, defaultdict
+
+from django.db import migrations, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+
+
+def course_key(name):
+    # Frozen copy of students.models.course_key
+    return ' '.join(name.split()).casefold()
+
+
+def link_courses(apps, schema_editor):
+    Course = apps.get_model('students', 'Course')
+    Student = apps.get_model('students', 'Student')
+    db = schema_editor.connection.alias
+
+    spellings = defaultdict(Counter)
+    for value, count in (
+        Student.objects.using(db).filter(course_ref__isnull=True)
+        .values_list('course').annotate(count=Count('id')).order_by()
+    ):
+        spellings[course_key(value)][' '.join(value.split())] += count
+
+    courses = {course.key: course for course in Course.objects.using(db).all()}
+    for key, counts in spellings.items():
+        if key not in courses:
+            courses[key] = Course.objects.using(db).create(
+                name=counts.most_common(1)[0][0][:50], key=key, created_at=timezone.now(),
+            )
+
+    last = 0
+    while True:
+        with transaction.atomic(using=db):
+            batch = list(
+                Student.objects.using(db).filter(pk__gt=last, course_ref__isnull=True)
+                .order_by('pk').only('pk', 'course')[:BATCH_SIZE]
+            )
+            if not batch:
+                break
+            for student in batch:
+                student.course_ref = courses[course_key(student.course)]
+            Student.objects.using(db).bulk_update(batch, ['course_ref'])
+        last = batch[-1].pk
+
+
+def unlink_courses(apps, schema_editor):
+    Student = apps.get_model('students', 'Student')
+    db = schema_editor.connection.alias
+    for student in Student.objects.using(db).select_related('course_ref').exclude(course_ref=None).iterator():
+        student.course = student.course_ref.name
+        student.save(update_fields=['course'])
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('students', '0002_course'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_courses, unlink_courses),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0003_normalize_courses'),
+    ]
+
+    operations = [
+        # The default only lets the migration be reversed on a populated table
+        migrations.AlterField(
+            model_name='student',
+            name='course',
+            field=models.CharField(default='', help_text='Enter course name', max_length=50),
+        ),
+        migrations.RemoveField(
+            model_name='student',
+            name='course',
+        ),
+        migrations.RenameField(
+            model_name='student',
+            old_name='course_ref',
+            new_name='course',
+        ),
+        migrations.AlterField(
+            model_name='student',
+            name='course',
+            field=models.ForeignKey(
+                help_text='Enter course name', on_delete=django.db.models.deletion.PROTECT,
+                related_name='students', to='students.course',
+            ),
+        ),
+    ]
@@ -1,6 +1,47 @@
 from django.db import models
 
 
+def course_key(name):
+    """
+    Spelling-insensitive key of a course name: case and spacing are ignored
+    """
+    return ' '.join(name.split()).casefold()
+
+
+class CourseManager(models.Manager):
+    def for_name(self, name):
+        """
+        The course called ``name`` in any spelling, created if there is none
+        """
+        name = ' '.join(name.split())
+        course, _ = self.get_or_create(key=course_key(name), defaults={'name': name})
+        return course
+
+
+class Course(models.Model):
+    """
+    Course that students enrol in; Student.course points here.
+    """
+    name = models.CharField(max_length=50, help_text="Enter course name")
+    key = models.CharField(max_length=100, unique=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = CourseManager()
+
+    class Meta:
+        ordering = ['name']
+        verbose_name = 'Course'
+        verbose_name_plural = 'Courses'
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        self.name = ' '.join(self.name.split())
+        self.key = course_key(self.name)
+        super().save(*args, **kwargs)
+
+
 class Student(models.Model):
     """
     Student model for managing student records.
@@ -8,7 +49,9 @@ class Student(models.Model):
     name = models.CharField(max_length=100, help_text="Enter student's full name")
     email = models.EmailField(unique=True, help_text="Enter student's email address")
     age = models.IntegerField(help_text="Enter student's age")
-    course = models.CharField(max_length=50, help_text="Enter course name")
+    course = models.ForeignKey(
+        Course, on_delete=models.PROTECT, related_name='students', help_text="Enter course name"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -0,0 +1,80 @@
+"""
+Enrolment report: students per course and their age distribution.
+
+The whole report is one GROUP BY query over Course LEFT JOIN Student, with
+a conditional COUNT per age band, and is cached until a student or course
+changes (students/signals.py). Code that writes students without save() or
+delete() (QuerySet.update, bulk_create) must call invalidate() itself.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Max, Min, Q
+from .models import Course
+
+REPORT_KEY = 'students:enrolment-report'
+REPORT_TIMEOUT = getattr(settings, 'STUDENTS_REPORT_TIMEOUT', None)
+
+# (label, lowest age, highest age) of each column of the age distribution
+AGE_BANDS = [
+    ('Under 18', None, 17),
+    ('18-20', 18, 20),
+    ('21-24', 21, 24),
+    ('25-29', 25, 29),
+    ('30+', 30, None),
+]
+
+
+def _band_filter(low, high):
+    condition = Q()
+    if low is not None:
+        condition &= Q(students__age__gte=low)
+    if high is not None:
+        condition &= Q(students__age__lte=high)
+    return condition
+
+
+def build_report():
+    bands = {
+        f'band_{i}': Count('students', filter=_band_filter(low, high))
+        for i, (_, low, high) in enumerate(AGE_BANDS)
+    }
+    rows = Course.objects.annotate(
+        students_count=Count('students'),
+        average_age=Avg('students__age'),
+        youngest=Min('students__age'),
+        oldest=Max('students__age'),
+        **bands,
+    ).values('id', 'name', 'students_count', 'average_age', 'youngest', 'oldest', *bands).order_by('name')
+
+    courses = []
+    totals = [0] * len(AGE_BANDS)
+    for row in rows:
+        ages = [row[f'band_{i}'] for i in range(len(AGE_BANDS))]
+        totals = [total + count for total, count in zip(totals, ages)]
+        courses.append({
+            'id': row['id'],
+            'name': row['name'],
+            'students': row['students_count'],
+            'average_age': row['average_age'],
+            'youngest': row['youngest'],
+            'oldest': row['oldest'],
+            'ages': ages,
+        })
+    return {
+        'bands': [label for label, _, _ in AGE_BANDS],
+        'courses': courses,
+        'total_students': sum(course['students'] for course in courses),
+        'age_totals': totals,
+    }
+
+
+def enrolment_report():
+    report = cache.get(REPORT_KEY)
+    if report is None:
+        report = build_report()
+        cache.set(REPORT_KEY, report, REPORT_TIMEOUT)
+    return report
+
+
+def invalidate():
+    cache.delete(REPORT_KEY)
@@ -0,0 +1,17 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Course, Student
+from . import reports
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_report(sender, **kwargs):
+    """
+    Drop the cached enrolment report once the change is committed, so a
+    report built in between cannot cache the old numbers
+    """
+    transaction.on_commit(reports.invalidate)
@@ -0,0 +1,169 @@
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import QuerySet
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from students import bulk, reports
+from students.models import Course, Student
+
+
+def students(count, course, age=20):
+    return [
+        Student.objects.create(name=f'Student {i}', email=f's{i}@example.com', age=age, course=course)
+        for i in range(count)
+    ]
+
+
+class BulkTests(TestCase):
+    def setUp(self):
+        self.python = Course.objects.for_name('Python')
+        self.dsa = Course.objects.for_name('DSA')
+        self.students = students(5, self.python)
+
+    def test_move_in_batches(self):
+        summary = bulk.move_to_course(bulk.select(), self.dsa, batch_size=2)
+        self.assertEqual((summary['affected'], summary['batches']), (5, 3))
+        self.assertEqual(Student.objects.filter(course=self.dsa).count(), 5)
+
+    def test_dry_runs_count_batches_and_write_nothing(self):
+        move = bulk.move_to_course(bulk.select(), self.dsa, dry_run=True, batch_size=2)
+        delete = bulk.delete(bulk.select(), dry_run=True, batch_size=2)
+        self.assertEqual((move['affected'], move['batches']), (5, 3))
+        self.assertEqual((delete['affected'], delete['batches']), (5, 3))
+        self.assertEqual(Student.objects.filter(course=self.python).count(), 5)
+
+    def test_apply_changes_dry_run_matches_the_real_run(self):
+        changes = {student.pk: {'age': 30} for student in self.students[:3]}
+        changes[self.students[3].pk] = {'age': 20}  # unchanged
+        changes[999] = {'age': 40}
+
+        dry = bulk.apply_changes(changes, dry_run=True, batch_size=2)
+        self.assertEqual(Student.objects.filter(age=30).count(), 0)
+        real = bulk.apply_changes(changes, batch_size=2)
+
+        self.assertEqual((dry['affected'], dry['batches'], dry['missing']), (3, 2, [999]))
+        self.assertEqual({key: real[key] for key in ('affected', 'batches', 'missing')},
+                         {key: dry[key] for key in ('affected', 'batches', 'missing')})
+        self.assertEqual(Student.objects.filter(age=30).count(), 3)
+
+    def test_apply_changes_counts_every_batch(self):
+        unchanged = {student.pk: {'age': 20} for student in self.students[:4]}
+        summary = bulk.apply_changes(unchanged, batch_size=2)
+        self.assertEqual((summary['affected'], summary['batches']), (0, 2))
+
+    def test_dry_run_locks_nothing(self):
+        changes = {student.pk: {'age': 30} for student in self.students}
+        with mock.patch.object(QuerySet, 'select_for_update', autospec=True,
+                               side_effect=QuerySet.select_for_update) as lock:
+            bulk.apply_changes(changes, dry_run=True)
+            self.assertFalse(lock.called)
+            bulk.apply_changes(changes)
+            self.assertTrue(lock.called)
+
+    @override_settings(STUDENTS_BULK_BATCH_SIZE=2)
+    def test_batch_size_setting_is_read_when_called(self):
+        summary = bulk.move_to_course(bulk.select(), self.dsa)
+        self.assertEqual(summary['batches'], 3)
+
+    def test_delete_in_batches(self):
+        summary = bulk.delete(bulk.select(min_age=18), batch_size=2)
+        self.assertEqual((summary['affected'], summary['batches']), (5, 3))
+        self.assertFalse(Student.objects.exists())
+
+
+class BulkApiTests(TestCase):
+    def setUp(self):
+        self.student, = students(1, Course.objects.for_name('Python'))
+
+    def post(self, payload):
+        return self.client.post(reverse('student_bulk_api'), json.dumps(payload), content_type='application/json')
+
+    def test_invalid_update_adds_no_course(self):
+        response = self.post({'action': 'update', 'changes': [
+            {'id': self.student.pk, 'course': 'Rust'},
+            {'id': self.student.pk, 'age': 0},
+        ]})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Course.objects.filter(name='Rust').exists())
+
+    def test_dry_run_adds_no_course(self):
+        response = self.post({'action': 'update', 'dry_run': True, 'changes': [
+            {'id': self.student.pk, 'course': 'Rust'},
+        ]})
+        self.assertEqual(response.json()['affected'], 1)
+        self.assertFalse(Course.objects.filter(name='Rust').exists())
+
+    def test_update_moves_the_student(self):
+        response = self.post({'action': 'update', 'changes': [{'id': self.student.pk, 'course': 'rust '}]})
+        self.assertEqual(response.json()['affected'], 1)
+        self.student.refresh_from_db()
+        self.assertEqual(self.student.course.name, 'rust')
+
+
+class CourseMigrationTests(TransactionTestCase):
+    """
+    0003 links the free-text courses to Course rows, one per spelling
+    """
+    before = [('students', '0001_initial')]
+    after = [('students', '0004_student_course_fk')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def setUp(self):
+        apps = self.migrate(self.before)
+        self.addCleanup(self.migrate, MigrationExecutor(connection).loader.graph.leaf_nodes())
+        Student = apps.get_model('students', 'Student')
+        for i, course in enumerate(['python', 'Python ', 'Python', 'DSA']):
+            Student.objects.create(name=f'Student {i}', email=f's{i}@example.com', age=20, course=course)
+
+    def test_spellings_become_one_course(self):
+        apps = self.migrate(self.after)
+        Course = apps.get_model('students', 'Course')
+        Student = apps.get_model('students', 'Student')
+        self.assertEqual(sorted(Course.objects.values_list('name', 'key')), [('DSA', 'dsa'), ('Python', 'python')])
+        self.assertEqual(Student.objects.filter(course__key='python').count(), 3)
+
+    def test_migration_is_reversible(self):
+        self.migrate(self.after)
+        apps = self.migrate(self.before)
+        Student = apps.get_model('students', 'Student')
+        self.assertEqual(sorted(Student.objects.values_list('course', flat=True)), ['DSA', 'Python', 'Python', 'Python'])
+
+
+class EnrolmentReportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.python = Course.objects.for_name('Python')
+        self.dsa = Course.objects.for_name('DSA')
+        students(3, self.python, age=19)
+
+    def python_row(self):
+        return next(row for row in reports.enrolment_report()['courses'] if row['name'] == 'Python')
+
+    def test_report_is_one_query_then_cached(self):
+        with self.assertNumQueries(1):
+            report = reports.enrolment_report()
+        with self.assertNumQueries(0):
+            self.assertEqual(reports.enrolment_report(), report)
+        self.assertEqual(report['total_students'], 3)
+        self.assertEqual(report['age_totals'], [0, 3, 0, 0, 0])
+
+    def test_saving_a_student_invalidates_once_committed(self):
+        self.assertEqual(self.python_row()['students'], 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            Student.objects.create(name='New', email='new@example.com', age=30, course=self.python)
+            self.assertEqual(self.python_row()['students'], 3)
+        self.assertEqual(self.python_row()['students'], 4)
+
+    def test_bulk_changes_invalidate(self):
+        self.assertEqual(self.python_row()['students'], 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk.move_to_course(bulk.select(), self.dsa)
+        self.assertEqual(self.python_row()['students'], 0)
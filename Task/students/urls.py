@@ -6,4 +6,7 @@ urlpatterns = [
     path('add/', views.student_create, name='student_create'),
     path('<int:pk>/edit/', views.student_update, name='student_update'),
     path('<int:pk>/delete/', views.student_delete, name='student_delete'),
+    path('report/', views.course_report, name='course_report'),
+    path('bulk/', views.student_bulk, name='student_bulk'),
+    path('bulk/api/', views.student_bulk_api, name='student_bulk_api'),
 ]
@@ -1,14 +1,20 @@
+import json
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from .models import Student
-from .forms import StudentForm
+from django.http import JsonResponse
+from django.views.decorators.http import require_POST
+from .models import Course, Student, course_key
+from .forms import BulkActionForm, StudentChangeForm, StudentForm
+from .reports import enrolment_report
+from . import bulk
 
 
 def student_list(request):
     """
     View to display list of all students (READ operation).
     """
-    students = Student.objects.all()
+    students = Student.objects.select_related('course')
     context = {
         'students': students,
         'total_students': students.count()
@@ -81,3 +87,123 @@ def student_delete(request, pk):
         'student': student
     }
     return render(request, 'students/student_confirm_delete.html', context)
+
+
+def course_report(request):
+    """
+    View to display the enrolment report: students per course and their ages.
+    """
+    context = {
+        'report': enrolment_report()
+    }
+    return render(request, 'students/course_report.html', context)
+
+
+def _target_course(name, dry_run):
+    """
+    The course called ``name``; on a dry run a course that does not exist
+    yet is not added, only an unsaved one returned
+    """
+    if dry_run:
+        return Course.objects.filter(key=course_key(name)).first() or Course(name=' '.join(name.split()))
+    return Course.objects.for_name(name)
+
+
+def _run_bulk_action(form, dry_run):
+    queryset = bulk.select(**form.selection())
+    if form.cleaned_data['action'] == 'move':
+        course = _target_course(form.cleaned_data['target_course'], dry_run)
+        return bulk.move_to_course(queryset, course, dry_run=dry_run)
+    return bulk.delete(queryset, dry_run=dry_run)
+
+
+def _describe(summary):
+    if summary['action'] == 'move':
+        done = f'moved to "{summary["course"]}"'
+    elif summary['action'] == 'delete':
+        done = 'deleted'
+    else:
+        done = 'updated'
+    return f'{summary["affected"]} of {summary["matched"]} selected students {done} in {summary["batches"]} batch(es).'
+
+
+def student_bulk(request):
+    """
+    View to move or delete many students at once, with a preview first (BULK operations).
+    """
+    summary = None
+    if request.method == 'POST':
+        form = BulkActionForm(request.POST)
+        if form.is_valid():
+            if 'apply' in request.POST:
+                summary = _run_bulk_action(form, dry_run=False)
+                messages.success(request, _describe(summary))
+                return redirect('student_list')
+            summary = _run_bulk_action(form, dry_run=True)
+        else:
+            messages.error(request, 'Please correct the errors below.')
+    else:
+        form = BulkActionForm()
+
+    context = {
+        'form': form,
+        'summary': summary
+    }
+    return render(request, 'students/student_bulk.html', context)
+
+
+@require_POST
+def student_bulk_api(request):
+    """
+    JSON version of student_bulk, plus per-student updates. Takes
+    {"action": "move" | "delete" | "update", "dry_run": true, ...} and
+    returns the summary of the rows affected (see students.bulk).
+
+    move and delete select students with "ids" and/or "course" (name),
+    "min_age" and "max_age"; move also needs "target_course". update takes
+    "changes": [{"id": 1, "age": 20, "course": "DSA"}, ...]. Like any POST
+    it needs the CSRF token (X-CSRFToken header).
+    """
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'errors': {'__all__': ['The body must be JSON.']}}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({'errors': {'__all__': ['The body must be a JSON object.']}}, status=400)
+    dry_run = bool(payload.get('dry_run', False))
+
+    if payload.get('action') == 'update':
+        entries = payload.get('changes')
+        if not isinstance(entries, list) or not entries:
+            return JsonResponse({'errors': {'changes': ['Give a list of changes.']}}, status=400)
+        cleaned = []
+        for index, entry in enumerate(entries):
+            form = StudentChangeForm(entry if isinstance(entry, dict) else {})
+            if not form.is_valid():
+                return JsonResponse({'errors': {f'changes.{index}': form.errors.get_json_data()}}, status=400)
+            cleaned.append(form.cleaned_data)
+        # Courses are only added once every entry is valid
+        changes = {}
+        for data in cleaned:
+            values = {}
+            if data['age'] is not None:
+                values['age'] = data['age']
+            if data['course']:
+                values['course'] = _target_course(data['course'], dry_run)
+            changes[data['id']] = values
+        return JsonResponse(bulk.apply_changes(changes, dry_run=dry_run))
+
+    data = {
+        name: payload.get(name)
+        for name in ('action', 'min_age', 'max_age', 'target_course') if payload.get(name) is not None
+    }
+    if isinstance(payload.get('ids'), list):
+        data['ids'] = ' '.join(str(pk) for pk in payload['ids'])
+    elif isinstance(payload.get('ids'), str):
+        data['ids'] = payload['ids']
+    if payload.get('course'):
+        data['course'] = course_key(str(payload['course']))
+    form = BulkActionForm(data)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+    return JsonResponse(_run_bulk_action(form, dry_run))